@@ -0,0 +1,204 @@
+"""
+Streaming bulk export of assessment and chat assessment results.
+
+Rows are read through a server-side cursor in chunks of EXPORT_CHUNK_ROWS and
+encoded chunk by chunk, so memory stays constant however many rows a company
+has. Dimension scores are flattened into one column per Hugo dimension.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+# The watermark trails the snapshot by this much (and by the oldest open write
+# transaction): completion times are taken when a transaction starts, so rows
+# can commit after the snapshot with an earlier completed_at.
+EXPORT_WATERMARK_LAG_SECONDS = float(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "60"))
+
+# Read inside the export snapshot; rows completed at or after it may still be
+# missing from this export and are included again by the next one.
+WATERMARK_SQL = """
+    SELECT LEAST(
+        LOCALTIMESTAMP - make_interval(secs => $1),
+        (SELECT min(xact_start)::timestamp FROM pg_stat_activity
+         WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid())
+    )
+"""
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+SOURCES = ("assessments", "chat", "all")
+
+DIMENSIONS = ("Vision", "Innovation", "Expertise", "Connection")
+COLUMNS = (
+    "source", "result_id", "user_id", "email", "first_name", "last_name", "company_id",
+    "hugo_type_code", "hugo_type_name", "hugo_dimension",
+    "vision", "innovation", "expertise", "connection", "completed_at"
+)
+
+# Both selects return COLUMNS in order with the raw score JSON last; scores are
+# flattened in Python so the cursor query stays a plain streaming join.
+_ASSESSMENTS_SQL = """
+    SELECT 'assessment' AS source, a.id::text AS result_id, u.id::text AS user_id,
+           u.email, u.first_name, u.last_name, u.company_id,
+           ht.code, ht.name, ht.dimension, a.completed_at, a.raw_scores AS scores
+    FROM assessments a
+    JOIN users u ON u.id = a.user_id
+    JOIN hugo_types ht ON ht.id = a.hugo_type_id
+    WHERE a.is_completed = true {filters}
+"""
+
+_CHAT_SQL = """
+    SELECT 'chat' AS source, cs.id::text AS result_id, u.id::text AS user_id,
+           cs.participant_email AS email,
+           COALESCE(u.first_name, cs.participant_name) AS first_name, u.last_name, u.company_id,
+           ht.code, ht.name, ht.dimension, cs.completed_at, cs.dimension_scores AS scores
+    FROM chat_sessions cs
+    LEFT JOIN users u ON u.email = cs.participant_email
+    LEFT JOIN hugo_types ht ON ht.code = cs.hugo_type_result
+    WHERE cs.is_completed = true {filters}
+"""
+
+def build_query(source: str, company_id: Optional[int], since: Optional[datetime]) -> Tuple[str, List[Any]]:
+    """SQL and arguments for one export; `since` selects results completed at or after it"""
+    args: List[Any] = []
+    common = ""
+    if company_id is not None:
+        args.append(company_id)
+        common += f" AND u.company_id = ${len(args)}"
+    since_param = None
+    if since is not None:
+        args.append(since)
+        since_param = f"${len(args)}"
+
+    parts = []
+    if source in ("assessments", "all"):
+        filters = common + (f" AND a.completed_at >= {since_param}" if since_param else "")
+        parts.append(_ASSESSMENTS_SQL.format(filters=filters))
+    if source in ("chat", "all"):
+        filters = common + (f" AND cs.completed_at >= {since_param}" if since_param else "")
+        parts.append(_CHAT_SQL.format(filters=filters))
+    return " UNION ALL ".join(parts), args
+
+def _flatten(row) -> tuple:
+    scores = row["scores"]
+    if isinstance(scores, str):
+        scores = json.loads(scores)
+    scores = scores or {}
+    return (
+        row["source"], row["result_id"], row["user_id"], row["email"], row["first_name"],
+        row["last_name"], row["company_id"], row["code"], row["name"], row["dimension"],
+        *(_score(scores.get(d)) for d in DIMENSIONS),
+        row["completed_at"]
+    )
+
+def _score(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+# ---------------------------------------------------------------------------
+# Encoders: each turns chunks of flattened rows into byte chunks
+
+async def _encode_csv(chunks: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    async for rows in chunks:
+        writer.writerows(
+            tuple(v.isoformat() if isinstance(v, datetime) else v for v in row) for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def _encode_ndjson(chunks: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield "".join(json.dumps(dict(zip(COLUMNS, row)), default=_json_default) + "\n" for row in rows).encode()
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+async def _encode_parquet(chunks: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("source", pa.string()), ("result_id", pa.string()), ("user_id", pa.string()),
+        ("email", pa.string()), ("first_name", pa.string()), ("last_name", pa.string()),
+        ("company_id", pa.int64()), ("hugo_type_code", pa.string()), ("hugo_type_name", pa.string()),
+        ("hugo_dimension", pa.string()),
+        ("vision", pa.float64()), ("innovation", pa.float64()),
+        ("expertise", pa.float64()), ("connection", pa.float64()),
+        ("completed_at", pa.timestamp("us"))
+    ])
+    sink = _ChunkSink()
+    # One row group per chunk; the footer is written on close
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+ENCODERS = {"csv": _encode_csv, "ndjson": _encode_ndjson, "parquet": _encode_parquet}
+
+async def stream(cursor, fmt: str) -> AsyncIterator[bytes]:
+    """Encoded export of everything `cursor` returns, one chunk at a time"""
+    async def chunks():
+        while True:
+            rows = await cursor.fetch(EXPORT_CHUNK_ROWS)
+            if not rows:
+                return
+            yield [_flatten(row) for row in rows]
+
+    async for data in ENCODERS[fmt](chunks()):
+        if data:
+            yield data
+
+def filename(source: str, fmt: str, company_id: Optional[int], started_at: datetime) -> str:
+    scope = f"company-{company_id}" if company_id is not None else "all"
+    return f"hugo-{source}-{scope}-{started_at:%Y%m%dT%H%M%S}.{fmt}"
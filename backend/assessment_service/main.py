@@ -1,12 +1,16 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import asyncpg
+from shared import instrumentation, tracing, health, fastjson, engine, admission
+from shared.db import db, setup as setup_database
+from shared.audit import audit_log, setup as setup_audit
+from shared.auth import require_role
 import os
 import uuid
-import httpx
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import export
 
 app = FastAPI(title="Hugo App - Assessment Service", version="2.0.0")
 
@@ -18,10 +22,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Exports stream whole tables: at most one every few seconds per tenant
+admission.install(app, {"GET /export": (0.2, 2)})
+instrumentation.instrument(app)
+tracing.instrument(app, "assessment-service")
 
 # Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
-HUGO_ENGINE_URL = os.getenv("HUGO_ENGINE_URL", "http://hugo-engine:8002")
+
+setup_database(app, DATABASE_URL)
+setup_audit(app)
+health.install(app, "assessment-service", {
+    "database": health.check_database,
+    "hugo_engine": engine.check
+})
 
 # Pydantic models
 class AssessmentQuestion(BaseModel):
@@ -55,7 +69,7 @@ class AssessmentResult(BaseModel):
 
 # Database connection
 async def get_db_connection():
-    return await asyncpg.connect(DATABASE_URL)
+    return await db.acquire()
 
 @app.get("/questions", response_model=List[AssessmentQuestion])
 async def get_assessment_questions():
@@ -69,12 +83,13 @@ async def get_assessment_questions():
             ORDER BY dimension, id
             """
         )
-        return [AssessmentQuestion(**dict(q)) for q in questions]
+        # Serialized straight from the records; response_model documents the shape
+        return fastjson.records_response(questions, json_columns=("options",))
     finally:
         await conn.close()
 
 @app.post("/", response_model=Dict[str, str])
-async def create_assessment(assessment: AssessmentCreate):
+async def create_assessment(assessment: AssessmentCreate, request: Request):
     """Create a new assessment for a user"""
     conn = await get_db_connection()
     try:
@@ -87,13 +102,17 @@ async def create_assessment(assessment: AssessmentCreate):
             """,
             assessment_id, uuid.UUID(assessment.user_id), {}, False
         )
+        audit_log.record(
+            "assessment.created", "assessment", assessment_id,
+            new_values={"user_id": assessment.user_id}, request=request
+        )
         
         return {"assessment_id": str(assessment_id)}
     finally:
         await conn.close()
 
 @app.post("/submit")
-async def submit_assessment(submission: AssessmentSubmission):
+async def submit_assessment(submission: AssessmentSubmission, request: Request):
     """Submit assessment answers and calculate results"""
     conn = await get_db_connection()
     try:
@@ -127,16 +146,9 @@ async def submit_assessment(submission: AssessmentSubmission):
         dimension_scores = await calculate_dimension_scores(conn, submission.assessment_id)
         
         # Get Hugo type from Hugo Engine
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{HUGO_ENGINE_URL}/analyze-scores",
-                json=dimension_scores
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail="Failed to analyze personality")
-            
-            analysis = response.json()
+        analysis = await engine.analyze_scores(dimension_scores, conn)
+        if analysis is None:
+            raise HTTPException(status_code=500, detail="Failed to analyze personality")
         
         # Update assessment with results
         hugo_type_id = await conn.fetchval(
@@ -147,11 +159,20 @@ async def submit_assessment(submission: AssessmentSubmission):
         await conn.execute(
             """
             UPDATE assessments 
-            SET hugo_type_id = $1, raw_scores = $2, is_completed = $3
+            SET hugo_type_id = $1, raw_scores = $2, is_completed = $3, completed_at = LOCALTIMESTAMP
             WHERE id = $4
             """,
             hugo_type_id, dimension_scores, True, uuid.UUID(submission.assessment_id)
         )
+        audit_log.record(
+            "assessment.submitted", "assessment", submission.assessment_id,
+            new_values={
+                "hugo_type": analysis["primary_type"]["code"],
+                "dimension_scores": dimension_scores,
+                "answers": len(submission.answers)
+            },
+            request=request
+        )
         
         return {
             "message": "Assessment completed successfully",
@@ -283,6 +304,75 @@ async def get_user_latest_assessment(user_id: str):
     finally:
         await conn.close()
 
+@app.get("/export")
+async def export_results(
+    fmt: str = Query("csv", alias="format", description="csv, ndjson or parquet"),
+    source: str = Query("all", description="assessments, chat or all"),
+    since: Optional[datetime] = Query(None, description="Only results completed at or after this time"),
+    company_id: Optional[int] = None,
+    claims: Dict[str, Any] = Depends(require_role("hr_manager", "hugo_manager"))
+):
+    """
+    Stream all completed assessment and chat results of a company.
+
+    Rows come from a server-side cursor inside one read-only snapshot, so the
+    export is consistent and uses constant memory. The X-Export-Watermark
+    header trails the snapshot time; pass it as `since` for the next incremental
+    export (results completed shortly before it appear in both, by result_id).
+    """
+    if fmt not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of: {', '.join(export.FORMATS)}")
+    if source not in export.SOURCES:
+        raise HTTPException(status_code=400, detail=f"Unsupported source, use one of: {', '.join(export.SOURCES)}")
+    if fmt == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    
+    # HR managers only ever export their own company
+    if claims.get("role") == "hr_manager":
+        own_company = claims.get("company_id")
+        if own_company is None or (company_id is not None and company_id != own_company):
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        company_id = own_company
+    
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    query, args = export.build_query(source, company_id, since)
+    
+    conn = await get_db_connection()
+    transaction = conn.transaction(isolation="repeatable_read", readonly=True)
+    try:
+        await transaction.start()
+        watermark = await conn.fetchval(export.WATERMARK_SQL, export.EXPORT_WATERMARK_LAG_SECONDS)
+        cursor = await conn.cursor(query, *args)
+    except BaseException:
+        try:
+            await transaction.rollback()
+        finally:
+            await conn.close()
+        raise
+    
+    async def body():
+        # The connection stays checked out until the last chunk is sent
+        try:
+            async for chunk in export.stream(cursor, fmt):
+                yield chunk
+        finally:
+            try:
+                await transaction.rollback()
+            finally:
+                await conn.close()
+    
+    return StreamingResponse(
+        body(),
+        media_type=export.FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export.filename(source, fmt, company_id, watermark)}"',
+            "X-Export-Watermark": watermark.isoformat(),
+            # Let nginx pass chunks through instead of spooling the file
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "assessment-service"}
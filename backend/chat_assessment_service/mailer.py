@@ -0,0 +1,245 @@
+"""
+Invitation email rendering and delivery.
+
+Templates are compiled once at import: locale strings are folded into the
+static HTML and the remaining placeholders become slots, so rendering an
+invitation is a single join of prebuilt segments and the per-recipient
+values (name, company, sender, link).
+"""
+import base64
+import os
+import smtplib
+from functools import lru_cache
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from html import escape
+from string import Formatter
+from typing import Dict, List, Optional
+
+# Email configuration
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost")
+# Right-hand side of Message-IDs (make_msgid would otherwise resolve the FQDN per message)
+MESSAGE_ID_DOMAIN = (SMTP_USER or "").rpartition("@")[2] or "hugo.localhost"
+
+DEFAULT_LOCALE = os.getenv("EMAIL_DEFAULT_LOCALE", "de")
+# Per-company language, e.g. "Acme Corp:en,Demo Company GmbH:de"
+COMPANY_LOCALES = {
+    company.strip(): locale.strip()
+    for company, _, locale in (
+        entry.rpartition(":") for entry in os.getenv("EMAIL_COMPANY_LOCALES", "").split(",") if ":" in entry
+    )
+}
+
+def smtp_configured() -> bool:
+    return bool(SMTP_USER and SMTP_PASSWORD)
+
+def smtp_address(email: str) -> str:
+    """Recipient as sent over SMTP: an internationalized domain in IDNA (xn--) form"""
+    local, _, domain = email.rpartition("@")
+    if domain.isascii():
+        return email
+    try:
+        return f"{local}@{domain.encode('idna').decode('ascii')}"
+    except UnicodeError:
+        return email
+
+def needs_smtputf8(address: str) -> bool:
+    """A non-ASCII local part can only be delivered with the SMTPUTF8 extension (RFC 6531)"""
+    return not address.isascii()
+
+INVITATION_LOCALES = {
+    "de": {
+        "lang": "de",
+        "subject": "Einladung zum Hugo Persönlichkeitsassessment von {company}",
+        "title": "Hugo Persönlichkeitsassessment - Einladung",
+        "heading": "Persönlichkeitsassessment",
+        "greeting": "Hallo{greeting_name},",
+        "intro": "{sender} von {company} hat dich zu einem Persönlichkeitsassessment mit Hugo eingeladen!",
+        "about": "Hugo hilft dir dabei, deinen Persönlichkeitstyp zu entdecken und zu verstehen, wie du am besten in Teams arbeitest. Das Assessment dauert nur etwa 10-15 Minuten und wird als freundliches Gespräch mit unserem KI-Assistenten geführt.",
+        "button": "Assessment starten",
+        "expect": "Was dich erwartet:",
+        "expect_chat": "🤖 Freundlicher Chat mit Hugo, unserem KI-Assistenten",
+        "expect_time": "⏱️ Nur 10-15 Minuten deiner Zeit",
+        "expect_insights": "🎯 Personalisierte Einblicke in deine Stärken",
+        "expect_teams": "🤝 Besseres Verständnis für Teamdynamiken",
+        "privacy": "Deine Daten werden selbstverständlich vertraulich behandelt und sind GDPR-konform geschützt.",
+        "fallback_link": "Falls der Button nicht funktioniert, kopiere diesen Link in deinen Browser:",
+        "questions": "Bei Fragen kannst du dich gerne an {sender} wenden.",
+        "closing": "Viel Spaß beim Assessment!<br>\n            Dein Hugo-Team",
+        "footer": "Hugo - Persönlichkeitsassessment & Team Building Platform<br>\n                Diese Einladung ist 7 Tage gültig."
+    },
+    "en": {
+        "lang": "en",
+        "subject": "Invitation to the Hugo personality assessment from {company}",
+        "title": "Hugo Personality Assessment - Invitation",
+        "heading": "Personality Assessment",
+        "greeting": "Hello{greeting_name},",
+        "intro": "{sender} from {company} has invited you to a personality assessment with Hugo!",
+        "about": "Hugo helps you discover your personality type and understand how you work best in teams. The assessment takes only about 10-15 minutes and is a friendly conversation with our AI assistant.",
+        "button": "Start assessment",
+        "expect": "What to expect:",
+        "expect_chat": "🤖 A friendly chat with Hugo, our AI assistant",
+        "expect_time": "⏱️ Only 10-15 minutes of your time",
+        "expect_insights": "🎯 Personalised insights into your strengths",
+        "expect_teams": "🤝 A better understanding of team dynamics",
+        "privacy": "Your data is of course treated confidentially and protected in line with the GDPR.",
+        "fallback_link": "If the button does not work, copy this link into your browser:",
+        "questions": "If you have any questions, feel free to contact {sender}.",
+        "closing": "Enjoy the assessment!<br>\n            Your Hugo team",
+        "footer": "Hugo - Personality Assessment & Team Building Platform<br>\n                This invitation is valid for 7 days."
+    }
+}
+
+INVITATION_HTML = """
+    <!DOCTYPE html>
+    <html lang="{lang}">
+    <head>
+        <meta charset="utf-8">
+        <title>{title}</title>
+    </head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="text-align: center; margin-bottom: 30px;">
+                <h1 style="color: #2563eb;">🧠 Hugo</h1>
+                <h2 style="color: #4b5563;">{heading}</h2>
+            </div>
+            
+            <p>{greeting}</p>
+            
+            <p>{intro}</p>
+            
+            <p>{about}</p>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{link}" 
+                   style="background-color: #2563eb; color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: bold; display: inline-block;">
+                    {button}
+                </a>
+            </div>
+            
+            <p><strong>{expect}</strong></p>
+            <ul>
+                <li>{expect_chat}</li>
+                <li>{expect_time}</li>
+                <li>{expect_insights}</li>
+                <li>{expect_teams}</li>
+            </ul>
+            
+            <p>{privacy}</p>
+            
+            <p>{fallback_link}<br>
+            <a href="{link}">{link}</a></p>
+            
+            <p>{questions}</p>
+            
+            <p>{closing}</p>
+            
+            <hr style="margin: 30px 0; border: none; border-top: 1px solid #e5e7eb;">
+            <p style="font-size: 12px; color: #6b7280; text-align: center;">
+                {footer}
+            </p>
+        </div>
+    </body>
+    </html>
+    """
+
+class CompiledTemplate:
+    """
+    A template parsed into alternating static text and slot names.
+    Placeholders found in `constants` are expanded (recursively) at compile
+    time; everything else is a slot filled on each render.
+    """
+
+    def __init__(self, text: str, constants: Optional[Dict[str, str]] = None):
+        self.parts: List[str] = [""]
+        self.slots: List[str] = []
+        self._compile(text, constants or {})
+
+    def _compile(self, text: str, constants: Dict[str, str]):
+        for literal, field, _, _ in Formatter().parse(text):
+            self.parts[-1] += literal
+            if field is None:
+                continue
+            if field in constants:
+                self._compile(constants[field], constants)
+            else:
+                self.slots.append(field)
+                self.parts.append("")
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = self.parts
+        out = [parts[0]]
+        for i, slot in enumerate(self.slots, 1):
+            out.append(values[slot])
+            out.append(parts[i])
+        return "".join(out)
+
+class InvitationTemplate:
+    """Compiled subject and raw MIME message for one locale"""
+
+    def __init__(self, locale: str):
+        strings = INVITATION_LOCALES[locale]
+        self.locale = locale
+        self.subject = CompiledTemplate(strings["subject"])
+        self.body = CompiledTemplate(INVITATION_HTML, strings)
+        # Static headers are built once; To, Subject, Date and Message-ID vary per message.
+        # base64 body: 7-bit clean with CRLF lines, accepted without 8BITMIME
+        self.headers = (
+            f"From: {SMTP_USER or ''}\r\n"
+            "MIME-Version: 1.0\r\n"
+            'Content-Type: text/html; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: base64\r\n"
+        )
+
+    def render_html(self, name: Optional[str], company: str, sender: str, token: str) -> str:
+        return self.body.render({
+            "greeting_name": " " + escape(name) if name else "",
+            "company": escape(company),
+            "sender": escape(sender),
+            "link": escape(f"{FRONTEND_URL}/assessment/{token}")
+        })
+
+    def encoded_subject(self, company: str) -> str:
+        return _encoded_subject(self.locale, company)
+
+    def render_message(self, email: str, name: Optional[str], company: str, sender: str, token: str) -> bytes:
+        subject = self.encoded_subject(company)
+        head = (
+            f"To: {smtp_address(email)}\r\nSubject: {subject}\r\n"
+            f"Date: {formatdate(usegmt=True)}\r\nMessage-ID: {make_msgid(domain=MESSAGE_ID_DOMAIN)}\r\n"
+            f"{self.headers}\r\n"
+        )
+        body = base64.encodebytes(self.render_html(name, company, sender, token).encode("utf-8"))
+        # ASCII unless the address needs SMTPUTF8, which allows UTF-8 headers
+        return head.encode("utf-8") + body.replace(b"\n", b"\r\n")
+
+@lru_cache(maxsize=1024)
+def _encoded_subject(locale: str, company: str) -> str:
+    # RFC 2047 encoding is by far the most expensive step; subjects only vary by company
+    return Header(INVITATION_TEMPLATES[locale].subject.render({"company": company}), "utf-8").encode(linesep="\r\n")
+
+# Parsed once at startup
+INVITATION_TEMPLATES = {locale: InvitationTemplate(locale) for locale in INVITATION_LOCALES}
+
+def invitation_template(company: str) -> InvitationTemplate:
+    locale = COMPANY_LOCALES.get(company, DEFAULT_LOCALE)
+    return INVITATION_TEMPLATES.get(locale) or INVITATION_TEMPLATES["de"]
+
+def build_invitation_message(email: str, name: Optional[str], company: str, sender: str, token: str) -> bytes:
+    """Render the invitation email with assessment link as a raw RFC 5322 message"""
+    return invitation_template(company).render_message(email, name, company, sender, token)
+
+def deliver_message(recipient: str, message: bytes):
+    """Send a rendered message over SMTP (blocking - run it in a thread)"""
+    
+    address = smtp_address(recipient)
+    # Raises SMTPNotSupportedError if the server lacks SMTPUTF8 and the local part is not ASCII
+    mail_options = ["SMTPUTF8"] if needs_smtputf8(address) else []
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as server:
+        server.starttls()
+        server.login(SMTP_USER, SMTP_PASSWORD)
+        server.sendmail(SMTP_USER, [address], message, mail_options=mail_options)
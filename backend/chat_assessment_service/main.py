@@ -1,17 +1,18 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
-import asyncpg
+from shared import instrumentation, tracing, health, engine, admission
+from shared.circuitbreaker import CircuitBreaker, STATE_VALUES
+from shared.db import db, setup as setup_database
 import os
 import uuid
-import httpx
+import asyncio
 import openai
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MimeMultipart
+import time
+import outbox
 
 app = FastAPI(title="Hugo App - Chat Assessment Service", version="2.0.0")
 
@@ -23,23 +24,31 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Bulk invites are sent one POST per participant
+admission.install(app, {"POST /invitations": (2, 50)})
+instrumentation.instrument(app)
+tracing.instrument(app, "chat-assessment-service")
 
 # Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-HUGO_ENGINE_URL = os.getenv("HUGO_ENGINE_URL", "http://hugo-engine:8002")
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost")
 
-# Email configuration
-SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER = os.getenv("SMTP_USER")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# LLM latency budget and circuit breaker
+LLM_TURN_BUDGET_SECONDS = float(os.getenv("LLM_TURN_BUDGET_SECONDS", "6"))
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "2"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_RATE = float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "3"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
 
 # Initialize OpenAI
 if OPENAI_API_KEY:
     openai.api_key = OPENAI_API_KEY
 
+setup_database(app, DATABASE_URL)
+
 # Pydantic models
 class ChatSession(BaseModel):
     id: str
@@ -131,14 +140,149 @@ CHAT_QUESTIONS = [
 
 # Database connection
 async def get_db_connection():
-    return await asyncpg.connect(DATABASE_URL)
+    return await db.acquire()
+
+# LLM metrics (fallback rate = llm_fallbacks_total / llm_requests_total)
+llm_requests = instrumentation.Counter(
+    "llm_requests_total", "LLM-backed operations requested", ("operation",))
+llm_fallbacks = instrumentation.Counter(
+    "llm_fallbacks_total", "LLM-backed operations answered by the fallback path", ("operation", "reason"))
+llm_call_seconds = instrumentation.Histogram(
+    "llm_call_duration_seconds", "OpenAI API call latency", ("operation", "outcome"))
+llm_tokens = instrumentation.Counter(
+    "llm_tokens_total", "OpenAI tokens consumed", ("operation", "kind"))
+llm_hedges = instrumentation.Counter(
+    "llm_hedged_requests_total", "Second OpenAI requests sent because the first was slow", ("operation",))
+llm_circuit_state = instrumentation.Gauge(
+    "llm_circuit_state", "OpenAI circuit breaker state (0 closed, 1 half-open, 2 open)")
+llm_circuit_transitions = instrumentation.Counter(
+    "llm_circuit_transitions_total", "OpenAI circuit breaker state changes", ("state",))
+
+def _breaker_transition(previous: str, state: str):
+    print(f"OpenAI circuit breaker: {previous} -> {state}")
+    llm_circuit_state.set(value=STATE_VALUES[state])
+    llm_circuit_transitions.inc(state)
+
+llm_breaker = CircuitBreaker(
+    failure_rate=LLM_BREAKER_FAILURE_RATE,
+    slow_call_rate=LLM_BREAKER_SLOW_CALL_RATE,
+    slow_call_seconds=LLM_BREAKER_SLOW_CALL_SECONDS,
+    window=LLM_BREAKER_WINDOW,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    open_seconds=LLM_BREAKER_OPEN_SECONDS,
+    on_transition=_breaker_transition
+)
+llm_circuit_state.set(value=STATE_VALUES[llm_breaker.state])
+
+class LLMUnavailable(Exception):
+    """The LLM was skipped (breaker open, budget spent); `reason` labels the fallback"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+async def _completion_attempt(operation: str, kwargs: Dict[str, Any]):
+    with tracing.span(f"openai {operation}", tracing.KIND_CLIENT, {"llm.model": kwargs.get("model")}) as span:
+        start = time.perf_counter()
+        try:
+            response = await openai.ChatCompletion.acreate(**kwargs)
+        except asyncio.CancelledError:
+            # Lost the hedge race or ran out of budget; the caller records the outcome
+            llm_call_seconds.observe(time.perf_counter() - start, operation, "cancelled")
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - start
+            llm_call_seconds.observe(elapsed, operation, "error")
+            llm_breaker.record(False, elapsed)
+            raise
+        elapsed = time.perf_counter() - start
+        llm_call_seconds.observe(elapsed, operation, "ok")
+        llm_breaker.record(True, elapsed)
+        usage = response.get("usage") or {}
+        llm_tokens.inc(operation, "prompt", amount=usage.get("prompt_tokens", 0))
+        llm_tokens.inc(operation, "completion", amount=usage.get("completion_tokens", 0))
+        if span is not None:
+            span.attributes["llm.prompt_tokens"] = usage.get("prompt_tokens", 0)
+            span.attributes["llm.completion_tokens"] = usage.get("completion_tokens", 0)
+        return response
+
+async def chat_completion(operation: str, deadline: Optional[float] = None, **kwargs):
+    """
+    openai.ChatCompletion.acreate behind the circuit breaker, hedged and bounded.
+
+    If the first request has not answered after LLM_HEDGE_AFTER_SECONDS a second
+    one is sent and the first answer wins. Nothing waits past `deadline`
+    (time.monotonic(), defaults to one turn budget from now); LLMUnavailable is
+    raised instead so the caller can fall back immediately.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + LLM_TURN_BUDGET_SECONDS
+    if deadline - time.monotonic() <= 0:
+        # Turn budget already used up (e.g. by analyze_response): no request, nothing for the breaker
+        raise LLMUnavailable("budget")
+    if not llm_breaker.allow():
+        raise LLMUnavailable("circuit_open")
+    started = time.monotonic()
+
+    pending = {asyncio.create_task(_completion_attempt(operation, kwargs))}
+    hedged = False
+    error = None
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = remaining if hedged else min(remaining, LLM_HEDGE_AFTER_SECONDS)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if not hedged and time.monotonic() - started >= LLM_HEDGE_AFTER_SECONDS and llm_breaker.allow():
+                # Slow (or failed) first attempt: race a second request against it
+                hedged = True
+                llm_hedges.inc(operation)
+                pending.add(asyncio.create_task(_completion_attempt(operation, kwargs)))
+    except asyncio.CancelledError:
+        # Cancelled from outside (client gone, shutdown): the attempts in flight never
+        # record an outcome, so give back the half-open probe slots they hold
+        llm_breaker.release(len(pending))
+        raise
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        # Budget spent with requests still in flight: count it as a slow failure
+        llm_breaker.record(False, time.monotonic() - started)
+        raise LLMUnavailable("timeout")
+    raise error
+
+async def check_llm() -> Dict[str, Any]:
+    """OpenAI status for readiness (informational: the fallback path keeps chats working)"""
+    requests = llm_requests.total()
+    fallbacks = llm_fallbacks.total()
+    return {
+        "configured": bool(OPENAI_API_KEY),
+        "requests": requests,
+        "fallback_rate": round(fallbacks / requests, 4) if requests else 0.0,
+        "circuit": llm_breaker.snapshot()
+    }
+
+health.install(app, "chat-assessment-service", {
+    "database": health.check_database,
+    "hugo_engine": engine.check,
+    "openai": check_llm
+}, optional=("openai",))
 
 # LLM Analysis Functions
-async def analyze_response_with_llm(question: str, response: str, dimension: str) -> Dict[str, float]:
+async def analyze_response_with_llm(question: str, response: str, dimension: str, deadline: Optional[float] = None) -> Dict[str, float]:
     """Analyze user response using OpenAI and return dimension scores"""
     
+    llm_requests.inc("analyze_response")
     if not OPENAI_API_KEY:
         # Fallback scoring without LLM
+        llm_fallbacks.inc("analyze_response", "disabled")
         return {"Vision": 0.5, "Innovation": 0.5, "Expertise": 0.5, "Connection": 0.5}
     
     prompt = f"""
@@ -160,7 +304,9 @@ async def analyze_response_with_llm(question: str, response: str, dimension: str
     """
     
     try:
-        response = await openai.ChatCompletion.acreate(
+        response = await chat_completion(
+            "analyze_response",
+            deadline,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Du bist ein Experte für Persönlichkeitsanalyse. Antworte nur mit dem angeforderten JSON-Format."},
@@ -182,17 +328,23 @@ async def analyze_response_with_llm(question: str, response: str, dimension: str
         return scores
         
     except Exception as e:
-        print(f"LLM analysis error: {e}")
+        if isinstance(e, LLMUnavailable):
+            llm_fallbacks.inc("analyze_response", e.reason)
+        else:
+            print(f"LLM analysis error: {e}")
+            llm_fallbacks.inc("analyze_response", "error")
         # Fallback scoring
         base_scores = {"Vision": 0.5, "Innovation": 0.5, "Expertise": 0.5, "Connection": 0.5}
         if dimension in base_scores:
             base_scores[dimension] = 0.7  # Boost the focus dimension
         return base_scores
 
-async def generate_chat_response(question_data: Dict, user_response: str, session: ChatSession) -> str:
+async def generate_chat_response(question_data: Dict, user_response: str, session: ChatSession, deadline: Optional[float] = None) -> str:
     """Generate contextual chat response using LLM"""
     
+    llm_requests.inc("chat_response")
     if not OPENAI_API_KEY:
+        llm_fallbacks.inc("chat_response", "disabled")
         return question_data.get("follow_up", "Danke für deine Antwort! Lass uns zur nächsten Frage.")
     
     prompt = f"""
@@ -207,7 +359,9 @@ async def generate_chat_response(question_data: Dict, user_response: str, sessio
     """
     
     try:
-        response = await openai.ChatCompletion.acreate(
+        response = await chat_completion(
+            "chat_response",
+            deadline,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Du bist Hugo, ein empathischer Persönlichkeits-Assistent. Antworte kurz und freundlich."},
@@ -220,98 +374,17 @@ async def generate_chat_response(question_data: Dict, user_response: str, sessio
         return response.choices[0].message.content.strip()
         
     except Exception as e:
-        print(f"Chat response generation error: {e}")
+        if isinstance(e, LLMUnavailable):
+            llm_fallbacks.inc("chat_response", e.reason)
+        else:
+            print(f"Chat response generation error: {e}")
+            llm_fallbacks.inc("chat_response", "error")
         return question_data.get("follow_up", "Danke für deine Antwort!")
 
-# Email functions
-async def send_invitation_email(email: str, name: str, company: str, sender: str, token: str):
-    """Send invitation email with assessment link"""
-    
-    if not SMTP_USER or not SMTP_PASSWORD:
-        print("Email configuration missing - skipping email send")
-        return
-    
-    assessment_link = f"{FRONTEND_URL}/assessment/{token}"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <title>Hugo Persönlichkeitsassessment - Einladung</title>
-    </head>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <h1 style="color: #2563eb;">🧠 Hugo</h1>
-                <h2 style="color: #4b5563;">Persönlichkeitsassessment</h2>
-            </div>
-            
-            <p>Hallo{' ' + name if name else ''},</p>
-            
-            <p>{sender} von {company} hat dich zu einem Persönlichkeitsassessment mit Hugo eingeladen!</p>
-            
-            <p>Hugo hilft dir dabei, deinen Persönlichkeitstyp zu entdecken und zu verstehen, wie du am besten in Teams arbeitest. Das Assessment dauert nur etwa 10-15 Minuten und wird als freundliches Gespräch mit unserem KI-Assistenten geführt.</p>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{assessment_link}" 
-                   style="background-color: #2563eb; color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: bold; display: inline-block;">
-                    Assessment starten
-                </a>
-            </div>
-            
-            <p><strong>Was dich erwartet:</strong></p>
-            <ul>
-                <li>🤖 Freundlicher Chat mit Hugo, unserem KI-Assistenten</li>
-                <li>⏱️ Nur 10-15 Minuten deiner Zeit</li>
-                <li>🎯 Personalisierte Einblicke in deine Stärken</li>
-                <li>🤝 Besseres Verständnis für Teamdynamiken</li>
-            </ul>
-            
-            <p>Deine Daten werden selbstverständlich vertraulich behandelt und sind GDPR-konform geschützt.</p>
-            
-            <p>Falls der Button nicht funktioniert, kopiere diesen Link in deinen Browser:<br>
-            <a href="{assessment_link}">{assessment_link}</a></p>
-            
-            <p>Bei Fragen kannst du dich gerne an {sender} wenden.</p>
-            
-            <p>Viel Spaß beim Assessment!<br>
-            Dein Hugo-Team</p>
-            
-            <hr style="margin: 30px 0; border: none; border-top: 1px solid #e5e7eb;">
-            <p style="font-size: 12px; color: #6b7280; text-align: center;">
-                Hugo - Persönlichkeitsassessment & Team Building Platform<br>
-                Diese Einladung ist 7 Tage gültig.
-            </p>
-        </div>
-    </body>
-    </html>
-    """
-    
-    try:
-        msg = MimeMultipart('alternative')
-        msg['Subject'] = f"Einladung zum Hugo Persönlichkeitsassessment von {company}"
-        msg['From'] = SMTP_USER
-        msg['To'] = email
-        
-        html_part = MimeText(html_content, 'html')
-        msg.attach(html_part)
-        
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.send_message(msg)
-            
-        print(f"Invitation email sent to {email}")
-        
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send invitation email")
-
 # API Endpoints
 @app.post("/invitations")
-async def create_invitation(invitation: InvitationCreate, background_tasks: BackgroundTasks):
-    """Create and send assessment invitation"""
+async def create_invitation(invitation: InvitationCreate):
+    """Create an assessment invitation and queue its email in the outbox"""
     
     conn = await get_db_connection()
     try:
@@ -319,29 +392,34 @@ async def create_invitation(invitation: InvitationCreate, background_tasks: Back
         invitation_token = str(uuid.uuid4())
         expires_at = datetime.utcnow() + timedelta(days=7)
         
-        # Store invitation in database
-        await conn.execute(
-            """
-            INSERT INTO assessment_invitations 
-            (token, participant_email, participant_name, company_name, sender_name, expires_at)
-            VALUES ($1, $2, $3, $4, $5, $6)
-            """,
-            invitation_token, invitation.participant_email, invitation.participant_name,
-            invitation.company_name, invitation.sender_name, expires_at
-        )
-        
-        # Send email in background
-        background_tasks.add_task(
-            send_invitation_email,
-            invitation.participant_email,
-            invitation.participant_name,
-            invitation.company_name,
-            invitation.sender_name,
-            invitation_token
-        )
+        # Store invitation and its outbound email atomically; the email worker
+        # (worker.py) picks it up, so a restart can no longer lose the send
+        async with conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO assessment_invitations 
+                (token, participant_email, participant_name, company_name, sender_name, expires_at)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                """,
+                invitation_token, invitation.participant_email, invitation.participant_name,
+                invitation.company_name, invitation.sender_name, expires_at
+            )
+            
+            await outbox.enqueue(
+                conn,
+                outbox.KIND_INVITATION,
+                invitation.participant_email,
+                {
+                    "email": invitation.participant_email,
+                    "name": invitation.participant_name,
+                    "company": invitation.company_name,
+                    "sender": invitation.sender_name,
+                    "token": invitation_token
+                }
+            )
         
         return {
-            "message": "Invitation sent successfully",
+            "message": "Invitation created, email queued for delivery",
             "invitation_token": invitation_token,
             "expires_at": expires_at
         }
@@ -349,6 +427,16 @@ async def create_invitation(invitation: InvitationCreate, background_tasks: Back
     finally:
         await conn.close()
 
+@app.get("/outbox/stats")
+async def get_outbox_stats():
+    """Email outbox backlog, delivery lag and failure counts"""
+    
+    conn = await get_db_connection()
+    try:
+        return await outbox.stats(conn)
+    finally:
+        await conn.close()
+
 @app.get("/invitations/{token}")
 async def get_invitation(token: str):
     """Get invitation details"""
@@ -465,12 +553,15 @@ async def send_message(session_id: str, message: ChatMessage):
         # Process current question response
         if current_question < len(CHAT_QUESTIONS):
             question_data = CHAT_QUESTIONS[current_question]
+            # Both LLM calls of this turn share one latency budget
+            deadline = time.monotonic() + LLM_TURN_BUDGET_SECONDS
             
             # Analyze response with LLM
             scores = await analyze_response_with_llm(
                 question_data["question"], 
                 message.message, 
-                question_data["dimension"]
+                question_data["dimension"],
+                deadline
             )
             
             # Update dimension scores
@@ -491,7 +582,7 @@ async def send_message(session_id: str, message: ChatMessage):
             })
             
             # Generate contextual response
-            bot_response = await generate_chat_response(question_data, message.message, session_data)
+            bot_response = await generate_chat_response(question_data, message.message, session_data, deadline)
             
             # Move to next question
             current_question += 1
@@ -499,45 +590,40 @@ async def send_message(session_id: str, message: ChatMessage):
             # Check if assessment is complete
             if current_question >= len(CHAT_QUESTIONS):
                 # Calculate final Hugo type
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{HUGO_ENGINE_URL}/analyze-scores",
-                        json=dimension_scores
+                analysis = await engine.analyze_scores(dimension_scores, conn)
+                
+                if analysis is not None:
+                    hugo_type = analysis["primary_type"]["code"]
+                    
+                    # Update session as completed
+                    await conn.execute(
+                        """
+                        UPDATE chat_sessions 
+                        SET current_question = $1, responses = $2, dimension_scores = $3, 
+                            hugo_type_result = $4, is_completed = true
+                        WHERE id = $5
+                        """,
+                        current_question, json.dumps(responses), json.dumps(dimension_scores),
+                        hugo_type, session_id
                     )
                     
-                    if response.status_code == 200:
-                        analysis = response.json()
-                        hugo_type = analysis["primary_type"]["code"]
-                        
-                        # Update session as completed
-                        await conn.execute(
-                            """
-                            UPDATE chat_sessions 
-                            SET current_question = $1, responses = $2, dimension_scores = $3, 
-                                hugo_type_result = $4, is_completed = true
-                            WHERE id = $5
-                            """,
-                            current_question, json.dumps(responses), json.dumps(dimension_scores),
-                            hugo_type, session_id
-                        )
-                        
-                        # Store bot response
-                        completion_message = f"🎉 Fantastisch! Ich habe deine Persönlichkeit analysiert. Du bist ein **{analysis['primary_type']['name']} ({hugo_type})**!\n\n{analysis['primary_type']['description']}\n\nDeine Ergebnisse werden jetzt an dein Team weitergeleitet. Vielen Dank für deine Zeit!"
-                        
-                        await conn.execute(
-                            """
-                            INSERT INTO chat_messages (session_id, message, is_user, timestamp)
-                            VALUES ($1, $2, $3, $4)
-                            """,
-                            session_id, completion_message, False, datetime.utcnow()
-                        )
-                        
-                        return ChatResponse(
-                            message=completion_message,
-                            is_question=False,
-                            is_completed=True,
-                            hugo_type=hugo_type
-                        )
+                    # Store bot response
+                    completion_message = f"🎉 Fantastisch! Ich habe deine Persönlichkeit analysiert. Du bist ein **{analysis['primary_type']['name']} ({hugo_type})**!\n\n{analysis['primary_type']['description']}\n\nDeine Ergebnisse werden jetzt an dein Team weitergeleitet. Vielen Dank für deine Zeit!"
+                    
+                    await conn.execute(
+                        """
+                        INSERT INTO chat_messages (session_id, message, is_user, timestamp)
+                        VALUES ($1, $2, $3, $4)
+                        """,
+                        session_id, completion_message, False, datetime.utcnow()
+                    )
+                    
+                    return ChatResponse(
+                        message=completion_message,
+                        is_question=False,
+                        is_completed=True,
+                        hugo_type=hugo_type
+                    )
             
             # Continue with next question
             next_question = CHAT_QUESTIONS[current_question] if current_question < len(CHAT_QUESTIONS) else None
@@ -592,7 +678,8 @@ async def get_session(session_id: str):
         session = await conn.fetchrow(
             """
             SELECT id, participant_name, participant_email, current_question, 
-                   responses, dimension_scores, hugo_type_result, is_completed, created_at
+                   responses, dimension_scores, hugo_type_result, is_completed, created_at,
+                   messages_archived_at
             FROM chat_sessions 
             WHERE id = $1
             """,
@@ -602,20 +689,30 @@ async def get_session(session_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Get chat messages
-        messages = await conn.fetch(
-            """
-            SELECT message, is_user, timestamp
-            FROM chat_messages 
-            WHERE session_id = $1 
-            ORDER BY timestamp
-            """,
-            session_id
-        )
+        session = dict(session)
+        if session.pop("messages_archived_at") is not None:
+            # Moved to the archive by retention.py
+            archived = await conn.fetchval(
+                "SELECT messages FROM chat_messages_archive WHERE session_id = $1",
+                session_id
+            )
+            messages = json.loads(archived) if archived else []
+        else:
+            # Get chat messages; the lower bound skips partitions older than the session
+            messages = await conn.fetch(
+                """
+                SELECT message, is_user, timestamp
+                FROM chat_messages 
+                WHERE session_id = $1 AND timestamp >= $2::timestamp - INTERVAL '1 day'
+                ORDER BY timestamp
+                """,
+                session_id, session["created_at"]
+            )
+            messages = [dict(msg) for msg in messages]
         
         return {
-            "session": dict(session),
-            "messages": [dict(msg) for msg in messages]
+            "session": session,
+            "messages": messages
         }
         
     finally:
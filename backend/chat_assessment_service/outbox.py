@@ -0,0 +1,112 @@
+"""
+Postgres-backed outbox for outbound email.
+
+API handlers enqueue rows inside their own transaction; worker.py claims due
+rows with FOR UPDATE SKIP LOCKED so several workers can drain the table
+concurrently without double-sending.
+"""
+import json
+import os
+from typing import Any, Dict, List
+
+KIND_INVITATION = "invitation"
+
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+# Rows stuck in 'sending' longer than this belong to a crashed worker
+LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+async def enqueue(conn, kind: str, recipient: str, payload: Dict[str, Any], max_attempts: int = MAX_ATTEMPTS) -> int:
+    """Queue an email; call inside the caller's transaction"""
+    return await conn.fetchval(
+        """
+        INSERT INTO email_outbox (kind, recipient, payload, max_attempts)
+        VALUES ($1, $2, $3, $4)
+        RETURNING id
+        """,
+        kind, recipient, json.dumps(payload), max_attempts
+    )
+
+async def claim_batch(conn, limit: int) -> List[Dict[str, Any]]:
+    """Lease up to `limit` due rows (pending, or abandoned by a dead worker)"""
+    rows = await conn.fetch(
+        """
+        UPDATE email_outbox
+        SET status = 'sending', attempts = attempts + 1, locked_at = NOW()
+        WHERE id IN (
+            SELECT id FROM email_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= NOW())
+               OR (status = 'sending' AND locked_at < NOW() - make_interval(secs => $2))
+            ORDER BY next_attempt_at
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, kind, recipient, payload, attempts, max_attempts, created_at
+        """,
+        limit, LEASE_SECONDS
+    )
+    
+    batch = []
+    for row in rows:
+        item = dict(row)
+        item["payload"] = json.loads(item["payload"])
+        batch.append(item)
+    return batch
+
+async def mark_sent(conn, outbox_id: int):
+    await conn.execute(
+        """
+        UPDATE email_outbox
+        SET status = 'sent', sent_at = NOW(), locked_at = NULL, last_error = NULL
+        WHERE id = $1
+        """,
+        outbox_id
+    )
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff: base * 2^(attempts-1), capped"""
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+async def mark_failed(conn, item: Dict[str, Any], error: str) -> bool:
+    """Schedule a retry, or give up once max_attempts is reached. Returns True if retried."""
+    retry = item["attempts"] < item["max_attempts"]
+    await conn.execute(
+        """
+        UPDATE email_outbox
+        SET status = $2,
+            next_attempt_at = NOW() + make_interval(secs => $3),
+            locked_at = NULL,
+            last_error = $4
+        WHERE id = $1
+        """,
+        item["id"],
+        "pending" if retry else "failed",
+        backoff_seconds(item["attempts"]) if retry else 0.0,
+        error[:1000]
+    )
+    return retry
+
+async def stats(conn) -> Dict[str, Any]:
+    """Backlog size, lag of the oldest due email and failure counts"""
+    row = await conn.fetchrow(
+        """
+        SELECT
+            COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+            COUNT(*) FILTER (WHERE status = 'sending') AS sending,
+            COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+            COUNT(*) FILTER (WHERE status = 'sent' AND sent_at > NOW() - INTERVAL '1 hour') AS sent_last_hour,
+            COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+            )), 0) AS oldest_due_lag_seconds
+        FROM email_outbox
+        WHERE status <> 'sent' OR (status = 'sent' AND sent_at > NOW() - INTERVAL '1 hour')
+        """
+    )
+    return {
+        "pending": row["pending"],
+        "sending": row["sending"],
+        "failed": row["failed"],
+        "sent_last_hour": row["sent_last_hour"],
+        "oldest_due_lag_seconds": float(row["oldest_due_lag_seconds"])
+    }
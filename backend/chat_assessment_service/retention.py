@@ -0,0 +1,197 @@
+"""
+Retention job for chat transcripts.
+
+Run as a separate process (`python retention.py`, or `--once` from cron).
+Every CHAT_RETENTION_INTERVAL_SECONDS it
+
+1. creates the chat_messages partitions for the next CHAT_PARTITIONS_AHEAD
+   months (ensure_chat_message_partitions in chat_assessment_schema.sql; a
+   failure is logged and does not stop the steps below),
+2. moves the messages of sessions older than CHAT_RETENTION_DAYS (completed,
+   or started and abandoned) into chat_messages_archive, one compressed JSONB
+   transcript per session, in batches of CHAT_RETENTION_BATCH_SESSIONS with a
+   pause between batches,
+3. detaches (CONCURRENTLY) and drops partitions that lie entirely before
+   the cutoff and are empty after archiving.
+
+Live chats only write to the current month's partition and never touch
+sessions this old. Partitions are attached and detached without ACCESS
+EXCLUSIVE on chat_messages, and every statement runs with a short
+lock_timeout; if a lock is not granted in time, the batch or partition is
+left for the next run.
+"""
+import argparse
+import asyncio
+import os
+import re
+import signal
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import asyncpg
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+CHAT_RETENTION_DAYS = int(os.getenv("CHAT_RETENTION_DAYS", "365"))
+CHAT_RETENTION_BATCH_SESSIONS = int(os.getenv("CHAT_RETENTION_BATCH_SESSIONS", "200"))
+CHAT_RETENTION_PAUSE_SECONDS = float(os.getenv("CHAT_RETENTION_PAUSE_SECONDS", "0.5"))
+CHAT_RETENTION_INTERVAL_SECONDS = float(os.getenv("CHAT_RETENTION_INTERVAL_SECONDS", "3600"))
+CHAT_RETENTION_LOCK_TIMEOUT = os.getenv("CHAT_RETENTION_LOCK_TIMEOUT", "2s")
+# chat_messages has no default partition: inserts fail for months not created yet
+CHAT_PARTITIONS_AHEAD = int(os.getenv("CHAT_PARTITIONS_AHEAD", "12"))
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+_CLAIM_SQL = """
+    SELECT id, created_at FROM chat_sessions
+    WHERE messages_archived_at IS NULL
+      AND created_at < $1
+      AND (completed_at < $1 OR completed_at IS NULL)
+    ORDER BY created_at
+    LIMIT $2
+    FOR UPDATE SKIP LOCKED
+"""
+
+# $1 session ids, $2 earliest created_at in the batch: partitions before it are
+# pruned (one day of slack, messages are stamped with the service's utcnow())
+_ARCHIVE_SQL = """
+    INSERT INTO chat_messages_archive (session_id, message_count, first_message_at, last_message_at, messages)
+    SELECT session_id, count(*), min(timestamp), max(timestamp),
+           jsonb_agg(jsonb_build_object('message', message, 'is_user', is_user, 'timestamp', timestamp)
+                     ORDER BY timestamp)
+    FROM chat_messages
+    WHERE session_id = ANY($1::uuid[]) AND timestamp >= $2::timestamp - INTERVAL '1 day'
+    GROUP BY session_id
+    ON CONFLICT (session_id) DO NOTHING
+"""
+
+_DELETE_SQL = """
+    DELETE FROM chat_messages
+    WHERE session_id = ANY($1::uuid[]) AND timestamp >= $2::timestamp - INTERVAL '1 day'
+"""
+
+_PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound, i.inhdetachpending
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'chat_messages'::regclass
+"""
+
+async def ensure_partitions(conn) -> int:
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL lock_timeout = '{CHAT_RETENTION_LOCK_TIMEOUT}'")
+        return await conn.fetchval("SELECT ensure_chat_message_partitions($1)", CHAT_PARTITIONS_AHEAD)
+
+async def archive_batch(conn, cutoff: datetime) -> int:
+    """Archive one batch of sessions; number of sessions archived"""
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL lock_timeout = '{CHAT_RETENTION_LOCK_TIMEOUT}'")
+        sessions = await conn.fetch(_CLAIM_SQL, cutoff, CHAT_RETENTION_BATCH_SESSIONS)
+        if not sessions:
+            return 0
+        ids = [s["id"] for s in sessions]
+        earliest = min(s["created_at"] for s in sessions)
+        await conn.execute(_ARCHIVE_SQL, ids, earliest)
+        await conn.execute(_DELETE_SQL, ids, earliest)
+        await conn.execute(
+            "UPDATE chat_sessions SET messages_archived_at = CURRENT_TIMESTAMP WHERE id = ANY($1::uuid[])", ids
+        )
+    return len(ids)
+
+async def expired_partitions(conn, cutoff: datetime) -> List[Tuple[str, bool]]:
+    """(name, detach pending) of range partitions whose upper bound is at or before the cutoff"""
+    partitions = []
+    for row in await conn.fetch(_PARTITIONS_SQL):
+        match = _UPPER_BOUND.search(row["bound"])
+        if match and datetime.fromisoformat(match.group(1)) <= cutoff:
+            partitions.append((row["relname"], row["inhdetachpending"]))
+    return partitions
+
+async def drop_partition(conn, name: str, detach_pending: bool = False) -> bool:
+    """Detach and drop an empty partition; False if it still has rows or a lock timed out"""
+    if await conn.fetchval(f'SELECT EXISTS (SELECT 1 FROM "{name}")'):
+        return False
+    try:
+        # CONCURRENTLY cannot run in a transaction block; session setting, reset when
+        # the connection goes back to the pool
+        await conn.execute(f"SET lock_timeout = '{CHAT_RETENTION_LOCK_TIMEOUT}'")
+        if detach_pending:
+            # An earlier concurrent detach was interrupted after its first transaction
+            await conn.execute(f'ALTER TABLE chat_messages DETACH PARTITION "{name}" FINALIZE')
+        else:
+            await conn.execute(f'ALTER TABLE chat_messages DETACH PARTITION "{name}" CONCURRENTLY')
+        await conn.execute(f'DROP TABLE "{name}"')
+        return True
+    except asyncpg.LockNotAvailableError:
+        print(f"Retention: {name} busy, retrying next run")
+        return False
+    except asyncpg.ObjectNotInPrerequisiteStateError as e:
+        # e.g. a chat_messages_default partition left in place by migration 012
+        print(f"Retention: cannot detach {name}: {e}")
+        return False
+
+async def run_once(pool, stop: Optional[asyncio.Event] = None):
+    start = time.monotonic()
+    cutoff = datetime.utcnow() - timedelta(days=CHAT_RETENTION_DAYS)
+    created = 0
+    try:
+        async with pool.acquire() as conn:
+            created = await ensure_partitions(conn)
+    except asyncpg.PostgresError as e:
+        # Archiving and dropping do not depend on new partitions
+        print(f"Retention: creating partitions failed: {e}")
+
+    archived = 0
+    while stop is None or not stop.is_set():
+        try:
+            async with pool.acquire() as conn:
+                count = await archive_batch(conn, cutoff)
+        except asyncpg.LockNotAvailableError:
+            print("Retention: batch hit lock_timeout, retrying next run")
+            break
+        archived += count
+        if count < CHAT_RETENTION_BATCH_SESSIONS:
+            break
+        await asyncio.sleep(CHAT_RETENTION_PAUSE_SECONDS)
+
+    dropped = []
+    async with pool.acquire() as conn:
+        for name, detach_pending in await expired_partitions(conn, cutoff):
+            if await drop_partition(conn, name, detach_pending):
+                dropped.append(name)
+
+    print(
+        f"Retention: {created} partitions created, {archived} sessions archived, "
+        f"dropped {', '.join(dropped) or 'no partitions'} "
+        f"(cutoff {cutoff:%Y-%m-%d}, {time.monotonic() - start:.1f}s)"
+    )
+
+async def run(once: bool = False):
+    pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=1)
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"Retention job started (retention={CHAT_RETENTION_DAYS}d, batch={CHAT_RETENTION_BATCH_SESSIONS})")
+    try:
+        while not stop.is_set():
+            try:
+                await run_once(pool, stop)
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+            if once:
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=CHAT_RETENTION_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await pool.close()
+        print("Retention job stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old chat transcripts and maintain chat_messages partitions")
+    parser.add_argument("--once", action="store_true", help="run one pass and exit")
+    asyncio.run(run(parser.parse_args().once))
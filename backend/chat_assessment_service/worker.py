@@ -0,0 +1,121 @@
+"""
+Email outbox worker for the chat assessment service.
+
+Run as a separate process (`python worker.py`). It drains email_outbox
+concurrently, retries failed sends with exponential backoff and logs
+throughput/lag so mail delivery never competes with API request handling.
+"""
+import asyncio
+import os
+import signal
+import time
+from datetime import datetime
+
+import asyncpg
+
+import mailer
+import outbox
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "2"))
+STATS_INTERVAL_SECONDS = float(os.getenv("OUTBOX_STATS_INTERVAL_SECONDS", "60"))
+
+class WorkerMetrics:
+    def __init__(self):
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.delivery_lag_total = 0.0
+        self.window_started = time.monotonic()
+        self.window_sent = 0
+
+    def record_sent(self, lag_seconds: float):
+        self.sent += 1
+        self.window_sent += 1
+        self.delivery_lag_total += lag_seconds
+
+    def throughput(self) -> float:
+        """Emails per second since the last report"""
+        elapsed = time.monotonic() - self.window_started
+        rate = self.window_sent / elapsed if elapsed > 0 else 0.0
+        self.window_started = time.monotonic()
+        self.window_sent = 0
+        return rate
+
+def render(item):
+    if item["kind"] == outbox.KIND_INVITATION:
+        p = item["payload"]
+        return mailer.build_invitation_message(p["email"], p["name"], p["company"], p["sender"], p["token"])
+    raise ValueError(f"Unknown outbox kind: {item['kind']}")
+
+async def process(pool, item, semaphore, metrics: WorkerMetrics):
+    try:
+        if not mailer.smtp_configured():
+            raise RuntimeError("Email configuration missing")
+        msg = render(item)
+        async with semaphore:
+            await asyncio.to_thread(mailer.deliver_message, item["recipient"], msg)
+    except Exception as e:
+        async with pool.acquire() as conn:
+            retried = await outbox.mark_failed(conn, item, str(e))
+        if retried:
+            metrics.retried += 1
+            print(f"Outbox email {item['id']} to {item['recipient']} failed (attempt {item['attempts']}), will retry: {e}")
+        else:
+            metrics.failed += 1
+            print(f"Outbox email {item['id']} to {item['recipient']} failed permanently: {e}")
+        return
+    
+    async with pool.acquire() as conn:
+        await outbox.mark_sent(conn, item["id"])
+    # created_at is a naive UTC TIMESTAMP column
+    lag = (datetime.utcnow() - item["created_at"]).total_seconds()
+    metrics.record_sent(lag)
+    print(f"Invitation email sent to {item['recipient']}")
+
+async def report(pool, metrics: WorkerMetrics):
+    async with pool.acquire() as conn:
+        backlog = await outbox.stats(conn)
+    avg_lag = metrics.delivery_lag_total / metrics.sent if metrics.sent else 0.0
+    print(
+        f"Outbox worker: {metrics.throughput():.2f} emails/s, sent={metrics.sent} "
+        f"retried={metrics.retried} failed={metrics.failed} avg_delivery_lag={avg_lag:.1f}s | "
+        f"pending={backlog['pending']} oldest_due_lag={backlog['oldest_due_lag_seconds']:.1f}s"
+    )
+
+async def run():
+    pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=CONCURRENCY + 1)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    metrics = WorkerMetrics()
+    stop = asyncio.Event()
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    print(f"Outbox worker started (batch={BATCH_SIZE}, concurrency={CONCURRENCY})")
+    last_report = time.monotonic()
+    try:
+        while not stop.is_set():
+            async with pool.acquire() as conn:
+                batch = await outbox.claim_batch(conn, BATCH_SIZE)
+            
+            if batch:
+                await asyncio.gather(*(process(pool, item, semaphore, metrics) for item in batch))
+            else:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            
+            if time.monotonic() - last_report >= STATS_INTERVAL_SECONDS:
+                await report(pool, metrics)
+                last_report = time.monotonic()
+    finally:
+        await pool.close()
+        print("Outbox worker stopped")
+
+if __name__ == "__main__":
+    asyncio.run(run())
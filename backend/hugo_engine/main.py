@@ -1,7 +1,8 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import asyncpg
+from shared import instrumentation, tracing, health, fastjson
+from shared.db import db, setup as setup_database
 import os
 import uuid
 from typing import List, Optional, Dict, Any
@@ -16,10 +17,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+instrumentation.instrument(app)
+tracing.instrument(app, "hugo-engine")
 
 # Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+setup_database(app, DATABASE_URL)
+health.install(app, "hugo-engine", {"database": health.check_database})
+
 # Pydantic models
 class HugoType(BaseModel):
     id: str
@@ -46,24 +52,32 @@ class PersonalityAnalysis(BaseModel):
 
 # Database connection
 async def get_db_connection():
-    return await asyncpg.connect(DATABASE_URL)
+    return await db.acquire()
+
+# Type catalogue and communication matrix, for CATALOG_CACHE_SECONDS
+catalog_cache = fastjson.JSONCache()
+HUGO_TYPE_JSON_COLUMNS = ("strengths", "development_areas", "communication_style")
 
 @app.get("/types", response_model=List[HugoType])
 async def get_all_hugo_types():
     """Get all Hugo personality types"""
-    conn = await get_db_connection()
-    try:
-        types = await conn.fetch(
-            """
-            SELECT id, code, name, dimension, description, 
-                   strengths, development_areas, communication_style
-            FROM hugo_types
-            ORDER BY dimension, code
-            """
-        )
-        return [HugoType(**dict(type_record)) for type_record in types]
-    finally:
-        await conn.close()
+    async def load():
+        conn = await get_db_connection()
+        try:
+            types = await conn.fetch(
+                """
+                SELECT id, code, name, dimension, description, 
+                       strengths, development_areas, communication_style
+                FROM hugo_types
+                ORDER BY dimension, code
+                """
+            )
+            return [fastjson.row_dict(type_record, HUGO_TYPE_JSON_COLUMNS) for type_record in types]
+        finally:
+            await conn.close()
+    
+    # Served as cached pre-serialized JSON; response_model documents the shape
+    return await catalog_cache.response("types", load)
 
 @app.get("/types/{type_code}", response_model=HugoType)
 async def get_hugo_type(type_code: str):
@@ -90,24 +104,27 @@ async def get_hugo_type(type_code: str):
 @app.get("/communication-matrix", response_model=List[CommunicationMatrix])
 async def get_communication_matrix():
     """Get the full communication matrix between all Hugo types"""
-    conn = await get_db_connection()
-    try:
-        matrix = await conn.fetch(
-            """
-            SELECT 
-                ht1.code as type_a_code,
-                ht2.code as type_b_code,
-                cm.synergy_level,
-                cm.communication_tips
-            FROM communication_matrix cm
-            JOIN hugo_types ht1 ON cm.type_a_id = ht1.id
-            JOIN hugo_types ht2 ON cm.type_b_id = ht2.id
-            ORDER BY ht1.code, ht2.code
-            """
-        )
-        return [CommunicationMatrix(**dict(record)) for record in matrix]
-    finally:
-        await conn.close()
+    async def load():
+        conn = await get_db_connection()
+        try:
+            matrix = await conn.fetch(
+                """
+                SELECT 
+                    ht1.code as type_a_code,
+                    ht2.code as type_b_code,
+                    cm.synergy_level,
+                    cm.communication_tips
+                FROM communication_matrix cm
+                JOIN hugo_types ht1 ON cm.type_a_id = ht1.id
+                JOIN hugo_types ht2 ON cm.type_b_id = ht2.id
+                ORDER BY ht1.code, ht2.code
+                """
+            )
+            return [dict(record) for record in matrix]
+        finally:
+            await conn.close()
+    
+    return await catalog_cache.response("communication-matrix", load)
 
 @app.get("/communication/{type_a}/{type_b}")
 async def get_communication_advice(type_a: str, type_b: str):
@@ -171,57 +188,59 @@ async def analyze_personality_scores(scores: Dict[str, float]):
     Analyze personality assessment scores and determine Hugo type
     Expected input: {"Vision": 0.8, "Innovation": 0.6, "Expertise": 0.4, "Connection": 0.7}
     """
+    conn = await get_db_connection()
+    try:
+        return await analyze_scores_with(conn, scores)
+    finally:
+        await conn.close()
+
+async def analyze_scores_with(conn, scores: Dict[str, float]) -> PersonalityAnalysis:
+    """analyze-scores on the caller's connection (in-process dispatch, shared/engine.py)"""
     # Find the dominant dimension
     dominant_dimension = max(scores.keys(), key=lambda k: scores[k])
     dominant_score = scores[dominant_dimension]
     
-    # Determine specific type within dimension based on score patterns
-    conn = await get_db_connection()
-    try:
-        # Get all types in the dominant dimension
-        types_in_dimension = await conn.fetch(
-            """
-            SELECT id, code, name, dimension, description, 
-                   strengths, development_areas, communication_style
-            FROM hugo_types
-            WHERE dimension = $1
-            ORDER BY code
-            """,
-            dominant_dimension
-        )
-        
-        if not types_in_dimension:
-            raise HTTPException(status_code=400, detail="Invalid dimension")
-        
-        # Simple algorithm to determine specific type
-        # This can be enhanced with more sophisticated scoring
-        if len(types_in_dimension) >= 3:
-            if dominant_score >= 0.8:
-                selected_type = types_in_dimension[0]  # First type (e.g., V1, I1, E1, C1)
-            elif dominant_score >= 0.6:
-                selected_type = types_in_dimension[1]  # Second type (e.g., V2, I2, E2, C2)
-            else:
-                selected_type = types_in_dimension[2]  # Third type (e.g., V3, I3, E3, C3)
+    # Determine specific type within dimension: all types in the dominant dimension
+    types_in_dimension = await conn.fetch(
+        """
+        SELECT id, code, name, dimension, description, 
+               strengths, development_areas, communication_style
+        FROM hugo_types
+        WHERE dimension = $1
+        ORDER BY code
+        """,
+        dominant_dimension
+    )
+    
+    if not types_in_dimension:
+        raise HTTPException(status_code=400, detail="Invalid dimension")
+    
+    # Simple algorithm to determine specific type
+    # This can be enhanced with more sophisticated scoring
+    if len(types_in_dimension) >= 3:
+        if dominant_score >= 0.8:
+            selected_type = types_in_dimension[0]  # First type (e.g., V1, I1, E1, C1)
+        elif dominant_score >= 0.6:
+            selected_type = types_in_dimension[1]  # Second type (e.g., V2, I2, E2, C2)
         else:
-            selected_type = types_in_dimension[0]
-        
-        # Calculate secondary traits
-        secondary_traits = []
-        sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        for dimension, score in sorted_scores[1:]:
-            if score >= 0.5:
-                secondary_traits.append(f"Strong {dimension} tendencies")
-        
-        return PersonalityAnalysis(
-            primary_type=HugoType(**dict(selected_type)),
-            secondary_traits=secondary_traits,
-            strengths=selected_type["strengths"],
-            development_areas=selected_type["development_areas"],
-            communication_preferences=selected_type["communication_style"]
-        )
+            selected_type = types_in_dimension[2]  # Third type (e.g., V3, I3, E3, C3)
+    else:
+        selected_type = types_in_dimension[0]
     
-    finally:
-        await conn.close()
+    # Calculate secondary traits
+    secondary_traits = []
+    sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    for dimension, score in sorted_scores[1:]:
+        if score >= 0.5:
+            secondary_traits.append(f"Strong {dimension} tendencies")
+    
+    return PersonalityAnalysis(
+        primary_type=HugoType(**dict(selected_type)),
+        secondary_traits=secondary_traits,
+        strengths=selected_type["strengths"],
+        development_areas=selected_type["development_areas"],
+        communication_preferences=selected_type["communication_style"]
+    )
 
 @app.get("/health")
 async def health_check():
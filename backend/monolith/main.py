@@ -0,0 +1,84 @@
+"""
+Single-process deployment: all five services in one ASGI app.
+
+    python -m shared.server monolith.main:app --port 8000   (from backend/)
+
+Each service's main.py is loaded unchanged and mounted under the prefix nginx
+routes to it (/api/hugo, /api/assessments, /api/teams, /api/chat-assessment;
+the user service keeps the rest of /api: /api/auth, /api/companies, ...).
+Starlette does not run lifespan events of mounted apps, so the services'
+startup/shutdown handlers are run from here.
+
+All services use shared.db's `db`, so a worker has one pool sized by the
+launcher for the whole process. With HUGO_ENGINE_IN_PROCESS (default) the
+assessment and chat services call the engine's handler directly instead of
+over HTTP (shared/engine.py).
+"""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import PlainTextResponse  # noqa: E402
+
+from shared import engine, health, instrumentation  # noqa: E402
+from shared.db import db  # noqa: E402
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+HUGO_ENGINE_IN_PROCESS = os.getenv("HUGO_ENGINE_IN_PROCESS", "true").lower() == "true"
+
+# (path prefix, service directory); matched in order, so /api comes last
+SERVICES = (
+    ("/api/hugo", "hugo_engine"),
+    ("/api/assessments", "assessment_service"),
+    ("/api/teams", "team_service"),
+    ("/api/chat-assessment", "chat_assessment_service"),
+    ("/api", "user_service"),
+)
+
+def load_service(directory: str):
+    """Import <directory>/main.py; its sibling modules (export, passwords, ...) resolve via sys.path"""
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.append(path)
+    spec = importlib.util.spec_from_file_location(f"{directory}_main", os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+services = {directory: load_service(directory) for _, directory in SERVICES}
+
+app = FastAPI(title="Hugo App - Monolith", version="2.0.0")
+
+for prefix, directory in SERVICES:
+    app.mount(prefix, services[directory].app)
+
+health.install(app, "hugo-monolith", {"database": health.check_database})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # One registry for all mounted services; their own /metrics return the same
+    return PlainTextResponse(instrumentation.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def startup():
+    # Opened first so every service's db.connect() joins this pool
+    await db.connect(DATABASE_URL)
+    if HUGO_ENGINE_IN_PROCESS:
+        engine.serve_in_process(services["hugo_engine"].analyze_scores_with)
+    for _, directory in SERVICES:
+        await services[directory].app.router.startup()
+    print(f"Monolith: {', '.join(f'{d} at {p}' for p, d in SERVICES)}; "
+          f"hugo-engine {'in process' if engine.in_process() else 'over HTTP'}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    for _, directory in reversed(SERVICES):
+        await services[directory].app.router.shutdown()
+    engine.serve_in_process(None)
+    await db.close()
@@ -0,0 +1 @@
+"""Code shared by all Hugo backend services (copied into every service image)."""
@@ -0,0 +1,194 @@
+"""
+Per-tenant rate limiting and load shedding in front of a service.
+
+`install(app, routes)` adds a pure ASGI middleware that, before routing:
+
+1. limits every tenant (company_id of the bearer token, else the client IP
+   from shared/proxy.py) to TENANT_RATE_PER_SECOND requests with bursts of
+   TENANT_RATE_BURST: 429,
+2. limits each tenant per route for the given (and RATE_LIMIT_ROUTES) route
+   templates, e.g. bulk imports and invitations: 429,
+3. sheds load while the process is overloaded: 503 with Retry-After for
+   tenants that have used more than ADMISSION_SHED_BELOW of their burst, so
+   the tenant causing the load is turned away first.
+
+Overload is measured by a background sampler every ADMISSION_SAMPLE_SECONDS:
+event-loop lag (how late a sleep wakes up) and the average pool acquire wait
+of the samples' interval, from the db_acquire_duration_seconds histogram
+(or the whole interval if no acquire finished while callers are waiting;
+connections merely held by long-running work do not count). It
+starts when either crosses ADMISSION_LOOP_LAG_MS / ADMISSION_POOL_WAIT_MS and
+ends when both are below half of it. All state is in process memory; the
+check per request is a few dict lookups. Health and metrics endpoints are
+never limited.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+from shared import instrumentation, proxy
+from shared.auth import InvalidToken, verifier
+from shared.ratelimit import TokenBucketLimiter
+
+TENANT_RATE_PER_SECOND = float(os.getenv("TENANT_RATE_PER_SECOND", "50"))
+TENANT_RATE_BURST = float(os.getenv("TENANT_RATE_BURST", "100"))
+# "METHOD /route/{param}=rate/burst" per tenant, comma separated; overrides install() defaults
+RATE_LIMIT_ROUTES = os.getenv("RATE_LIMIT_ROUTES", "")
+ADMISSION_POOL_WAIT_MS = float(os.getenv("ADMISSION_POOL_WAIT_MS", "100"))
+ADMISSION_LOOP_LAG_MS = float(os.getenv("ADMISSION_LOOP_LAG_MS", "100"))
+ADMISSION_SAMPLE_SECONDS = float(os.getenv("ADMISSION_SAMPLE_SECONDS", "0.25"))
+ADMISSION_SHED_BELOW = float(os.getenv("ADMISSION_SHED_BELOW", "0.5"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+
+EXEMPT_PREFIXES = ("/health", "/metrics")
+
+admission_rejected = instrumentation.Counter(
+    "admission_rejected_total", "Requests rejected before reaching a handler", ("reason",))
+admission_loop_lag = instrumentation.Gauge(
+    "admission_event_loop_lag_seconds", "Smoothed event-loop lag")
+admission_pool_wait = instrumentation.Gauge(
+    "admission_pool_wait_seconds", "Smoothed average DB pool acquire wait")
+admission_overloaded = instrumentation.Gauge(
+    "admission_overloaded", "1 while load is being shed")
+
+# One bucket per tenant for the whole process, also when several services share it
+tenant_limiter = TokenBucketLimiter(rate=TENANT_RATE_PER_SECOND, burst=TENANT_RATE_BURST)
+
+class LoadMonitor:
+    """Samples event-loop lag and pool acquire wait; `overloaded` has hysteresis"""
+
+    def __init__(self, interval: float = ADMISSION_SAMPLE_SECONDS, smoothing: float = 0.5):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.loop_lag = 0.0
+        self.pool_wait = 0.0
+        self.overloaded = False
+        self._task: Optional[asyncio.Task] = None
+        self._acquires = instrumentation.db_acquire_seconds.totals()
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _sample_pool_wait(self, elapsed: float) -> float:
+        count, total = instrumentation.db_acquire_seconds.totals()
+        last_count, last_total = self._acquires
+        self._acquires = (count, total)
+        if count > last_count:
+            return (total - last_total) / (count - last_count)
+        # No acquire finished: idle (possibly with every connection busy), or callers stuck waiting
+        return elapsed if instrumentation.db_acquire_waiting.value() > 0 else 0.0
+
+    def _update(self, loop_lag: float, pool_wait: float):
+        a = self.smoothing
+        self.loop_lag = a * loop_lag + (1 - a) * self.loop_lag
+        self.pool_wait = a * pool_wait + (1 - a) * self.pool_wait
+        lag_limit = ADMISSION_LOOP_LAG_MS / 1000.0
+        wait_limit = ADMISSION_POOL_WAIT_MS / 1000.0
+        if not self.overloaded and (self.loop_lag > lag_limit or self.pool_wait > wait_limit):
+            self.overloaded = True
+            print(f"Admission: shedding load (loop lag {self.loop_lag * 1000:.0f}ms, "
+                  f"pool wait {self.pool_wait * 1000:.0f}ms)")
+        elif self.overloaded and self.loop_lag < lag_limit / 2 and self.pool_wait < wait_limit / 2:
+            self.overloaded = False
+            print("Admission: load back to normal")
+        admission_loop_lag.set(value=self.loop_lag)
+        admission_pool_wait.set(value=self.pool_wait)
+        admission_overloaded.set(value=1 if self.overloaded else 0)
+
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            elapsed = time.monotonic() - start
+            self._update(max(0.0, elapsed - self.interval), self._sample_pool_wait(elapsed))
+
+monitor = LoadMonitor()
+
+def _route_pattern(template: str):
+    return re.compile("^" + re.sub(r"\\\{[^}]*\\\}", "[^/]+", re.escape(template)) + "$")
+
+def parse_routes(spec: str) -> Dict[str, Tuple[float, float]]:
+    """'POST /members/batch=0.5/5,...' -> {'POST /members/batch': (0.5, 5.0)}"""
+    routes = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        route, _, limit = entry.rpartition("=")
+        rate, _, burst = limit.partition("/")
+        routes[" ".join(route.split())] = (float(rate), float(burst or rate))
+    return routes
+
+def tenant_key(scope) -> Hashable:
+    authorization = None
+    real_ip = None
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            authorization = value.decode("latin-1")
+        elif name == b"x-real-ip":
+            real_ip = value.decode("latin-1")
+    if authorization and authorization[:7].lower() == "bearer ":
+        try:
+            # Cached by the verifier; the route's own auth dependency hits the same entry
+            claims = verifier.verify(authorization[7:].strip())
+            if claims.get("company_id") is not None:
+                return ("company", claims["company_id"])
+            return ("user", claims.get("user_id"))
+        except InvalidToken:
+            pass  # the route answers 401 itself
+    client = scope.get("client")
+    # X-Real-IP only from TRUSTED_PROXIES, a forged header must not buy a fresh bucket
+    return ("ip", proxy.client_ip(client[0] if client else None, real_ip) or "unknown")
+
+async def _reject(send, status: int, detail: str, retry_after: int):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    def __init__(self, app, routes: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.app = app
+        self.routes = [
+            (route.split(" ", 1)[0], _route_pattern(route.split(" ", 1)[1]), route,
+             TokenBucketLimiter(rate=rate, burst=burst))
+            for route, (rate, burst) in (routes or {}).items()
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            return await self.app(scope, receive, send)
+        monitor.ensure_started()
+
+        key = tenant_key(scope)
+        if not tenant_limiter.allow(key):
+            admission_rejected.inc("tenant_rate")
+            return await _reject(send, 429, "Too many requests", tenant_limiter.retry_after(key))
+
+        method, path = scope["method"], scope["path"]
+        for route_method, pattern, route, limiter in self.routes:
+            if route_method == method and pattern.match(path):
+                if not limiter.allow((key, route)):
+                    admission_rejected.inc("route_rate")
+                    return await _reject(send, 429, "Too many requests", limiter.retry_after((key, route)))
+                break
+
+        if monitor.overloaded and tenant_limiter.tokens(key) < TENANT_RATE_BURST * ADMISSION_SHED_BELOW:
+            admission_rejected.inc("overload")
+            return await _reject(send, 503, "Service overloaded, please retry", ADMISSION_RETRY_AFTER_SECONDS)
+
+        await self.app(scope, receive, send)
+
+def install(app, routes: Optional[Dict[str, Tuple[float, float]]] = None):
+    """Limit and shed requests to `app`; `routes` maps 'METHOD /template' to (rate/s, burst) per tenant"""
+    limits = dict(routes or {})
+    limits.update(parse_routes(RATE_LIMIT_ROUTES))
+    app.add_middleware(AdmissionMiddleware, routes=limits)
@@ -0,0 +1,244 @@
+"""
+In-process audit sink for the audit_logs table.
+
+Handlers call `audit_log.record(...)`: the event is serialized and appended
+to a bounded in-memory queue, no I/O on the request path. A background task
+writes the queue with COPY (`copy_records_to_table`) every
+AUDIT_FLUSH_INTERVAL_MS, or as soon as AUDIT_BATCH_SIZE events are waiting.
+
+Backpressure: when AUDIT_QUEUE_MAX_EVENTS are waiting (database slow or
+down), `record()` drops the event and counts it in audit_events_total
+{outcome="dropped"}. Events that must not be lost use `await
+audit_log.write(...)`, which waits up to AUDIT_WRITE_TIMEOUT_SECONDS for
+room instead. A batch that fails on a connection error is put back in
+front of the queue; a batch COPY rejects for its data (e.g. a user id that
+no longer exists) is retried row by row so only the bad rows are lost.
+
+Ids that are not integers (the uuid team/assessment ids) are stored in
+entity_key instead of entity_id.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Optional
+
+import asyncpg
+
+from shared import instrumentation, proxy
+from shared.auth import InvalidToken, verifier
+from shared.db import db
+
+AUDIT_QUEUE_MAX_EVENTS = int(os.getenv("AUDIT_QUEUE_MAX_EVENTS", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL_MS = float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+AUDIT_WRITE_TIMEOUT_SECONDS = float(os.getenv("AUDIT_WRITE_TIMEOUT_SECONDS", "2"))
+
+COLUMNS = (
+    "user_id", "company_id", "action", "entity_type", "entity_id", "entity_key",
+    "old_values", "new_values", "ip_address", "user_agent", "created_at"
+)
+
+audit_events = instrumentation.Counter(
+    "audit_events_total", "Audit events by outcome (queued, written, dropped, failed)", ("outcome",))
+audit_queue_depth = instrumentation.Gauge(
+    "audit_queue_depth", "Audit events waiting to be written")
+audit_flush_seconds = instrumentation.Histogram(
+    "audit_flush_duration_seconds", "Time to COPY one batch of audit events")
+
+def _int_or_none(value) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def _ip(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(value)
+    except ValueError:
+        return None
+
+def _json(value: Optional[dict]) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+def request_context(request) -> dict:
+    """Caller IP, user agent and, if a valid bearer token is sent, user and company id"""
+    headers = request.headers
+    context = {
+        # X-Real-IP only from nginx (TRUSTED_PROXIES), callers must not choose their logged address
+        "ip_address": proxy.request_ip(request),
+        "user_agent": headers.get("user-agent"),
+    }
+    authorization = headers.get("authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        try:
+            # Claims are cached by the verifier, so this is a dict lookup after auth ran
+            claims = verifier.verify(authorization[7:].strip())
+            context["user_id"] = claims.get("user_id")
+            context["company_id"] = claims.get("company_id")
+        except InvalidToken:
+            pass
+    return context
+
+class AuditLog:
+    def __init__(
+        self,
+        max_events: int = AUDIT_QUEUE_MAX_EVENTS,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        interval: float = AUDIT_FLUSH_INTERVAL_MS / 1000.0
+    ):
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = deque()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._users = 0
+
+    def _row(self, action, entity_type=None, entity_id=None, user_id=None, company_id=None,
+             old_values=None, new_values=None, request=None, ip_address=None, user_agent=None) -> tuple:
+        if request is not None:
+            context = request_context(request)
+            ip_address = ip_address or context["ip_address"]
+            user_agent = user_agent or context["user_agent"]
+            user_id = user_id if user_id is not None else context.get("user_id")
+            company_id = company_id if company_id is not None else context.get("company_id")
+        entity_int = _int_or_none(entity_id)
+        return (
+            _int_or_none(user_id), _int_or_none(company_id), action, entity_type,
+            entity_int, str(entity_id) if entity_id is not None and entity_int is None else None,
+            _json(old_values), _json(new_values), _ip(ip_address), user_agent, datetime.utcnow()
+        )
+
+    def _enqueue(self, row: tuple) -> bool:
+        if len(self._queue) >= self.max_events:
+            audit_events.inc("dropped")
+            return False
+        self._queue.append(row)
+        audit_events.inc("queued")
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def record(
+        self,
+        action: str,
+        entity_type: Optional[str] = None,
+        entity_id: Any = None,
+        *,
+        user_id: Optional[int] = None,
+        company_id: Optional[int] = None,
+        old_values: Optional[dict] = None,
+        new_values: Optional[dict] = None,
+        request=None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> bool:
+        """Queue an audit event; False if the queue is full and the event was dropped"""
+        return self._enqueue(self._row(
+            action, entity_type, entity_id, user_id, company_id,
+            old_values, new_values, request, ip_address, user_agent
+        ))
+
+    async def write(self, action: str, entity_type: Optional[str] = None, entity_id: Any = None,
+                    *, timeout: float = AUDIT_WRITE_TIMEOUT_SECONDS, **kwargs) -> bool:
+        """Like record(), but waits up to `timeout` seconds for room in a full queue"""
+        row = self._row(action, entity_type, entity_id, **kwargs)
+        deadline = time.monotonic() + timeout
+        while len(self._queue) >= self.max_events:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._space.clear()
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+        return self._enqueue(row)
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def _copy(self, conn, batch) -> None:
+        start = time.perf_counter()
+        try:
+            await conn.copy_records_to_table("audit_logs", records=batch, columns=COLUMNS)
+            audit_events.inc("written", amount=len(batch))
+        except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError) as e:
+            print(f"Audit batch of {len(batch)} rejected ({e}), retrying row by row")
+            for row in batch:
+                try:
+                    await conn.copy_records_to_table("audit_logs", records=[row], columns=COLUMNS)
+                    audit_events.inc("written")
+                except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError) as row_error:
+                    audit_events.inc("failed")
+                    print(f"Audit event {row[2]} dropped: {row_error}")
+        finally:
+            audit_flush_seconds.observe(time.perf_counter() - start)
+
+    def _requeue(self, batch):
+        self._queue.extendleft(reversed(batch))
+        # Keep the oldest events, drop what no longer fits
+        while len(self._queue) > self.max_events:
+            self._queue.pop()
+            audit_events.inc("dropped")
+
+    async def flush(self):
+        """Write everything queued so far, batch by batch"""
+        try:
+            while self._queue and db.pool is not None:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._space.set()
+                try:
+                    conn = await db.acquire()
+                    try:
+                        await self._copy(conn, batch)
+                    finally:
+                        await conn.close()
+                except Exception as e:
+                    print(f"Failed to write {len(batch)} audit events: {e}")
+                    self._requeue(batch)
+                    break
+        finally:
+            audit_queue_depth.set(value=len(self._queue))
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def start(self):
+        # Shared by all services of a monolith process: one writer task
+        self._users += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._users = max(0, self._users - 1)
+        if self._users or self._task is None:
+            return
+        # Not cancelled: a COPY in progress finishes, then the loop drains the queue
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._stopping = False
+        if self._queue:
+            print(f"Audit log stopped with {len(self._queue)} unwritten events")
+
+audit_log = AuditLog()
+
+def setup(app):
+    """Run the writer while the app is up; call after shared.db.setup()"""
+    app.add_event_handler("startup", audit_log.start)
+    # First shutdown handler: the final flush still needs the pool db.close() releases
+    app.router.on_shutdown.insert(0, audit_log.stop)
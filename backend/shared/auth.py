@@ -0,0 +1,176 @@
+"""
+Stateless JWT verification shared by the Hugo services.
+
+Tokens are issued by user_service (`create_access_token`, HS256). Verifying
+them here needs no DB round-trip: the HMAC key is prepared once, decoded
+claims are kept in an LRU cache keyed by a hash of the token (entries never
+outlive the token's `exp`), and an optional bloom filter rejects revoked
+token ids without a lookup in the common case.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request, status
+
+JWT_SECRET = os.getenv("JWT_SECRET", "hugo-secret-key-2024")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "10000"))
+JWT_LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "0"))
+
+_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+class InvalidToken(Exception):
+    pass
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+class BloomFilter:
+    """Fixed-size bloom filter for revoked token ids (`jti`)"""
+
+    def __init__(self, size_bits: int = 1 << 20, hash_count: int = 4):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=8 * self.hash_count).digest()
+        for i in range(self.hash_count):
+            yield int.from_bytes(digest[i * 8:(i + 1) * 8], "little") % self.size_bits
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+class TokenVerifier:
+    """
+    Verifies HS* JWTs and caches decoded claims.
+
+    `is_revoked(jti)` is only consulted when the bloom filter reports a hit,
+    so an exact (possibly slow) revocation check stays off the hot path.
+    """
+
+    def __init__(
+        self,
+        secret: str = JWT_SECRET,
+        algorithm: str = JWT_ALGORITHM,
+        cache_size: int = JWT_CLAIMS_CACHE_SIZE,
+        leeway: int = JWT_LEEWAY_SECONDS,
+        revoked: Optional[BloomFilter] = None,
+        is_revoked: Optional[Callable[[str], bool]] = None
+    ):
+        if algorithm not in _DIGESTS:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self._mac = hmac.new(secret.encode(), digestmod=_DIGESTS[algorithm])
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self.revoked = revoked
+        self.is_revoked = is_revoked
+        self._cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+    def revoke(self, jti: str):
+        if self.revoked is None:
+            self.revoked = BloomFilter()
+        self.revoked.add(jti)
+        # Drop any cached claims carrying this jti
+        for key, (claims, _) in list(self._cache.items()):
+            if claims.get("jti") == jti:
+                del self._cache[key]
+
+    def _check_revoked(self, claims: Dict[str, Any]):
+        jti = claims.get("jti")
+        if self.revoked is None or jti is None or jti not in self.revoked:
+            return
+        if self.is_revoked is None or self.is_revoked(jti):
+            raise InvalidToken("Token has been revoked")
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        try:
+            signing_input, _, signature = token.rpartition(".")
+            header_segment, _, payload_segment = signing_input.partition(".")
+            header = json.loads(_b64decode(header_segment))
+            if header.get("alg") != self.algorithm:
+                raise InvalidToken("Unexpected token algorithm")
+            mac = self._mac.copy()
+            mac.update(signing_input.encode())
+            if not hmac.compare_digest(mac.digest(), _b64decode(signature)):
+                raise InvalidToken("Invalid token signature")
+            claims = json.loads(_b64decode(payload_segment))
+        except InvalidToken:
+            raise
+        except Exception:
+            raise InvalidToken("Malformed token")
+        if not isinstance(claims, dict):
+            raise InvalidToken("Malformed token")
+        return claims
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        now = time.time()
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cache = self._cache
+        
+        entry = cache.get(key)
+        if entry is not None:
+            claims, expires = entry
+            if now < expires:
+                cache.move_to_end(key)
+                self._check_revoked(claims)
+                return claims
+            del cache[key]
+            raise InvalidToken("Token has expired")
+        
+        claims = self._decode(token)
+        exp = claims.get("exp")
+        if exp is None:
+            raise InvalidToken("Token has no expiry")
+        expires = float(exp) + self.leeway
+        if now >= expires:
+            raise InvalidToken("Token has expired")
+        nbf = claims.get("nbf")
+        if nbf is not None and now < float(nbf) - self.leeway:
+            raise InvalidToken("Token not yet valid")
+        self._check_revoked(claims)
+        
+        cache[key] = (claims, expires)
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return claims
+
+verifier = TokenVerifier()
+
+async def require_claims(request: Request) -> Dict[str, Any]:
+    """FastAPI dependency: decoded JWT claims of the bearer token, or 401"""
+    authorization = request.headers.get("authorization")
+    if not authorization or authorization[:7].lower() != "bearer ":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    try:
+        return verifier.verify(authorization[7:].strip())
+    except InvalidToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+def require_role(*roles: str):
+    """FastAPI dependency factory restricting access to the given user roles"""
+    async def dependency(request: Request) -> Dict[str, Any]:
+        claims = await require_claims(request)
+        if claims.get("role") not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+        return claims
+    return dependency
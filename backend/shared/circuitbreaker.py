@@ -0,0 +1,122 @@
+"""
+Circuit breaker for calls to slow or unreliable dependencies.
+
+The breaker watches the last `window` calls. Once at least `min_calls` have
+been recorded and either the failure rate or the share of calls slower than
+`slow_call_seconds` crosses its threshold, the breaker opens and `allow()`
+returns False, so callers go straight to their fallback instead of waiting
+out a timeout. After `open_seconds` it lets `half_open_calls` probes through;
+if they all succeed it closes again, any failure reopens it. A call that
+was allowed but ends without an outcome (cancelled) hands its probe slot
+back with `release()`.
+"""
+import time
+from collections import deque
+from typing import Callable, Optional
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Numeric encoding for gauges
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1,
+        on_transition: Optional[Callable[[str, str], None]] = None
+    ):
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.on_transition = on_transition
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._calls = deque(maxlen=window)  # (failed, slow) per call
+        self._failures = 0
+        self._slow = 0
+        self._probes = 0
+        self._probe_successes = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (reserves a probe slot when half-open)"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                return False
+            self._probes += 1
+        return True
+
+    def release(self, calls: int = 1):
+        """Return the probe slots of allowed calls that will never record an outcome"""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - calls)
+
+    def record(self, success: bool, duration: float):
+        slow = duration > self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if not success or slow:
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            return  # late result of a call started before opening
+
+        if len(self._calls) == self._calls.maxlen:
+            old_failed, old_slow = self._calls[0]
+            self._failures -= old_failed
+            self._slow -= old_slow
+        self._calls.append((not success, slow))
+        self._failures += not success
+        self._slow += slow
+
+        calls = len(self._calls)
+        if calls >= self.min_calls and (
+            self._failures / calls >= self.failure_rate or self._slow / calls >= self.slow_call_rate
+        ):
+            self._open()
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through (0 unless open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> dict:
+        calls = len(self._calls)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": round(self._failures / calls, 4) if calls else 0.0,
+            "slow_call_rate": round(self._slow / calls, 4) if calls else 0.0,
+            "retry_after": round(self.retry_after(), 1)
+        }
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        # Every state starts with a clean window
+        self._calls.clear()
+        self._failures = self._slow = 0
+        self._probes = self._probe_successes = 0
+        if self.on_transition is not None and previous != state:
+            self.on_transition(previous, state)
@@ -0,0 +1,79 @@
+"""
+Per-process asyncpg connection pool shared by a service's request handlers.
+
+`get_db_connection()` in each service returns `await db.acquire()`; the
+returned connection's `close()` releases it back to the pool, so handlers
+keep their existing try/finally shape.
+
+When several services run in one process (monolith/main.py) they all call
+connect()/close() on the same `db`: the first connect() opens the pool, later
+ones share it, and the pool is closed by the last close().
+
+Connections held for the life of the process (LISTEN) are opened with
+`connect_dedicated()` outside the pool, so they never take a slot from
+request handlers; the launcher reserves DB_DEDICATED_CONNECTIONS of the
+connection budget per worker for them (shared/server.py).
+"""
+import os
+from typing import Any, Dict, Optional
+
+import asyncpg
+
+from shared import instrumentation
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("DB_ACQUIRE_TIMEOUT_SECONDS", "10"))
+
+class Database:
+    def __init__(self):
+        self.pool: Optional[instrumentation.InstrumentedPool] = None
+        self._users = 0
+        self._dsn: Optional[str] = None
+
+    async def connect(self, dsn: Optional[str] = None, **kwargs):
+        self._users += 1
+        if self.pool is not None:
+            return
+        self._dsn = dsn
+        kwargs.setdefault("min_size", DB_POOL_MIN_SIZE)
+        kwargs.setdefault("max_size", DB_POOL_MAX_SIZE)
+        self.pool = await instrumentation.create_pool(dsn, **kwargs)
+
+    async def close(self):
+        self._users = max(0, self._users - 1)
+        if self._users == 0 and self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def acquire(self, timeout: float = DB_ACQUIRE_TIMEOUT_SECONDS) -> instrumentation.InstrumentedConnection:
+        return await self.pool.acquire(timeout=timeout)
+
+    async def connect_dedicated(self) -> asyncpg.Connection:
+        """A connection of its own, outside the pool; the caller closes it"""
+        return await asyncpg.connect(self._dsn)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.pool is None:
+            return {"connected": False}
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        max_size = self.pool.get_max_size()
+        return {
+            "connected": True,
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "max_size": max_size,
+            "available": idle + (max_size - size)
+        }
+
+db = Database()
+
+def setup(app, dsn: Optional[str] = None, **kwargs):
+    """Open the pool on startup and close it on shutdown"""
+    async def startup():
+        await db.connect(dsn, **kwargs)
+    
+    app.add_event_handler("startup", startup)
+    app.add_event_handler("shutdown", db.close)
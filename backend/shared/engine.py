@@ -0,0 +1,67 @@
+"""
+Calls into the Hugo engine from other services.
+
+Normally `analyze_scores()` posts to HUGO_ENGINE_URL/analyze-scores. In the
+single-process deployment (monolith/main.py) the engine's handler is
+registered with `serve_in_process()` and awaited directly: no HTTP
+round-trip, no JSON encode/decode of the request, same result shape.
+Callers holding a pooled connection pass it as `conn`; the in-process
+engine runs its queries on it instead of acquiring a second connection
+from the shared pool (N concurrent callers would otherwise hold all N
+connections and wait for each other).
+"""
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from shared import health, instrumentation, tracing
+from shared.db import db
+
+HUGO_ENGINE_URL = os.getenv("HUGO_ENGINE_URL", "http://hugo-engine:8002")
+
+# (conn, scores) -> PersonalityAnalysis
+Analyzer = Callable[[Any, Dict[str, float]], Awaitable[Any]]
+
+_local_analyzer: Optional[Analyzer] = None
+_check_remote = health.downstream(HUGO_ENGINE_URL)
+
+def serve_in_process(analyzer: Optional[Analyzer]):
+    """Dispatch analyze_scores() to `analyzer` in this process (None: back to HTTP)"""
+    global _local_analyzer
+    _local_analyzer = analyzer
+
+def in_process() -> bool:
+    return _local_analyzer is not None
+
+async def analyze_scores(scores: Dict[str, float], conn=None) -> Optional[Dict[str, Any]]:
+    """PersonalityAnalysis as JSON-compatible dict; None if the engine rejected the scores"""
+    if _local_analyzer is not None:
+        with tracing.span("hugo-engine analyze_scores", attributes={"hugo.in_process": True}):
+            try:
+                if conn is not None:
+                    return jsonable_encoder(await _local_analyzer(conn, scores))
+                conn = await db.acquire()
+                try:
+                    return jsonable_encoder(await _local_analyzer(conn, scores))
+                finally:
+                    await conn.close()
+            except HTTPException:
+                return None
+            except Exception as e:
+                # Same outcome as a 500 from the engine over HTTP
+                print(f"In-process hugo-engine analysis failed: {e!r}")
+                return None
+
+    async with instrumentation.http_client() as client:
+        response = await client.post(f"{HUGO_ENGINE_URL}/analyze-scores", json=scores)
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+async def check() -> Dict[str, Any]:
+    """Readiness check for callers: the engine is live (always, when in process)"""
+    if _local_analyzer is not None:
+        return {"in_process": True}
+    return await _check_remote()
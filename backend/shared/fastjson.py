@@ -0,0 +1,90 @@
+"""
+Fast JSON responses for large record lists.
+
+Returning a Response from an endpoint makes FastAPI skip response_model
+validation and serialization, so endpoints keep `response_model=...` for
+the OpenAPI schema and return `records_response(rows)` instead of one
+Pydantic model per row. asyncpg records are serialized by orjson directly
+(UUID, datetime and Decimal included); JSON/JSONB columns, which asyncpg
+returns as text, are embedded without a decode/encode round-trip.
+
+`TTLCache` keeps rarely-changing values (type catalogue, communication
+matrix) for a fixed time; `JSONCache` is a TTLCache of pre-serialized
+response bodies. Both default to CATALOG_CACHE_SECONDS.
+"""
+import asyncio
+import os
+import time
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+import orjson
+from fastapi.responses import Response
+
+# The catalogue tables change only with migrations
+CATALOG_CACHE_SECONDS = float(os.getenv("CATALOG_CACHE_SECONDS", "300"))
+
+# orjson >= 3.9 embeds pre-serialized JSON as is; older versions decode it first
+_embed_json = getattr(orjson, "Fragment", orjson.loads)
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ORJSONBytesResponse(Response):
+    media_type = "application/json"
+
+def row_dict(record, json_columns: Iterable[str] = ()) -> Dict[str, Any]:
+    row = dict(record)
+    for column in json_columns:
+        value = row.get(column)
+        if isinstance(value, (str, bytes)):
+            row[column] = _embed_json(value)
+    return row
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+def records_response(records, json_columns: Tuple[str, ...] = ()) -> Response:
+    """JSON array of asyncpg records, serialized in one orjson call"""
+    if json_columns:
+        content = [row_dict(record, json_columns) for record in records]
+    else:
+        content = [dict(record) for record in records]
+    return ORJSONBytesResponse(dumps(content))
+
+def json_response(content: Any) -> Response:
+    return ORJSONBytesResponse(dumps(content))
+
+class TTLCache:
+    """Values reloaded after `ttl` seconds (one loader run per key at a time)"""
+
+    def __init__(self, ttl: float = CATALOG_CACHE_SECONDS):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                entry = self._entries.get(key)
+                if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                    entry = self._entries[key] = (time.monotonic(), await loader())
+        return entry[1]
+
+    def invalidate(self, key: str = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+class JSONCache(TTLCache):
+    """Pre-serialized response bodies"""
+
+    async def response(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Response:
+        async def load() -> bytes:
+            return dumps(await loader())
+        return ORJSONBytesResponse(await self.get(key, load))
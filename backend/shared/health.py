@@ -0,0 +1,116 @@
+"""
+Liveness and readiness endpoints.
+
+`/health/live` only says the process is serving. `/health/ready` runs the
+service's dependency checks (pool availability plus a timed `SELECT 1`,
+downstream services, ...) and answers 503 if a critical one fails. Results
+are cached for HEALTH_CACHE_SECONDS and concurrent probes share one run, so
+frequent probing adds no load.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from shared import instrumentation
+from shared.db import db
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "2"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+Check = Callable[[], Awaitable[Dict[str, Any]]]
+
+class CheckFailed(Exception):
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.details = details or {}
+
+async def check_database() -> Dict[str, Any]:
+    """Pool has capacity and the database answers SELECT 1"""
+    stats = db.stats()
+    if not stats["connected"]:
+        raise CheckFailed("pool not initialised", stats)
+    if stats["available"] == 0:
+        raise CheckFailed("pool exhausted", stats)
+    start = time.perf_counter()
+    conn = await db.acquire(timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+    try:
+        await conn.fetchval("SELECT 1")
+    finally:
+        await conn.close()
+    stats["select_1_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return stats
+
+def downstream(base_url: str) -> Check:
+    """Check that another service reports itself live"""
+    async def check() -> Dict[str, Any]:
+        start = time.perf_counter()
+        async with instrumentation.http_client(timeout=HEALTH_CHECK_TIMEOUT_SECONDS) as client:
+            response = await client.get(f"{base_url}/health/live")
+        latency = round((time.perf_counter() - start) * 1000, 2)
+        if response.status_code != 200:
+            raise CheckFailed(f"HTTP {response.status_code}", {"latency_ms": latency})
+        return {"latency_ms": latency}
+    return check
+
+class Readiness:
+    def __init__(self, service: str, checks: Dict[str, Check], optional: tuple = ()):
+        self.service = service
+        self.checks = checks
+        self.optional = set(optional)
+        self._result: Optional[Dict[str, Any]] = None
+        self._expires = 0.0
+        self._running: Optional[asyncio.Task] = None
+
+    async def _run_check(self, name: str, check: Check) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(check(), timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+            result = {"status": "ok", **details}
+        except CheckFailed as e:
+            result = {"status": "fail", "error": str(e), **e.details}
+        except asyncio.TimeoutError:
+            result = {"status": "fail", "error": "timeout"}
+        except Exception as e:
+            result = {"status": "fail", "error": f"{type(e).__name__}: {e}"}
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    async def _evaluate(self) -> Dict[str, Any]:
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(n, self.checks[n]) for n in names))
+        checks = dict(zip(names, results))
+        ready = all(r["status"] == "ok" for n, r in checks.items() if n not in self.optional)
+        return {"status": "ready" if ready else "not_ready", "service": self.service, "checks": checks}
+
+    async def result(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        if self._result is not None and now < self._expires:
+            return self._result
+        # Single flight: concurrent probes wait for the same evaluation
+        if self._running is None:
+            self._running = asyncio.ensure_future(self._evaluate())
+        try:
+            result = await asyncio.shield(self._running)
+        finally:
+            self._running = None
+        self._result = result
+        self._expires = time.monotonic() + HEALTH_CACHE_SECONDS
+        return result
+
+def install(app, service: str, checks: Dict[str, Check], optional: tuple = ()) -> Readiness:
+    """Add /health/live and /health/ready to a service"""
+    readiness = Readiness(service, checks, optional)
+    
+    @app.get("/health/live")
+    async def liveness():
+        return {"status": "alive", "service": service}
+    
+    @app.get("/health/ready")
+    async def readiness_check():
+        result = await readiness.result()
+        return JSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
+    
+    return readiness
@@ -0,0 +1,324 @@
+"""
+Prometheus-style metrics for the Hugo services.
+
+`instrument(app)` adds a low-overhead ASGI middleware recording request
+latency per route and a `/metrics` endpoint in the Prometheus text format.
+`connect()`/`InstrumentedPool` time DB acquisition and every query by
+statement name, and `http_client()` times outbound httpx calls. Metrics are
+kept in process memory; there is no external dependency.
+"""
+import asyncio
+import re
+import sys
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from shared import tracing
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def total(self) -> float:
+        """Sum over all label sets"""
+        return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in self._values.items()
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def totals(self, *labels) -> Tuple[int, float]:
+        """(observation count, sum) of one label set"""
+        series = self._series.get(labels)
+        if series is None:
+            return 0, 0.0
+        return int(sum(series[:-1])), series[-1]
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+REGISTRY: List[Metric] = []
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Inbound HTTP request latency", ("method", "route", "status"))
+db_acquire_seconds = Histogram(
+    "db_acquire_duration_seconds", "Time to obtain a database connection")
+db_acquire_waiting = Gauge(
+    "db_acquire_waiting", "Callers currently waiting for a database connection")
+db_query_seconds = Histogram(
+    "db_query_duration_seconds", "Database statement latency", ("statement",))
+db_query_errors = Counter(
+    "db_query_errors_total", "Database statements that raised", ("statement",))
+http_client_seconds = Histogram(
+    "http_client_duration_seconds", "Outbound HTTP call latency", ("host", "method", "status"))
+
+# ---------------------------------------------------------------------------
+# Inbound requests
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Label by route template, never by raw path, to keep cardinality bounded
+            http_request_seconds.observe(
+                time.perf_counter() - start,
+                scope["method"], route.path if route is not None else "unmatched", status_code
+            )
+
+def instrument(app: FastAPI):
+    """Add request metrics and a /metrics endpoint to a service"""
+    app.add_middleware(MetricsMiddleware)
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# ---------------------------------------------------------------------------
+# Database
+
+_SQL_TARGET = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+@lru_cache(maxsize=2048)
+def statement_name(caller: str, query: str) -> str:
+    """e.g. 'get_team:select:teams' - calling function, SQL verb and first table"""
+    words = query.split(None, 1)
+    verb = words[0].lower() if words else "unknown"
+    target = _SQL_TARGET.search(query)
+    return f"{caller}:{verb}:{target.group(1) if target else '-'}"
+
+class InstrumentedConnection:
+    """asyncpg connection proxy timing each statement; close() returns pooled connections"""
+
+    def __init__(self, conn, pool=None):
+        self._conn = conn
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    async def _timed(self, method, query, args, kwargs, caller):
+        name = statement_name(caller, query)
+        span = tracing.start_child(name, tracing.KIND_CLIENT, {"db.system": "postgresql"}) if tracing.ENABLED else None
+        start = time.perf_counter()
+        try:
+            result = await method(query, *args, **kwargs)
+        except Exception as e:
+            db_query_errors.inc(name)
+            if span is not None:
+                span.end(e)
+            raise
+        finally:
+            db_query_seconds.observe(time.perf_counter() - start, name)
+        if span is not None:
+            span.end()
+        return result
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self._timed(self._conn.fetch, query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self._timed(self._conn.fetchrow, query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self._timed(self._conn.fetchval, query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def execute(self, query, *args, **kwargs):
+        return await self._timed(self._conn.execute, query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def executemany(self, query, args, **kwargs):
+        return await self._timed(self._conn.executemany, query, (args,), kwargs, sys._getframe(1).f_code.co_name)
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.release(self._conn)
+        else:
+            await self._conn.close()
+
+async def connect(dsn: Optional[str], **kwargs) -> InstrumentedConnection:
+    start = time.perf_counter()
+    conn = await asyncpg.connect(dsn, **kwargs)
+    db_acquire_seconds.observe(time.perf_counter() - start)
+    return InstrumentedConnection(conn)
+
+class InstrumentedPool:
+    """asyncpg pool wrapper recording acquire wait and per-statement latency"""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    async def acquire(self, timeout: Optional[float] = None) -> InstrumentedConnection:
+        start = time.perf_counter()
+        db_acquire_waiting.inc()
+        try:
+            conn = await self._pool.acquire(timeout=timeout)
+        finally:
+            db_acquire_waiting.inc(amount=-1)
+        db_acquire_seconds.observe(time.perf_counter() - start)
+        return InstrumentedConnection(conn, self._pool)
+
+    async def _run(self, method, query, args, kwargs, caller):
+        conn = await self.acquire()
+        try:
+            return await conn._timed(getattr(conn._conn, method), query, args, kwargs, caller)
+        finally:
+            await conn.close()
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self._run("fetch", query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self._run("fetchrow", query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self._run("fetchval", query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+    async def execute(self, query, *args, **kwargs):
+        return await self._run("execute", query, args, kwargs, sys._getframe(1).f_code.co_name)
+
+async def create_pool(dsn: Optional[str] = None, **kwargs) -> InstrumentedPool:
+    return InstrumentedPool(await asyncpg.create_pool(dsn, **kwargs))
+
+# ---------------------------------------------------------------------------
+# Outbound HTTP
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Times every request and ends its client span, including requests that
+    fail (connect errors, timeouts) or are cancelled: those are recorded with
+    the exception name as status.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        span = None
+        if tracing.ENABLED:
+            span = tracing.start_child(f"HTTP {request.method} {request.url.host}", tracing.KIND_CLIENT, {
+                "http.method": request.method,
+                "http.url": str(request.url)
+            })
+            traceparent = tracing.outbound_traceparent(span)
+            if traceparent is not None:
+                request.headers["traceparent"] = traceparent
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as e:
+            status = "cancelled" if isinstance(e, asyncio.CancelledError) else type(e).__name__
+            http_client_seconds.observe(time.perf_counter() - start, request.url.host, request.method, status)
+            if span is not None:
+                span.end(e)
+            raise
+        http_client_seconds.observe(time.perf_counter() - start, request.url.host, request.method, response.status_code)
+        if span is not None:
+            span.attributes["http.status_code"] = response.status_code
+            span.end()
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def http_client(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient whose calls are recorded in http_client_duration_seconds"""
+    transport = kwargs.pop("transport", None) or httpx.AsyncHTTPTransport()
+    return httpx.AsyncClient(transport=InstrumentedTransport(transport), **kwargs)
@@ -0,0 +1,41 @@
+"""
+Client addresses behind the nginx reverse proxy.
+
+nginx passes the address it received a request from in X-Real-IP. The
+service ports are published directly as well, so that header is only
+believed when the connection comes from one of TRUSTED_PROXIES
+(comma-separated IP addresses; the nginx container in docker-compose);
+any other caller is identified by its socket address. The same list is
+given to gunicorn/uvicorn as forwarded_allow_ips (shared/server.py).
+"""
+import ipaddress
+import os
+from typing import FrozenSet, Optional
+
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1")
+
+def _parse(value: str) -> FrozenSet[str]:
+    addresses = set()
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            addresses.add(str(ipaddress.ip_address(entry)))
+        except ValueError:
+            print(f"TRUSTED_PROXIES: ignoring {entry!r}, not an IP address")
+    return frozenset(addresses)
+
+trusted_proxies = _parse(TRUSTED_PROXIES)
+
+def is_trusted(host: Optional[str]) -> bool:
+    return host is not None and host in trusted_proxies
+
+def client_ip(peer: Optional[str], real_ip: Optional[str]) -> Optional[str]:
+    """Address of the client: X-Real-IP if `peer` is a trusted proxy, else `peer`"""
+    if real_ip and is_trusted(peer):
+        return real_ip.strip()
+    return peer
+
+def request_ip(request) -> Optional[str]:
+    return client_ip(request.client.host if request.client else None, request.headers.get("x-real-ip"))
@@ -0,0 +1,55 @@
+"""
+In-memory token-bucket rate limiting.
+
+Buckets live in the process, so checks cost a dict lookup and never touch
+the database. Limits are per worker process.
+"""
+import time
+from typing import Dict, Hashable, List
+
+class TokenBucketLimiter:
+    """One bucket per key: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[Hashable, List[float]] = {}
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return True
+        return False
+
+    def tokens(self, key: Hashable) -> float:
+        """Tokens `key` currently holds, without taking any"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (time.monotonic() - bucket[1]) * self.rate)
+
+    def retry_after(self, key: Hashable, cost: float = 1.0) -> int:
+        """Seconds until `cost` tokens are available for `key`"""
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket[0] >= cost or self.rate <= 0:
+            return 0
+        return int((cost - bucket[0]) / self.rate) + 1
+
+    def _prune(self, now: float):
+        # Forget buckets that have refilled completely; they behave like new keys
+        full = [key for key, (tokens, last) in self._buckets.items()
+                if tokens + (now - last) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
@@ -0,0 +1,134 @@
+"""
+Production launcher shared by all Hugo services.
+
+    python -m shared.server main:app --port 8003
+
+Runs gunicorn with uvicorn workers (uvloop event loop, httptools parser):
+one worker per available CPU (cgroup quota aware) unless WEB_CONCURRENCY is
+set. Workers are recycled after SERVER_MAX_REQUESTS (+ jitter) requests and
+replaced by the arbiter without dropping connections.
+
+The per-worker DB pool is sized so that workers x pool never exceeds the
+service's share of Postgres max_connections (DB_CONNECTION_BUDGET). The
+launcher exports DB_POOL_MAX_SIZE/DB_POOL_MIN_SIZE before the workers fork,
+and shared/db.py reads them. DB_DEDICATED_CONNECTIONS per worker are kept
+out of the pool for connections held outside it (the user service's LISTEN
+connection). Proxy headers are only trusted from
+TRUSTED_PROXIES (shared/proxy.py).
+"""
+import argparse
+import importlib.util
+import math
+import os
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.util import import_app
+from uvicorn.workers import UvicornWorker
+
+from shared import proxy
+
+SERVER_KEEPALIVE_SECONDS = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "5"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "60"))
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by a cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+def _cgroup_cpu_quota():
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+def plan_workers(workers: int, budget: int, pool_max: int, pool_min: int, dedicated: int = 0):
+    """Workers and per-worker pool sizes that fit into `budget` connections"""
+    # Each worker needs at least one pool connection besides its dedicated ones
+    fits = max(1, budget // (1 + dedicated))
+    if workers > fits:
+        print(f"⚠️ {workers} workers do not fit DB_CONNECTION_BUDGET={budget}; running {fits}")
+        workers = fits
+    pool_max = max(1, min(pool_max, budget // workers - dedicated))
+    return workers, pool_max, min(pool_min, pool_max)
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+    }
+
+class Server(BaseApplication):
+    def __init__(self, app: str, settings: dict):
+        self.app = app
+        self.settings = settings
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.settings.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return import_app(self.app)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Hugo service with multiple uvicorn workers")
+    parser.add_argument("app", help="ASGI app, e.g. main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+
+    workers = int(os.getenv("WEB_CONCURRENCY") or available_cpus())
+    pool_max = int(os.getenv("DB_POOL_MAX_SIZE") or 10)
+    pool_min = int(os.getenv("DB_POOL_MIN_SIZE") or 2)
+    dedicated = int(os.getenv("DB_DEDICATED_CONNECTIONS") or 0)
+    budget = int(os.getenv("DB_CONNECTION_BUDGET") or workers * (pool_max + dedicated))
+    workers, pool_max, pool_min = plan_workers(workers, budget, pool_max, pool_min, dedicated)
+    os.environ["DB_POOL_MAX_SIZE"] = str(pool_max)
+    os.environ["DB_POOL_MIN_SIZE"] = str(pool_min)
+
+    print(
+        f"🚀 {args.app} on {args.host}:{args.port}: {workers} workers "
+        f"({Worker.CONFIG_KWARGS['loop']}/{Worker.CONFIG_KWARGS['http']}), "
+        f"DB pool {pool_min}-{pool_max} (+{dedicated} dedicated) per worker, budget {budget}"
+    )
+    Server(args.app, {
+        "bind": f"{args.host}:{args.port}",
+        "workers": workers,
+        "worker_class": "shared.server.Worker",
+        "keepalive": SERVER_KEEPALIVE_SECONDS,
+        "backlog": SERVER_BACKLOG,
+        "max_requests": SERVER_MAX_REQUESTS,
+        "max_requests_jitter": SERVER_MAX_REQUESTS_JITTER,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "timeout": SERVER_TIMEOUT,
+        # X-Forwarded-For/-Proto only from nginx; direct callers cannot choose request.client
+        "forwarded_allow_ips": ",".join(sorted(proxy.trusted_proxies)) or "127.0.0.1",
+    }).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Lightweight distributed tracing with W3C `traceparent` propagation.
+
+`instrument(app, service)` starts a server span per inbound request (joining
+the caller's trace if a traceparent header is present). Child spans are
+created for asyncpg statements and httpx calls by shared.instrumentation and
+for OpenAI calls by the chat service. Finished spans are batched and written
+as OTLP/JSON either to a local file or to an OTLP/HTTP collector.
+
+Configuration:
+  TRACE_EXPORTER       none (default) | file | otlp
+  TRACE_FILE           path for the file exporter (one OTLP/JSON batch per line)
+  TRACE_OTLP_ENDPOINT  e.g. http://otel-collector:4318/v1/traces
+  TRACE_SAMPLE_RATIO   fraction of new traces recorded (default 0.01); callers'
+                       sampling decisions are honoured
+"""
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT") or "http://otel-collector:4318/v1/traces"
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.01"))
+TRACE_EXPORT_INTERVAL_SECONDS = float(os.getenv("TRACE_EXPORT_INTERVAL_SECONDS", "5"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
+
+ENABLED = TRACE_EXPORTER in ("file", "otlp")
+
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "sampled", "name", "kind",
+                 "start_ns", "end_ns", "attributes", "error", "service")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], sampled: bool, name: str, kind: int,
+                 attributes: Optional[Dict[str, Any]] = None, service: str = "unknown"):
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error = None
+        # service.name of the export; per span because the monolith runs several services
+        self.service = service
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self, error: Optional[BaseException] = None):
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            exporter.submit(self)
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def start_child(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+    """Child of the current span, or None when there is no (sampled) trace in progress"""
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        return None
+    return Span(parent.trace_id, parent.span_id, True, name, kind, attributes, parent.service)
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    child = start_child(name, kind, attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    else:
+        child.end()
+    finally:
+        _current.reset(token)
+
+def outbound_traceparent(child: Optional[Span]) -> Optional[str]:
+    """Header value for an outbound call: the client span, else the current (unsampled) context"""
+    if child is not None:
+        return child.traceparent
+    parent = _current.get()
+    return parent.traceparent if parent is not None else None
+
+# ---------------------------------------------------------------------------
+# Export
+
+def _attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Exporter:
+    """Buffers finished spans and ships them as OTLP/JSON batches"""
+
+    def __init__(self):
+        self.queue: List[Span] = []
+        self.dropped = 0
+        self._task = None
+
+    def submit(self, finished: Span):
+        if len(self.queue) >= TRACE_MAX_QUEUE:
+            self.dropped += 1
+            return
+        self.queue.append(finished)
+
+    def _payload(self, spans: List[Span]) -> str:
+        by_service: Dict[str, List[Span]] = {}
+        for s in spans:
+            by_service.setdefault(s.service, []).append(s)
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_attr("service.name", service)]},
+            "scopeSpans": [{
+                "scope": {"name": "hugo.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": s.kind,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [_attr(k, v) for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1}
+                } for s in service_spans]
+            }]
+        } for service, service_spans in by_service.items()]})
+
+    async def flush(self):
+        if not self.queue:
+            return
+        batch, self.queue = self.queue, []
+        payload = self._payload(batch)
+        try:
+            if TRACE_EXPORTER == "file":
+                await asyncio.to_thread(self._append_file, payload)
+            elif TRACE_EXPORTER == "otlp":
+                import httpx
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    await client.post(TRACE_OTLP_ENDPOINT, content=payload,
+                                      headers={"Content-Type": "application/json"})
+        except asyncio.CancelledError:
+            # Stopped mid-export: stop() sends the batch again
+            self.queue[:0] = batch
+            raise
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"Trace export failed ({len(batch)} spans dropped): {e}")
+
+    @staticmethod
+    def _append_file(payload: str):
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(payload + "\n")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TRACE_EXPORT_INTERVAL_SECONDS)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+exporter = Exporter()
+
+# ---------------------------------------------------------------------------
+# Inbound requests
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one server span per request, joined to the caller's trace"""
+
+    def __init__(self, app, service_name: str = "unknown"):
+        self.app = app
+        self.service_name = service_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        parent_id = None
+        match = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                match = _TRACEPARENT.match(value.decode("latin-1").strip())
+                break
+        if match:
+            trace_id, parent_id, sampled = match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+        else:
+            trace_id, sampled = "%032x" % random.getrandbits(128), random.random() < TRACE_SAMPLE_RATIO
+        
+        server = Span(trace_id, parent_id, sampled, scope["method"], KIND_SERVER, service=self.service_name)
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        token = _current.set(server)
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            if server.sampled:
+                route = scope.get("route")
+                path = route.path if route is not None else scope["path"]
+                server.name = f"{scope['method']} {path}"
+                server.attributes.update({
+                    "http.method": scope["method"],
+                    "http.route": path,
+                    "http.status_code": status_code
+                })
+                server.end(error)
+
+def instrument(app, service_name: str):
+    """Enable tracing for a service when TRACE_EXPORTER is configured"""
+    if not ENABLED:
+        return
+    app.add_middleware(TracingMiddleware, service_name=service_name)
+    app.add_event_handler("startup", exporter.start)
+    app.add_event_handler("shutdown", exporter.stop)
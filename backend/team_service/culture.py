@@ -0,0 +1,261 @@
+"""
+Culture map analysis of a team (GET /{team_id}/culture).
+
+Members' user_culture_profiles (scores 1-10 on the culture_dimensions) are
+loaded as an N x D matrix and analysed with NumPy:
+
+- per-dimension spread (mean, std, min, max, quartiles) and the member pair
+  with the largest gap on each dimension,
+- the RMS distance over all member pairs, in closed form from the
+  per-dimension variances (O(N), exact for any team size),
+- the most distant member pairs: exact from the full pairwise distance
+  matrix up to CULTURE_PAIRWISE_MAX_MEMBERS members, beyond that among the
+  members farthest from the team centroid and the per-dimension extremes
+  (the pairs that can be farthest apart),
+- members far from the team centroid (z-score above CULTURE_OUTLIER_Z).
+
+The Hugo-type synergy is computed from type counts (same scores and average
+over member pairs as calculate_team_synergy in main.py, without iterating
+the N^2 pairs) and combined with the culture cohesion.
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CULTURE_PAIRWISE_MAX_MEMBERS = int(os.getenv("CULTURE_PAIRWISE_MAX_MEMBERS", "500"))
+CULTURE_MATRIX_MAX_MEMBERS = int(os.getenv("CULTURE_MATRIX_MAX_MEMBERS", "100"))
+CULTURE_OUTLIER_CANDIDATES = int(os.getenv("CULTURE_OUTLIER_CANDIDATES", "256"))
+CULTURE_OUTLIER_Z = float(os.getenv("CULTURE_OUTLIER_Z", "2.0"))
+CULTURE_TOP_PAIRS = int(os.getenv("CULTURE_TOP_PAIRS", "10"))
+# Share of the culture cohesion in the combined score, the rest is Hugo-type synergy
+CULTURE_SYNERGY_WEIGHT = float(os.getenv("CULTURE_SYNERGY_WEIGHT", "0.3"))
+
+SCORE_MIN, SCORE_MAX = 1, 10
+
+# Same mapping as calculate_team_synergy
+SYNERGY_SCORES = {"High Synergy": 1.0, "Moderate Synergy": 0.7, "Potential Conflict": 0.4}
+CONFLICT_SCORE = 0.1
+
+_dimensions: Optional[List[Dict[str, Any]]] = None
+
+async def load_dimensions(conn) -> List[Dict[str, Any]]:
+    """culture_dimensions, ordered by id; seed data, loaded once per process"""
+    global _dimensions
+    if _dimensions is None:
+        rows = await conn.fetch(
+            "SELECT id, name, low_context_label, high_context_label FROM culture_dimensions ORDER BY id"
+        )
+        _dimensions = [dict(row) for row in rows]
+    return _dimensions
+
+async def load_profiles(conn, team_id, dimensions) -> Tuple[list, np.ndarray]:
+    """(member ids, N x D float32 matrix; NaN where a member has no score)"""
+    rows = await conn.fetch(
+        """
+        SELECT ucp.user_id, ucp.dimension_id, ucp.score
+        FROM team_members tm
+        JOIN user_culture_profiles ucp ON ucp.user_id = tm.user_id
+        WHERE tm.team_id = $1 AND ucp.score IS NOT NULL
+        """,
+        team_id
+    )
+    index: Dict[Any, int] = {}
+    member_rows = np.fromiter((index.setdefault(r[0], len(index)) for r in rows), np.int64, len(rows))
+    dimension_ids = np.fromiter((r[1] for r in rows), np.int64, len(rows))
+    scores = np.fromiter((r[2] for r in rows), np.float32, len(rows))
+
+    known = np.array([d["id"] for d in dimensions], dtype=np.int64)
+    columns = np.searchsorted(known, dimension_ids)
+    valid = (columns < len(known)) & (known[np.minimum(columns, len(known) - 1)] == dimension_ids)
+
+    matrix = np.full((len(index), len(known)), np.nan, dtype=np.float32)
+    matrix[member_rows[valid], columns[valid]] = scores[valid]
+    return list(index), matrix
+
+async def load_type_counts(conn, team_id) -> Dict[str, int]:
+    rows = await conn.fetch(
+        """
+        SELECT ht.code, count(*) AS members
+        FROM team_members tm
+        JOIN assessments a ON a.user_id = tm.user_id AND a.is_completed = true
+        JOIN hugo_types ht ON a.hugo_type_id = ht.id
+        WHERE tm.team_id = $1
+        GROUP BY ht.code
+        """,
+        team_id
+    )
+    return {row["code"]: row["members"] for row in rows}
+
+def type_synergy(type_counts: Dict[str, int], synergy_lookup: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Average pair synergy from type counts: a pair of types (a, b) occurs
+    count_a * count_b times (count_a * (count_a - 1) / 2 for a == b).
+    Unlike the member loop in calculate_team_synergy, an 'A-B' missing from
+    the matrix falls back to 'B-A', so the result does not depend on member
+    order.
+    """
+    codes = sorted(type_counts)
+    counts = np.array([type_counts[c] for c in codes], dtype=np.float64)
+    total_members = int(counts.sum())
+    if total_members < 2:
+        return {"synergy_score": 1.0, "pairs": 0, "conflicts": []}
+
+    n = len(codes)
+    scores = np.full((n, n), np.nan)
+    conflicts = []
+    for i in range(n):
+        for j in range(i, n):
+            info = synergy_lookup.get(f"{codes[i]}-{codes[j]}") or synergy_lookup.get(f"{codes[j]}-{codes[i]}")
+            if info is None:
+                continue
+            scores[i, j] = SYNERGY_SCORES.get(info["level"], CONFLICT_SCORE)
+            if info["level"] not in ("High Synergy", "Moderate Synergy"):
+                conflicts.append((i, j, info))
+
+    pair_counts = np.triu(np.outer(counts, counts), 1) + np.diag(counts * (counts - 1) / 2)
+    known = ~np.isnan(scores)
+    total_pairs = pair_counts[known].sum()
+    average = float((pair_counts[known] * scores[known]).sum() / total_pairs) if total_pairs else 1.0
+    return {
+        "synergy_score": round(average, 4),
+        "pairs": int(total_pairs),
+        "conflicts": [
+            {
+                "type_a": codes[i],
+                "type_b": codes[j],
+                "conflict_level": "Potential" if info["level"] == "Potential Conflict" else "High",
+                "member_pairs": int(pair_counts[i, j]),
+                "tips": info["tips"]
+            }
+            for i, j, info in conflicts if pair_counts[i, j] > 0
+        ]
+    }
+
+def _top_pairs(points: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(full distance matrix, i, j, distance) of the k most distant pairs, i < j"""
+    squared = np.einsum("ij,ij->i", points, points)
+    distances = squared[:, None] + squared[None, :] - 2.0 * (points @ points.T)
+    np.maximum(distances, 0, out=distances)
+    np.sqrt(distances, out=distances)
+    n = len(points)
+    # Every pair appears twice in the symmetric matrix; the diagonal is 0
+    take = min(2 * k, n * n)
+    flat = np.argpartition(distances.ravel(), -take)[-take:]
+    i, j = np.divmod(flat, n)
+    upper = i < j
+    i, j = i[upper], j[upper]
+    d = distances[i, j]
+    order = np.argsort(-d, kind="stable")[:k]
+    return distances, i[order], j[order], d[order]
+
+def analyze_matrix(
+    member_ids: Sequence,
+    matrix: np.ndarray,
+    dimensions: List[Dict[str, Any]],
+    include_matrix: bool = False
+) -> Dict[str, Any]:
+    """Culture statistics of an N x D profile matrix (NaN = missing score)"""
+    n, d = matrix.shape
+    names = [dim["name"] for dim in dimensions]
+    incomplete = int(np.isnan(matrix).any(axis=1).sum())
+    if incomplete:
+        # Missing scores count as the team's mean on that dimension (neutral in every statistic below)
+        fill = np.nanmean(np.where(np.isnan(matrix).all(axis=0), (SCORE_MIN + SCORE_MAX) / 2, matrix), axis=0)
+        matrix = np.where(np.isnan(matrix), fill, matrix)
+    points = matrix.astype(np.float64)
+
+    mean = points.mean(axis=0)
+    std = points.std(axis=0)
+    low_idx = points.argmin(axis=0)
+    high_idx = points.argmax(axis=0)
+    q1, q3 = np.percentile(points, [25, 75], axis=0)
+    spread = {}
+    largest_gaps = []
+    for k, name in enumerate(names):
+        spread[name] = {
+            "mean": round(float(mean[k]), 2),
+            "std": round(float(std[k]), 2),
+            "min": float(points[low_idx[k], k]),
+            "max": float(points[high_idx[k], k]),
+            "q1": round(float(q1[k]), 2),
+            "q3": round(float(q3[k]), 2)
+        }
+        gap = float(points[high_idx[k], k] - points[low_idx[k], k])
+        if gap > 0:
+            largest_gaps.append({
+                "dimension": name,
+                "gap": gap,
+                "low_member": str(member_ids[low_idx[k]]),
+                "low_label": dimensions[k].get("low_context_label"),
+                "high_member": str(member_ids[high_idx[k]]),
+                "high_label": dimensions[k].get("high_context_label")
+            })
+    largest_gaps.sort(key=lambda g: -g["gap"])
+
+    # Mean squared distance over pairs i < j = 2n/(n-1) * sum of per-dimension variances
+    rms_distance = float(np.sqrt(2.0 * n / (n - 1) * (std ** 2).sum())) if n > 1 else 0.0
+    max_distance = (SCORE_MAX - SCORE_MIN) * np.sqrt(d)
+    cohesion = 1.0 - rms_distance / max_distance if d else 1.0
+
+    centroid_distance = np.sqrt(((points - mean) ** 2).sum(axis=1))
+    outlier_members = []
+    if n > 2 and centroid_distance.std() > 0:
+        z = (centroid_distance - centroid_distance.mean()) / centroid_distance.std()
+        for idx in np.argsort(-z)[:CULTURE_TOP_PAIRS]:
+            if z[idx] < CULTURE_OUTLIER_Z:
+                break
+            outlier_members.append({
+                "user_id": str(member_ids[idx]),
+                "distance_from_centroid": round(float(centroid_distance[idx]), 2),
+                "z_score": round(float(z[idx]), 2)
+            })
+
+    result = {
+        "members_with_profile": n,
+        "incomplete_profiles": incomplete,
+        "dimensions": names,
+        "spread": spread,
+        "largest_gaps": largest_gaps,
+        "rms_pairwise_distance": round(rms_distance, 3),
+        "cohesion": round(float(cohesion), 4),
+        "outlier_members": outlier_members,
+        "outlier_pairs": [],
+        "pairs_exact": n <= CULTURE_PAIRWISE_MAX_MEMBERS
+    }
+    if n < 2:
+        return result
+
+    if n <= CULTURE_PAIRWISE_MAX_MEMBERS:
+        candidates = np.arange(n)
+    else:
+        # The farthest pairs are made of extreme members: far from the centroid or at a dimension's end
+        top = min(CULTURE_OUTLIER_CANDIDATES, n - 1)
+        far = np.argpartition(-centroid_distance, top)[:top]
+        candidates = np.unique(np.concatenate([far, low_idx, high_idx]))
+    distances, i, j, pair_distance = _top_pairs(points[candidates], CULTURE_TOP_PAIRS)
+    i, j = candidates[i], candidates[j]
+    result["outlier_pairs"] = [
+        {
+            "member_a": str(member_ids[a]),
+            "member_b": str(member_ids[b]),
+            "distance": round(float(dist), 3),
+            # Dimensions contributing most to this pair's distance
+            "main_differences": [
+                names[k] for k in np.argsort(-np.abs(points[a] - points[b]))[:3] if points[a, k] != points[b, k]
+            ]
+        }
+        for a, b, dist in zip(i, j, pair_distance)
+        if dist > 0  # identical profiles are not outliers
+    ]
+    if n <= CULTURE_PAIRWISE_MAX_MEMBERS:
+        result["mean_pairwise_distance"] = round(float(distances.sum() / (n * (n - 1))), 3)
+        if include_matrix and n <= CULTURE_MATRIX_MAX_MEMBERS:
+            result["members"] = [str(m) for m in member_ids]
+            result["distance_matrix"] = np.round(distances, 2).tolist()
+    return result
+
+def combined_score(hugo_synergy: Optional[float], cohesion: Optional[float]) -> Optional[float]:
+    if hugo_synergy is None or cohesion is None:
+        return hugo_synergy if cohesion is None else cohesion
+    return round((1 - CULTURE_SYNERGY_WEIGHT) * hugo_synergy + CULTURE_SYNERGY_WEIGHT * cohesion, 4)
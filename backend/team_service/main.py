@@ -1,12 +1,16 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import asyncpg
+from shared import instrumentation, tracing, health, fastjson, admission
+from shared.db import db, setup as setup_database
+from shared.audit import audit_log, setup as setup_audit
+import asyncio
 import os
 import uuid
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal
 from datetime import datetime
+import culture
 
 app = FastAPI(title="Hugo App - Team Service", version="2.0.0")
 
@@ -18,10 +22,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+admission.install(app, {"POST /members/batch": (0.5, 5)})
+instrumentation.instrument(app)
+tracing.instrument(app, "team-service")
 
 # Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 HUGO_ENGINE_URL = os.getenv("HUGO_ENGINE_URL", "http://hugo-engine:8002")
+TEAM_BATCH_MAX_CHANGES = int(os.getenv("TEAM_BATCH_MAX_CHANGES", "5000"))
+
+setup_database(app, DATABASE_URL)
+setup_audit(app)
+health.install(app, "team-service", {"database": health.check_database})
 
 # Pydantic models
 class TeamCreate(BaseModel):
@@ -33,6 +45,16 @@ class TeamMemberAdd(BaseModel):
     user_id: str
     role: Optional[str] = None
 
+class MembershipChange(BaseModel):
+    action: Literal["add", "remove", "move"]
+    user_id: str
+    team_id: str  # add/remove: the team; move: the target team
+    from_team_id: Optional[str] = None  # move only
+    role: Optional[str] = None
+
+class MembershipBatch(BaseModel):
+    changes: List[MembershipChange]
+
 class TeamMember(BaseModel):
     id: str
     user_id: str
@@ -65,10 +87,10 @@ class TeamAnalysis(BaseModel):
 
 # Database connection
 async def get_db_connection():
-    return await asyncpg.connect(DATABASE_URL)
+    return await db.acquire()
 
 @app.post("/", response_model=Dict[str, str])
-async def create_team(team: TeamCreate):
+async def create_team(team: TeamCreate, request: Request):
     """Create a new team"""
     conn = await get_db_connection()
     try:
@@ -82,6 +104,7 @@ async def create_team(team: TeamCreate):
             team_id, team.name, team.description, uuid.UUID(team.created_by)
         )
         print("Created team. ID:", str(team_id))
+        audit_log.record("team.created", "team", team_id, new_values=team.model_dump(), request=request)
         
         return {"team_id": str(team_id)}
     finally:
@@ -122,22 +145,34 @@ async def get_team(team_id: str):
             uuid.UUID(team_id)
         )
         
-        team_members = [TeamMember(**dict(member)) for member in members]
-        
-        return Team(
-            id=str(team_info["id"]),
-            name=team_info["name"],
-            description=team_info["description"],
-            created_by=str(team_info["created_by"]),
-            created_at=team_info["created_at"],
-            members=team_members
-        )
+        # Serialized without per-row models; exactly the fields and types of Team/TeamMember
+        return fastjson.json_response({
+            "id": str(team_info["id"]),
+            "name": team_info["name"],
+            "description": team_info["description"],
+            "created_by": str(team_info["created_by"]),
+            "created_at": team_info["created_at"],
+            "members": [
+                {
+                    "id": str(member["id"]),
+                    "user_id": str(member["user_id"]),
+                    "first_name": member["first_name"],
+                    "last_name": member["last_name"],
+                    "email": member["email"],
+                    "role": member["role"],
+                    "hugo_type_code": member["hugo_type_code"],
+                    "hugo_type_name": member["hugo_type_name"],
+                    "joined_at": member["joined_at"]
+                }
+                for member in members
+            ]
+        })
     
     finally:
         await conn.close()
 
 @app.post("/{team_id}/members")
-async def add_team_member(team_id: str, member: TeamMemberAdd):
+async def add_team_member(team_id: str, member: TeamMemberAdd, request: Request):
     """Add a member to a team"""
     conn = await get_db_connection()
     try:
@@ -160,7 +195,7 @@ async def add_team_member(team_id: str, member: TeamMemberAdd):
             raise HTTPException(status_code=404, detail="User not found")
         
         # Add member to team
-        await conn.execute(
+        result = await conn.execute(
             """
             INSERT INTO team_members (team_id, user_id, role)
             VALUES ($1, $2, $3)
@@ -168,6 +203,8 @@ async def add_team_member(team_id: str, member: TeamMemberAdd):
             """,
             uuid.UUID(team_id), uuid.UUID(member.user_id), member.role
         )
+        if result != "INSERT 0 0":
+            audit_log.record("team.member_added", "team", team_id, new_values=member.model_dump(), request=request)
         
         return {"message": "Member added successfully"}
     
@@ -175,7 +212,7 @@ async def add_team_member(team_id: str, member: TeamMemberAdd):
         await conn.close()
 
 @app.delete("/{team_id}/members/{user_id}")
-async def remove_team_member(team_id: str, user_id: str):
+async def remove_team_member(team_id: str, user_id: str, request: Request):
     """Remove a member from a team"""
     conn = await get_db_connection()
     try:
@@ -187,11 +224,135 @@ async def remove_team_member(team_id: str, user_id: str):
         if result == "DELETE 0":
             raise HTTPException(status_code=404, detail="Team member not found")
         
+        audit_log.record("team.member_removed", "team", team_id, old_values={"user_id": user_id}, request=request)
         return {"message": "Member removed successfully"}
     
     finally:
         await conn.close()
 
+@app.post("/members/batch")
+async def batch_update_members(batch: MembershipBatch, request: Request):
+    """
+    Add, remove and move many team members in one transaction.
+    Uses one existence check, one DELETE and one INSERT over unnest() arrays,
+    then recomputes the synergy score once per affected team.
+    """
+    if len(batch.changes) > TEAM_BATCH_MAX_CHANGES:
+        raise HTTPException(status_code=400, detail=f"At most {TEAM_BATCH_MAX_CHANGES} changes per batch")
+    
+    add_teams, add_users, add_roles = [], [], []
+    remove_teams, remove_users = [], []
+    try:
+        for change in batch.changes:
+            user_id = uuid.UUID(change.user_id)
+            team_id = uuid.UUID(change.team_id)
+            if change.action == "remove":
+                remove_teams.append(team_id)
+                remove_users.append(user_id)
+                continue
+            if change.action == "move":
+                if not change.from_team_id:
+                    raise HTTPException(status_code=400, detail="from_team_id is required for move")
+                remove_teams.append(uuid.UUID(change.from_team_id))
+                remove_users.append(user_id)
+            add_teams.append(team_id)
+            add_users.append(user_id)
+            add_roles.append(change.role)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid id: {e}")
+    
+    conn = await get_db_connection()
+    try:
+        async with conn.transaction():
+            # Every referenced team and every added user must exist
+            missing = await conn.fetch(
+                """
+                SELECT 'team' AS kind, t.id FROM unnest($1::uuid[]) AS t(id)
+                WHERE NOT EXISTS (SELECT 1 FROM teams WHERE teams.id = t.id)
+                UNION
+                SELECT 'user' AS kind, u.id FROM unnest($2::uuid[]) AS u(id)
+                WHERE NOT EXISTS (SELECT 1 FROM users WHERE users.id = u.id)
+                """,
+                list(set(add_teams + remove_teams)), list(set(add_users))
+            )
+            if missing:
+                raise HTTPException(status_code=404, detail={
+                    "missing_teams": [str(r["id"]) for r in missing if r["kind"] == "team"],
+                    "missing_users": [str(r["id"]) for r in missing if r["kind"] == "user"]
+                })
+            
+            removed = await conn.fetch(
+                """
+                DELETE FROM team_members tm
+                USING unnest($1::uuid[], $2::uuid[]) AS d(team_id, user_id)
+                WHERE tm.team_id = d.team_id AND tm.user_id = d.user_id
+                RETURNING tm.team_id
+                """,
+                remove_teams, remove_users
+            )
+            added = await conn.fetch(
+                """
+                INSERT INTO team_members (team_id, user_id, role)
+                SELECT * FROM unnest($1::uuid[], $2::uuid[], $3::text[])
+                ON CONFLICT (team_id, user_id) DO NOTHING
+                RETURNING team_id
+                """,
+                add_teams, add_users, add_roles
+            )
+            
+            affected = {r["team_id"] for r in removed} | {r["team_id"] for r in added}
+            synergy_scores = await recompute_team_synergy(conn, affected)
+        
+        audit_log.record(
+            "team.members_batch", "team",
+            new_values={"added": len(added), "removed": len(removed), "changes": len(batch.changes)},
+            request=request
+        )
+        return {
+            "added": len(added),
+            "removed": len(removed),
+            "affected_teams": {str(team_id): score for team_id, score in synergy_scores.items()}
+        }
+    
+    finally:
+        await conn.close()
+
+async def recompute_team_synergy(conn, team_ids) -> Dict[uuid.UUID, float]:
+    """Store teams.synergy_score (0-100) for the given teams; one query to read, one to write"""
+    if not team_ids:
+        return {}
+    team_ids = list(team_ids)
+    rows = await conn.fetch(
+        """
+        SELECT tm.team_id, ht.code, ht.name, ht.dimension
+        FROM team_members tm
+        JOIN users u ON tm.user_id = u.id
+        JOIN assessments a ON u.id = a.user_id AND a.is_completed = true
+        JOIN hugo_types ht ON a.hugo_type_id = ht.id
+        WHERE tm.team_id = ANY($1::uuid[])
+        """,
+        team_ids
+    )
+    members_by_team = {team_id: [] for team_id in team_ids}
+    for row in rows:
+        members_by_team[row["team_id"]].append(row)
+    
+    synergy_lookup = await load_synergy_lookup(conn)
+    scores = {}
+    for team_id, members in members_by_team.items():
+        synergy, _ = await calculate_team_synergy(conn, members, synergy_lookup)
+        scores[team_id] = round(synergy * 100, 2)
+    
+    await conn.execute(
+        """
+        UPDATE teams t SET synergy_score = v.score, updated_at = CURRENT_TIMESTAMP
+        FROM unnest($1::uuid[], $2::numeric[]) AS v(id, score)
+        WHERE t.id = v.id
+        """,
+        list(scores.keys()), list(scores.values())
+    )
+    return scores
+
 @app.get("/{team_id}/analysis", response_model=TeamAnalysis)
 async def analyze_team(team_id: str):
     """Analyze team composition and provide insights"""
@@ -258,16 +419,59 @@ async def analyze_team(team_id: str):
     finally:
         await conn.close()
 
-async def calculate_team_synergy(conn, members) -> tuple[float, List[Dict[str, Any]]]:
-    """Calculate team synergy score and identify potential conflicts"""
-    if len(members) < 2:
-        return 1.0, []
+@app.get("/{team_id}/culture")
+async def analyze_team_culture(team_id: str, include_matrix: bool = False):
+    """
+    Culture map analysis of a team (spread per dimension, largest gaps,
+    most distant member pairs, outliers) merged with the Hugo-type synergy.
+    `include_matrix` adds the pairwise distance matrix for small teams.
+    """
+    try:
+        team_uuid = uuid.UUID(team_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid team id")
     
-    total_pairs = 0
-    synergy_sum = 0
-    potential_conflicts = []
+    conn = await get_db_connection()
+    try:
+        team_info = await conn.fetchrow("SELECT name FROM teams WHERE id = $1", team_uuid)
+        if not team_info:
+            raise HTTPException(status_code=404, detail="Team not found")
+        
+        dimensions = await culture.load_dimensions(conn)
+        member_ids, matrix = await culture.load_profiles(conn, team_uuid, dimensions)
+        type_counts = await culture.load_type_counts(conn, team_uuid)
+        synergy_lookup = await load_synergy_lookup(conn) if type_counts else {}
+    finally:
+        await conn.close()
+    
+    if not member_ids and not type_counts:
+        raise HTTPException(status_code=400, detail="No team members with culture profiles or completed assessments")
     
-    # Get communication matrix
+    # NumPy releases the GIL for the pairwise part; keep the event loop free meanwhile
+    culture_result = await asyncio.to_thread(
+        culture.analyze_matrix, member_ids, matrix, dimensions, include_matrix
+    ) if member_ids else None
+    hugo_result = culture.type_synergy(type_counts, synergy_lookup) if type_counts else None
+    
+    return fastjson.json_response({
+        "team_id": team_id,
+        "team_name": team_info["name"],
+        "culture": culture_result,
+        "hugo_synergy": hugo_result,
+        "combined_score": culture.combined_score(
+            hugo_result["synergy_score"] if hugo_result else None,
+            culture_result["cohesion"] if culture_result else None
+        )
+    })
+
+# Lookups shared read-only by all requests
+catalog_cache = fastjson.TTLCache()
+
+async def load_synergy_lookup(conn) -> Dict[str, Dict[str, Any]]:
+    """Communication matrix as a lookup keyed by 'TYPE_A-TYPE_B', cached for CATALOG_CACHE_SECONDS"""
+    return await catalog_cache.get("synergy-lookup", lambda: _fetch_synergy_lookup(conn))
+
+async def _fetch_synergy_lookup(conn) -> Dict[str, Dict[str, Any]]:
     matrix = await conn.fetch(
         """
         SELECT 
@@ -287,6 +491,121 @@ async def calculate_team_synergy(conn, members) -> tuple[float, List[Dict[str, A
             "level": row["synergy_level"],
             "tips": row["communication_tips"]
         }
+    return synergy_lookup
+
+# Guide order: what needs attention first
+SYNERGY_LEVEL_ORDER = {"High Conflict": 0, "Potential Conflict": 1, "Moderate Synergy": 2, "High Synergy": 3}
+
+@app.get("/{team_id}/communication-guide")
+async def get_communication_guide(team_id: str):
+    """
+    Communication advice for every Hugo type pair present in the team, in one
+    response: each pair once (conflicts first) with the members on both sides,
+    and per member the pairs they are part of. Advice comes from the cached
+    communication matrix, so this replaces one hugo-engine call per pair.
+    """
+    try:
+        team_uuid = uuid.UUID(team_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid team id")
+    
+    conn = await get_db_connection()
+    try:
+        team_info = await conn.fetchrow("SELECT name FROM teams WHERE id = $1", team_uuid)
+        if not team_info:
+            raise HTTPException(status_code=404, detail="Team not found")
+        
+        # Latest completed assessment per member, members without one included
+        members = await conn.fetch(
+            """
+            SELECT u.id, u.first_name, u.last_name, ht.code, ht.name, ht.dimension
+            FROM team_members tm
+            JOIN users u ON u.id = tm.user_id
+            LEFT JOIN LATERAL (
+                SELECT hugo_type_id FROM assessments
+                WHERE user_id = u.id AND is_completed = true
+                ORDER BY assessment_date DESC
+                LIMIT 1
+            ) a ON true
+            LEFT JOIN hugo_types ht ON ht.id = a.hugo_type_id
+            WHERE tm.team_id = $1
+            ORDER BY u.last_name, u.first_name
+            """,
+            team_uuid
+        )
+        synergy_lookup = await load_synergy_lookup(conn)
+    finally:
+        await conn.close()
+    
+    types: Dict[str, Dict[str, Any]] = {}
+    without_type = []
+    for member in members:
+        if member["code"] is None:
+            without_type.append(str(member["id"]))
+            continue
+        entry = types.setdefault(member["code"], {
+            "name": member["name"], "dimension": member["dimension"], "members": []
+        })
+        entry["members"].append(str(member["id"]))
+    
+    codes = sorted(types)
+    pairs, missing_pairs = [], []
+    member_pairs: Dict[str, List[str]] = {}
+    for i, type_a in enumerate(codes):
+        for type_b in codes[i:]:
+            members_a, members_b = types[type_a]["members"], types[type_b]["members"]
+            if type_a == type_b and len(members_a) < 2:
+                continue
+            key = f"{type_a}-{type_b}"
+            info = synergy_lookup.get(key) or synergy_lookup.get(f"{type_b}-{type_a}")
+            if info is None:
+                missing_pairs.append(key)
+                continue
+            pairs.append({
+                "pair": key,
+                "type_a": type_a,
+                "type_b": type_b,
+                "synergy_level": info["level"],
+                "communication_tips": info["tips"],
+                "type_a_members": members_a,
+                "type_b_members": members_b,
+                "member_pairs": len(members_a) * (len(members_a) - 1) // 2 if type_a == type_b
+                                else len(members_a) * len(members_b)
+            })
+            for user_id in set(members_a) | set(members_b):
+                member_pairs.setdefault(user_id, []).append(key)
+    pairs.sort(key=lambda p: (SYNERGY_LEVEL_ORDER.get(p["synergy_level"], 0), p["pair"]))
+    
+    return fastjson.json_response({
+        "team_id": team_id,
+        "team_name": team_info["name"],
+        "members": [
+            {
+                "user_id": str(m["id"]),
+                "first_name": m["first_name"],
+                "last_name": m["last_name"],
+                "hugo_type_code": m["code"],
+                "pairs": member_pairs.get(str(m["id"]), [])
+            }
+            for m in members
+        ],
+        "types": types,
+        "pairs": pairs,
+        "missing_pairs": missing_pairs,
+        "members_without_type": without_type
+    })
+
+async def calculate_team_synergy(conn, members, synergy_lookup: Optional[Dict[str, Dict[str, Any]]] = None) -> tuple[float, List[Dict[str, Any]]]:
+    """Calculate team synergy score and identify potential conflicts"""
+    if len(members) < 2:
+        return 1.0, []
+    
+    total_pairs = 0
+    synergy_sum = 0
+    potential_conflicts = []
+    
+    if synergy_lookup is None:
+        synergy_lookup = await load_synergy_lookup(conn)
     
     # Calculate synergy between all pairs
     for i, member_a in enumerate(members):
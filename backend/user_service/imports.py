@@ -0,0 +1,250 @@
+"""
+Bulk import of users and team memberships.
+
+An upload is streamed with COPY into a temp table where every column is
+text, validated there with a handful of set-wise UPDATEs (format checks,
+users_company_check, company/team existence, duplicates), and merged into
+users and team_members with INSERT ... ON CONFLICT. Rows that fail
+validation are skipped and reported with their row number (1-based, header
+excluded); the rest of the file is imported in the same transaction.
+"""
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+from passwords import LOCKED_PASSWORD
+
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+IMPORT_READ_CHUNK_BYTES = 64 * 1024
+
+# Columns accepted in the upload (CSV header / NDJSON keys)
+COLUMNS = (
+    "email", "first_name", "last_name", "role", "company_id", "department", "position",
+    "password_hash", "team_id", "team_role"
+)
+REQUIRED_COLUMNS = ("email",)
+
+class InvalidUpload(Exception):
+    """The upload as a whole is unusable (bad header, unknown format)"""
+
+_STAGE_SQL = """
+    CREATE TEMP TABLE import_users (
+        row_no BIGINT GENERATED ALWAYS AS IDENTITY,
+        email TEXT, first_name TEXT, last_name TEXT, role TEXT, company_id TEXT,
+        department TEXT, position TEXT, password_hash TEXT, team_id TEXT, team_role TEXT,
+        error TEXT
+    ) ON COMMIT DROP
+"""
+
+# $1: company every row is forced into (HR managers), NULL for Hugo managers
+_NORMALIZE_SQL = """
+    UPDATE import_users SET
+        email = NULLIF(btrim(email), ''),
+        role = COALESCE(NULLIF(btrim(role), ''), 'user'),
+        company_id = COALESCE(NULLIF(btrim(company_id), ''), $1::int::text),
+        team_id = NULLIF(btrim(team_id), ''),
+        team_role = COALESCE(NULLIF(btrim(team_role), ''), 'member'),
+        password_hash = NULLIF(password_hash, '')
+    WHERE error IS NULL
+"""
+
+_VALIDATE_ROWS_SQL = """
+    UPDATE import_users SET error = CASE
+        WHEN email IS NULL OR email !~ '^[^@\\s]+@[^@\\s]+\\.[^@\\s]+$' THEN 'invalid email'
+        WHEN role NOT IN ('hugo_manager', 'hr_manager', 'user') THEN 'invalid role'
+        WHEN $1::int IS NOT NULL AND role = 'hugo_manager' THEN 'not allowed to import hugo_manager accounts'
+        WHEN company_id IS NOT NULL AND company_id !~ '^[0-9]{1,9}$' THEN 'invalid company_id'
+        WHEN $1::int IS NOT NULL AND company_id <> $1::int::text THEN 'company_id is not your company'
+        WHEN role = 'hugo_manager' AND company_id IS NOT NULL THEN 'hugo_manager accounts must not have a company_id'
+        WHEN role <> 'hugo_manager' AND company_id IS NULL THEN 'company_id is required'
+        WHEN team_id IS NOT NULL AND team_id !~ '^[0-9]{1,9}$' THEN 'invalid team_id'
+        WHEN team_id IS NOT NULL AND role = 'hugo_manager' THEN 'hugo_manager accounts cannot join teams'
+        WHEN password_hash IS NOT NULL AND password_hash !~ '^\\$2[aby]\\$[0-9]{2}\\$.{53}$' THEN 'password_hash must be a bcrypt hash'
+        WHEN length(email) > 255 OR length(first_name) > 100 OR length(last_name) > 100
+          OR length(department) > 100 OR length(position) > 100 OR length(team_role) > 50 THEN 'value too long'
+    END
+    WHERE error IS NULL
+"""
+
+_VALIDATE_SET_SQL = (
+    """
+    UPDATE import_users i SET error = 'unknown company'
+    WHERE i.error IS NULL AND i.company_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM companies c WHERE c.id = i.company_id::int AND c.is_active)
+    """,
+    """
+    UPDATE import_users i SET error = 'unknown team or team belongs to another company'
+    WHERE i.error IS NULL AND i.team_id IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM teams t
+          WHERE t.id = i.team_id::int AND t.company_id = i.company_id::int AND t.is_active
+      )
+    """,
+    """
+    UPDATE import_users i SET error = 'duplicate email in file (first in row ' || d.first_row || ')'
+    FROM (
+        SELECT row_no, min(row_no) OVER (PARTITION BY lower(email)) AS first_row
+        FROM import_users WHERE error IS NULL
+    ) d
+    WHERE i.row_no = d.row_no AND d.row_no <> d.first_row
+    """,
+    """
+    UPDATE import_users i SET error = 'email belongs to a user of another company'
+    FROM users u
+    WHERE i.error IS NULL AND u.email = i.email
+      AND u.company_id IS DISTINCT FROM i.company_id::int
+    """
+)
+
+_MERGE_USERS_SQL = """
+    WITH merged AS (
+        INSERT INTO users (email, password_hash, first_name, last_name, role, company_id, department, position)
+        SELECT email, COALESCE(password_hash, $1), first_name, last_name, role::user_role,
+               company_id::int, department, position
+        FROM import_users
+        WHERE error IS NULL
+        ON CONFLICT (email) DO UPDATE SET
+            first_name = COALESCE(EXCLUDED.first_name, users.first_name),
+            last_name = COALESCE(EXCLUDED.last_name, users.last_name),
+            role = EXCLUDED.role,
+            department = COALESCE(EXCLUDED.department, users.department),
+            position = COALESCE(EXCLUDED.position, users.position),
+            password_hash = CASE WHEN EXCLUDED.password_hash = $1
+                                 THEN users.password_hash ELSE EXCLUDED.password_hash END,
+            is_active = true,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted) AS created,
+           count(*) FILTER (WHERE NOT inserted) AS updated
+    FROM merged
+"""
+
+_MERGE_MEMBERS_SQL = """
+    INSERT INTO team_members (team_id, user_id, role)
+    SELECT i.team_id::int, u.id, i.team_role
+    FROM import_users i
+    JOIN users u ON u.email = i.email
+    WHERE i.error IS NULL AND i.team_id IS NOT NULL
+    ON CONFLICT (team_id, user_id) DO UPDATE SET role = EXCLUDED.role, is_active = true
+"""
+
+_REPORT_SQL = """
+    SELECT row_no, email, error FROM import_users
+    WHERE error IS NOT NULL
+    ORDER BY row_no
+    LIMIT $1
+"""
+
+# ---------------------------------------------------------------------------
+# Staging
+
+async def _read_chunks(upload) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload.read(IMPORT_READ_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+async def _stage_csv(conn, upload) -> None:
+    chunks = _read_chunks(upload)
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if b"\n" in head:
+            break
+    header_line, _, rest = head.partition(b"\n")
+    header = [c.strip().strip('"').lower() for c in header_line.decode("utf-8-sig").strip().split(",")]
+    unknown = [c for c in header if c not in COLUMNS]
+    if unknown:
+        raise InvalidUpload(f"Unknown columns: {', '.join(unknown)}")
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise InvalidUpload(f"Missing columns: {', '.join(missing)}")
+
+    async def body():
+        if rest:
+            yield rest
+        async for chunk in chunks:
+            yield chunk
+
+    # The server parses the CSV; rows are numbered in file order
+    await conn.copy_to_table("import_users", source=body(), columns=header, format="csv")
+
+async def _stage_ndjson(conn, upload) -> None:
+    async def records():
+        pending = b""
+        async for chunk in _read_chunks(upload):
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _ndjson_record(line)
+        if pending.strip():
+            yield _ndjson_record(pending)
+
+    await conn.copy_records_to_table("import_users", records=records(), columns=COLUMNS + ("error",))
+
+def _ndjson_record(line: bytes) -> tuple:
+    try:
+        obj = json.loads(line)
+        if not isinstance(obj, dict):
+            raise ValueError
+    except ValueError:
+        return (None,) * len(COLUMNS) + ("invalid JSON",)
+    unknown = set(obj) - set(COLUMNS)
+    values = tuple(None if obj.get(c) is None else str(obj[c]) for c in COLUMNS)
+    return values + ((f"unknown fields: {', '.join(sorted(unknown))}" if unknown else None),)
+
+STAGERS = {"csv": _stage_csv, "ndjson": _stage_ndjson}
+
+# ---------------------------------------------------------------------------
+
+async def import_users(conn, upload, fmt: str, company_id: Optional[int], dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Stage, validate and merge one upload. `company_id` restricts every row to
+    that company (HR managers). With `dry_run` nothing is written and only the
+    validation report is returned.
+    """
+    if fmt not in STAGERS:
+        raise InvalidUpload(f"Unsupported format, use one of: {', '.join(STAGERS)}")
+
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        await conn.execute(_STAGE_SQL)
+        await STAGERS[fmt](conn, upload)
+        await conn.execute(_NORMALIZE_SQL, company_id)
+        await conn.execute(_VALIDATE_ROWS_SQL, company_id)
+        for statement in _VALIDATE_SET_SQL:
+            await conn.execute(statement)
+
+        totals = await conn.fetchrow(
+            "SELECT count(*) AS total, count(*) FILTER (WHERE error IS NOT NULL) AS rejected FROM import_users"
+        )
+        errors = await conn.fetch(_REPORT_SQL, IMPORT_MAX_REPORTED_ERRORS)
+
+        created = updated = memberships = 0
+        if not dry_run:
+            merged = await conn.fetchrow(_MERGE_USERS_SQL, LOCKED_PASSWORD)
+            created, updated = merged["created"], merged["updated"]
+            result = await conn.execute(_MERGE_MEMBERS_SQL)
+            memberships = int(result.split()[-1])
+    except BaseException:
+        await transaction.rollback()
+        raise
+    if dry_run:
+        await transaction.rollback()
+    else:
+        await transaction.commit()
+
+    return {
+        "dry_run": dry_run,
+        "rows": totals["total"],
+        "rejected": totals["rejected"],
+        "created": created,
+        "updated": updated,
+        "team_memberships": memberships,
+        "errors": [dict(row) for row in errors],
+        "errors_truncated": totals["rejected"] > len(errors)
+    }
@@ -1,11 +1,21 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, File, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 import jwt
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import asyncpg
+import asyncio
 import os
+import uuid
 from datetime import datetime, timedelta
+from shared import instrumentation, tracing, health, admission, proxy
+from shared.db import db
+from shared.auth import require_claims, require_role
+from shared.ratelimit import TokenBucketLimiter
+from shared.audit import audit_log
+from passwords import PasswordHasher, HashPoolSaturated
+import imports
+from rollups import rollup_cache, rollup_refresher
+import people
 
 app = FastAPI(title="Hugo User Service", version="2.0.0")
 
@@ -16,19 +26,89 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Bulk imports: a few per tenant per minute
+admission.install(app, {"POST /admin/import/users": (3 / 60.0, 3)})
+instrumentation.instrument(app)
+tracing.instrument(app, "user-service")
 
 JWT_SECRET = os.getenv("JWT_SECRET", "hugo-secret-key-2024")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "postgres"),
-        database=os.getenv("DB_NAME", "hugo_db"),
-        user=os.getenv("DB_USER", "hugo_user"),
-        password=os.getenv("DB_PASSWORD", "hugo_password"),
-        port=os.getenv("DB_PORT", "5432")
-    )
+# Login attempts per client IP: LOGIN_RATE_PER_MINUTE sustained, LOGIN_RATE_BURST at once
+LOGIN_RATE_PER_MINUTE = float(os.getenv("LOGIN_RATE_PER_MINUTE", "10"))
+LOGIN_RATE_BURST = float(os.getenv("LOGIN_RATE_BURST", "10"))
+
+password_hasher = PasswordHasher()
+login_limiter = TokenBucketLimiter(rate=LOGIN_RATE_PER_MINUTE / 60.0, burst=LOGIN_RATE_BURST)
+
+# last_login is written behind in batches every LAST_LOGIN_FLUSH_SECONDS
+LAST_LOGIN_FLUSH_SECONDS = float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "5"))
+
+health.install(app, "user-service", {"database": health.check_database})
+
+class LastLoginRecorder:
+    """
+    Buffers successful logins and writes last_login in one batched UPDATE:
+    one statement and commit per interval instead of one per login, and
+    repeated logins of a user collapse into a single row version. Any
+    UPDATE still clears the all-visible bit of the pages it touches, so
+    the index-only login lookup visits the heap for those pages until
+    (auto)vacuum sets it again.
+    """
+
+    def __init__(self, interval: float = LAST_LOGIN_FLUSH_SECONDS):
+        self.interval = interval
+        self._pending = {}
+        self._task = None
+
+    def record(self, user_id: int):
+        self._pending[user_id] = datetime.utcnow()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await db.pool.execute(
+                """
+                UPDATE users u SET last_login = v.last_login
+                FROM unnest($1::int[], $2::timestamp[]) AS v(id, last_login)
+                WHERE u.id = v.id
+                """,
+                list(batch.keys()), list(batch.values())
+            )
+        except asyncio.CancelledError:
+            # Stopped mid-write: stop() flushes the batch again
+            self._requeue(batch)
+            raise
+        except Exception as e:
+            print(f"Failed to record last_login for {len(batch)} users: {e}")
+            self._requeue(batch)
+
+    def _requeue(self, batch):
+        for user_id, ts in batch.items():
+            self._pending.setdefault(user_id, ts)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+last_login_recorder = LastLoginRecorder()
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -39,54 +119,219 @@ class TokenResponse(BaseModel):
     token_type: str
     user: dict
 
-def verify_password(password: str, stored_password: str) -> bool:
-    return password == stored_password
+async def verify_password(password: str, stored_password: str) -> bool:
+    try:
+        return await password_hasher.verify(password, stored_password)
+    except HashPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"}
+        )
+
+def client_ip(request: Request) -> str:
+    # X-Real-IP only counts from nginx (TRUSTED_PROXIES); direct callers can set any header
+    return proxy.request_ip(request) or "unknown"
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(hours=JWT_EXPIRATION_HOURS)
+    # jti lets the shared verifier revoke individual tokens
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 @app.post("/auth/login", response_model=TokenResponse)
-async def login(user_login: UserLogin):
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT u.*, c.name as company_name 
-                FROM users u 
-                LEFT JOIN companies c ON u.company_id = c.id 
-                WHERE u.email = %s AND u.is_active = true
-            """, (user_login.email,))
-            user = cur.fetchone()
-            
-            if not user or not verify_password(user_login.password, user['password_hash']):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid credentials"
-                )
-            
-            token_data = {
-                "email": user['email'],
-                "role": user['role'],
-                "user_id": user['id']
-            }
-            access_token = create_access_token(token_data)
-            
-            return TokenResponse(
-                access_token=access_token,
-                token_type="bearer",
-                user={
-                    "email": user['email'],
-                    "first_name": user['first_name'],
-                    "last_name": user['last_name'],
-                    "role": user['role'],
-                    "company_id": user['company_id']
-                }
+async def login(user_login: UserLogin, request: Request):
+    ip = client_ip(request)
+    if not login_limiter.allow(ip):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(login_limiter.retry_after(ip))}
+        )
+    
+    # Only the login columns, served by the covering idx_users_login index
+    user = await db.pool.fetchrow(
+        """
+        SELECT id, email, password_hash, first_name, last_name, role, company_id
+        FROM users
+        WHERE email = $1 AND is_active = true
+        """,
+        user_login.email
+    )
+    
+    if not user or not await verify_password(user_login.password, user['password_hash']):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials"
+        )
+    
+    # Transparently upgrade plaintext or outdated-cost hashes
+    if password_hasher.needs_rehash(user['password_hash']):
+        try:
+            new_hash = await password_hasher.hash(user_login.password)
+            await db.pool.execute(
+                "UPDATE users SET password_hash = $1 WHERE id = $2",
+                new_hash, user['id']
             )
+        except HashPoolSaturated:
+            pass  # retried on a later login
+    
+    last_login_recorder.record(user['id'])
+    audit_log.record(
+        "auth.login", "user", user['id'],
+        user_id=user['id'], company_id=user['company_id'], request=request
+    )
+    
+    token_data = {
+        "email": user['email'],
+        "role": user['role'],
+        "user_id": user['id'],
+        "company_id": user['company_id']
+    }
+    access_token = create_access_token(token_data)
+    
+    return TokenResponse(
+        access_token=access_token,
+        token_type="bearer",
+        user={
+            "email": user['email'],
+            "first_name": user['first_name'],
+            "last_name": user['last_name'],
+            "role": user['role'],
+            "company_id": user['company_id']
+        }
+    )
+
+@app.get("/auth/me")
+async def get_current_user(claims: dict = Depends(require_claims)):
+    """Return the claims of the caller's access token"""
+    return {
+        "email": claims.get("email"),
+        "role": claims.get("role"),
+        "user_id": claims.get("user_id")
+    }
+
+@app.post("/admin/import/users")
+async def import_users(
+    request: Request,
+    file: UploadFile = File(...),
+    fmt: str = Query(None, alias="format", description="csv or ndjson (default: from the file name)"),
+    dry_run: bool = False,
+    claims: dict = Depends(require_role("hr_manager", "hugo_manager"))
+):
+    """
+    Bulk create/update users and their team memberships from a CSV or NDJSON file.
+    Invalid rows are reported and skipped; everything else is merged in one transaction.
+    """
+    if fmt is None:
+        fmt = "ndjson" if (file.filename or "").endswith((".ndjson", ".jsonl")) else "csv"
+    # HR managers import into their own company only
+    company_id = claims.get("company_id") if claims.get("role") == "hr_manager" else None
+    if claims.get("role") == "hr_manager" and company_id is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    
+    conn = await db.acquire()
+    try:
+        result = await imports.import_users(conn, file, fmt, company_id, dry_run)
+    except imports.InvalidUpload as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except asyncpg.DataError as e:
+        # Malformed CSV (column count, encoding) rejected by COPY
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid file: {e}")
     finally:
-        conn.close()
+        await conn.close()
+    
+    if not dry_run:
+        # Bulk changes are rare and must not be lost: wait for room if the queue is full
+        await audit_log.write(
+            "users.imported", "company", company_id,
+            new_values={
+                "format": fmt, "file": file.filename,
+                **{k: result[k] for k in ("rows", "rejected", "created", "updated", "team_memberships")}
+            },
+            request=request
+        )
+    return result
+
+@app.get("/companies/overview")
+async def get_companies_overview(claims: dict = Depends(require_role("hugo_manager"))):
+    """Dashboard rollups of all companies (materialized, see rollups.py)"""
+    return await rollup_cache.all()
+
+@app.get("/companies/{company_id}/overview")
+async def get_company_overview(company_id: int, claims: dict = Depends(require_role("hr_manager", "hugo_manager"))):
+    """Dashboard rollup of one company with its refresh time and staleness"""
+    if claims.get("role") == "hr_manager" and claims.get("company_id") != company_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    overview = await rollup_cache.get(company_id)
+    if overview is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
+    return overview
+
+@app.get("/companies/{company_id}/people/{user_id}/similar")
+async def similar_people(
+    company_id: int,
+    user_id: int,
+    k: int = Query(10, ge=1, le=100),
+    mode: str = Query("similar", description="similar or complementary"),
+    space: str = Query("combined", description="personality, culture or combined"),
+    claims: dict = Depends(require_claims)
+):
+    """Mentor/buddy suggestions: the k colleagues with the most similar (or complementary) profile"""
+    if mode not in people.MODES or space not in people.SPACES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid mode or space")
+    role = claims.get("role")
+    # Users see suggestions for themselves, HR managers for their company
+    allowed = role == "hugo_manager" or (
+        claims.get("company_id") == company_id and (role == "hr_manager" or claims.get("user_id") == user_id)
+    )
+    if not allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    
+    matches = await people.people_index.similar(company_id, user_id, k, mode, space)
+    if matches is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No {space} profile for this user")
+    
+    details = {
+        row["id"]: row for row in await db.pool.fetch(
+            "SELECT id, first_name, last_name, department, position, hugo_type FROM users WHERE id = ANY($1::int[])",
+            [match_id for match_id, _ in matches]
+        )
+    }
+    return {
+        "user_id": user_id,
+        "mode": mode,
+        "space": space,
+        "matches": [
+            {**dict(details[match_id]), "similarity": similarity}
+            for match_id, similarity in matches if match_id in details
+        ]
+    }
+
+@app.on_event("startup")
+async def startup():
+    await db.connect(
+        host=os.getenv("DB_HOST", "postgres"),
+        database=os.getenv("DB_NAME", "hugo_db"),
+        user=os.getenv("DB_USER", "hugo_user"),
+        password=os.getenv("DB_PASSWORD", "hugo_password"),
+        port=int(os.getenv("DB_PORT", "5432"))
+    )
+    last_login_recorder.start()
+    rollup_refresher.start()
+    people.people_index.start()
+    await audit_log.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await audit_log.stop()
+    await last_login_recorder.stop()
+    await rollup_refresher.stop()
+    await people.people_index.stop()
+    await db.close()
+    password_hasher.shutdown()
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,77 @@
+"""
+Password hashing for the user service.
+
+bcrypt costs ~250 ms of CPU per check at cost 12, so it runs in a sized
+thread pool (bcrypt releases the GIL) instead of on the event loop. The
+number of queued checks is bounded; callers get HashPoolSaturated instead
+of an ever-growing backlog.
+"""
+import asyncio
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+# Stored for accounts created without a password (bulk import); never matches
+LOCKED_PASSWORD = "!"
+
+class HashPoolSaturated(Exception):
+    pass
+
+def is_bcrypt_hash(stored: str) -> bool:
+    return stored.startswith(("$2a$", "$2b$", "$2y$"))
+
+def bcrypt_rounds(stored: str) -> int:
+    # Format: $2b$12$<22 char salt><31 char hash>
+    return int(stored[4:6])
+
+def bcrypt_input(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes; bcrypt >= 5 raises ValueError instead of
+    # truncating, so cut here and existing hashes of longer passwords keep matching
+    return password.encode()[:72]
+
+def verify_sync(password: str, stored: str) -> bool:
+    if is_bcrypt_hash(stored):
+        return bcrypt.checkpw(bcrypt_input(password), stored.encode())
+    if stored.startswith(LOCKED_PASSWORD):
+        return False
+    # Legacy plaintext rows (init.sql); replaced by a bcrypt hash on next login
+    return hmac.compare_digest(password.encode(), stored.encode())
+
+def hash_sync(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(bcrypt_input(password), bcrypt.gensalt(rounds)).decode()
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HashPoolSaturated()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def verify(self, password: str, stored: str) -> bool:
+        return await self._run(verify_sync, password, stored)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_sync, password, self.rounds)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return not is_bcrypt_hash(stored) or bcrypt_rounds(stored) != self.rounds
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
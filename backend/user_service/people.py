@@ -0,0 +1,373 @@
+"""
+"People like me": per-company nearest-neighbour index over personality and
+culture vectors, for mentor and buddy suggestions.
+
+Each active user with a completed assessment or a culture profile is a
+vector: the four Hugo dimension scores of the latest completed assessment
+(`assessments.raw_scores`, 0-1) and the culture profile
+(`user_culture_profiles`, 1-10 scaled to 0-1; missing dimensions count as the
+midpoint). A company's vectors live in one NumPy matrix; a query is a
+brute-force distance computation plus argpartition, well under a millisecond
+for 100k users, so no tree is needed.
+
+- similar: nearest to the user's own vector
+- complementary: nearest to its mirror image (1 - score per dimension)
+
+In the "combined" space both parts are weighted equally regardless of their
+number of dimensions.
+
+A company's index is loaded on its first query (LRU, at most
+PEOPLE_INDEX_MAX_COMPANIES) and kept current incrementally: triggers
+(database/migrations/009, 010) NOTIFY changed user ids on the people_index
+channel and the changes are applied in one query every
+PEOPLE_INDEX_APPLY_SECONDS. Indexes are reloaded after
+PEOPLE_INDEX_MAX_AGE_SECONDS, and after the listener reconnects, in case
+notifications were missed. Changes applied while a company's index is
+being built are queued again and applied once it is in place.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from shared.db import db
+
+PEOPLE_INDEX_MAX_COMPANIES = int(os.getenv("PEOPLE_INDEX_MAX_COMPANIES", "200"))
+PEOPLE_INDEX_MAX_AGE_SECONDS = float(os.getenv("PEOPLE_INDEX_MAX_AGE_SECONDS", "3600"))
+PEOPLE_INDEX_APPLY_SECONDS = float(os.getenv("PEOPLE_INDEX_APPLY_SECONDS", "1"))
+
+CHANNEL = "people_index"
+PERSONALITY_DIMENSIONS = ("Vision", "Innovation", "Expertise", "Connection")
+SPACES = ("personality", "culture", "combined")
+MODES = ("similar", "complementary")
+
+_COMPANY_VECTORS_SQL = """
+    SELECT u.id, u.company_id, a.raw_scores, cp.scores
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT raw_scores FROM assessments
+        WHERE user_id = u.id AND is_completed = true
+        ORDER BY assessment_date DESC
+        LIMIT 1
+    ) a ON true
+    LEFT JOIN LATERAL (
+        SELECT jsonb_object_agg(dimension_id, score) AS scores
+        FROM user_culture_profiles
+        WHERE user_id = u.id AND score IS NOT NULL
+    ) cp ON true
+    WHERE u.company_id = $1 AND u.is_active = true
+"""
+
+# Same columns for the users of a change notification
+_USER_VECTORS_SQL = """
+    SELECT u.id, u.company_id, a.raw_scores, cp.scores
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT raw_scores FROM assessments
+        WHERE user_id = u.id AND is_completed = true
+        ORDER BY assessment_date DESC
+        LIMIT 1
+    ) a ON true
+    LEFT JOIN LATERAL (
+        SELECT jsonb_object_agg(dimension_id, score) AS scores
+        FROM user_culture_profiles
+        WHERE user_id = u.id AND score IS NOT NULL
+    ) cp ON true
+    WHERE u.id = ANY($1::int[]) AND u.is_active = true
+"""
+
+def _json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+class CompanyIndex:
+    """Vectors of one company; rows are updated in place, removed rows are swapped with the last"""
+
+    def __init__(self, company_id: int, culture_dimension_ids: List[int], capacity: int = 64):
+        self.company_id = company_id
+        self.culture_dimension_ids = culture_dimension_ids
+        self.personality_columns = slice(0, len(PERSONALITY_DIMENSIONS))
+        self.culture_columns = slice(len(PERSONALITY_DIMENSIONS), len(PERSONALITY_DIMENSIONS) + len(culture_dimension_ids))
+        width = len(PERSONALITY_DIMENSIONS) + len(culture_dimension_ids)
+        self.vectors = np.zeros((capacity, width), dtype=np.float32)
+        self.has_personality = np.zeros(capacity, dtype=bool)
+        self.has_culture = np.zeros(capacity, dtype=bool)
+        self.user_ids: List[int] = []
+        self.rows: Dict[int, int] = {}
+        self.loaded_at = time.monotonic()
+        self._views: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def vector(self, raw_scores, culture_scores) -> Tuple[Optional[np.ndarray], bool, bool]:
+        """(vector, has personality, has culture) from raw_scores and {dimension_id: score}"""
+        raw_scores = _json(raw_scores) or {}
+        culture_scores = _json(culture_scores) or {}
+        has_personality = all(isinstance(raw_scores.get(d), (int, float)) for d in PERSONALITY_DIMENSIONS)
+        has_culture = bool(culture_scores)
+        if not (has_personality or has_culture):
+            return None, False, False
+        vector = np.full(self.vectors.shape[1], 0.5, dtype=np.float32)
+        if has_personality:
+            vector[self.personality_columns] = [min(max(float(raw_scores[d]), 0.0), 1.0) for d in PERSONALITY_DIMENSIONS]
+        for k, dimension_id in enumerate(self.culture_dimension_ids):
+            score = culture_scores.get(str(dimension_id))
+            if score is not None:
+                vector[self.culture_columns.start + k] = (score - 1) / 9.0
+        return vector, has_personality, has_culture
+
+    def load(self, records):
+        """Fill an empty index from (id, company_id, raw_scores, scores) rows"""
+        n = len(records)
+        width = self.vectors.shape[1]
+        personality = np.full((n, len(PERSONALITY_DIMENSIONS)), np.nan, dtype=np.float32)
+        culture = np.full((n, width - len(PERSONALITY_DIMENSIONS)), np.nan, dtype=np.float32)
+        columns = {str(dimension_id): k for k, dimension_id in enumerate(self.culture_dimension_ids)}
+        for i, record in enumerate(records):
+            raw_scores = _json(record["raw_scores"])
+            if raw_scores:
+                personality[i] = [
+                    raw_scores.get(d) if isinstance(raw_scores.get(d), (int, float)) else np.nan
+                    for d in PERSONALITY_DIMENSIONS
+                ]
+            culture_scores = _json(record["scores"])
+            if culture_scores:
+                for dimension_id, score in culture_scores.items():
+                    if dimension_id in columns:
+                        culture[i, columns[dimension_id]] = score
+        has_personality = ~np.isnan(personality).any(axis=1)
+        has_culture = ~np.isnan(culture).all(axis=1)
+        keep = np.flatnonzero(has_personality | has_culture)
+
+        vectors = np.full((len(keep), width), 0.5, dtype=np.float32)
+        vectors[:, self.personality_columns] = np.where(
+            has_personality[keep, None], np.clip(personality[keep], 0.0, 1.0), 0.5)
+        vectors[:, self.culture_columns] = np.where(
+            np.isnan(culture[keep]), 0.5, (culture[keep] - 1) / 9.0)
+        self.vectors = vectors
+        self.has_personality = has_personality[keep]
+        self.has_culture = has_culture[keep]
+        self.user_ids = [records[i]["id"] for i in keep]
+        self.rows = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self._views.clear()
+
+    def upsert(self, user_id: int, raw_scores, culture_scores):
+        vector, has_personality, has_culture = self.vector(raw_scores, culture_scores)
+        if vector is None:
+            self.remove(user_id)
+            return
+        row = self.rows.get(user_id)
+        if row is None:
+            row = len(self.user_ids)
+            if row == len(self.vectors):
+                self._grow()
+            self.rows[user_id] = row
+            self.user_ids.append(user_id)
+        self.vectors[row] = vector
+        self.has_personality[row] = has_personality
+        self.has_culture[row] = has_culture
+        self._views.clear()
+
+    def remove(self, user_id: int):
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return
+        last = len(self.user_ids) - 1
+        if row != last:
+            moved = self.user_ids[last]
+            self.user_ids[row] = moved
+            self.rows[moved] = row
+            self.vectors[row] = self.vectors[last]
+            self.has_personality[row] = self.has_personality[last]
+            self.has_culture[row] = self.has_culture[last]
+        self.user_ids.pop()
+        self._views.clear()
+
+    def _grow(self):
+        capacity = max(64, 2 * len(self.vectors))
+        self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+        self.has_personality = np.resize(self.has_personality, capacity)
+        self.has_culture = np.resize(self.has_culture, capacity)
+
+    def _view(self, space: str):
+        """(rows, weighted vectors, squared norms, weights, columns) of the users that have this space; cached"""
+        view = self._views.get(space)
+        if view is not None:
+            return view
+        n = len(self.user_ids)
+        weights = np.zeros(self.vectors.shape[1], dtype=np.float32)
+        if space in ("personality", "combined"):
+            weights[self.personality_columns] = 1.0
+        if space in ("culture", "combined"):
+            weights[self.culture_columns] = 1.0
+        if space == "combined":
+            # Each part contributes at most 1 to the squared distance
+            weights[self.personality_columns] /= np.sqrt(len(PERSONALITY_DIMENSIONS))
+            weights[self.culture_columns] /= np.sqrt(max(1, len(self.culture_dimension_ids)))
+            mask = self.has_personality[:n] & self.has_culture[:n]
+        elif space == "personality":
+            mask = self.has_personality[:n]
+        else:
+            mask = self.has_culture[:n]
+        rows = np.flatnonzero(mask)
+        columns = np.flatnonzero(weights)
+        points = np.ascontiguousarray(self.vectors[rows][:, columns] * weights[columns])
+        view = (rows, points, np.einsum("ij,ij->i", points, points), weights[columns], columns)
+        self._views[space] = view
+        return view
+
+    def query(self, user_id: int, k: int = 10, mode: str = "similar", space: str = "combined") -> Optional[List[Tuple[int, float]]]:
+        """[(user id, similarity 0-1)] of the k nearest users, or None if the user is not in this space"""
+        row = self.rows.get(user_id)
+        if row is None:
+            return None
+        rows, points, norms, weights, columns = self._view(space)
+        position = np.searchsorted(rows, row)
+        if position >= len(rows) or rows[position] != row:
+            return None
+        target = self.vectors[row, columns]
+        if mode == "complementary":
+            target = 1.0 - target
+        target = target * weights
+
+        # |p - t|^2 without |t|^2, which is the same for every candidate
+        distances = norms - 2.0 * (points @ target)
+        distances[position] = np.inf  # never suggest the user to themselves
+        k = min(k, len(rows) - 1)
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        exact = np.sqrt(np.maximum(distances[nearest] + float(target @ target), 0.0))
+        max_distance = float(np.sqrt((weights ** 2).sum()))
+        return [
+            (self.user_ids[rows[i]], round(1.0 - float(d) / max_distance, 4))
+            for i, d in zip(nearest, exact)
+        ]
+
+class PeopleIndex:
+    def __init__(self, max_companies: int = PEOPLE_INDEX_MAX_COMPANIES):
+        self.max_companies = max_companies
+        self._companies: "OrderedDict[int, CompanyIndex]" = OrderedDict()
+        self._building: Dict[int, asyncio.Task] = {}
+        # Users applied while a company's index was building: its rows may predate the change
+        self._applied_during_build: Dict[int, set] = {}
+        self._culture_dimension_ids: Optional[List[int]] = None
+        self._pending: set = set()
+        self._listener = None
+        self._task = None
+
+    async def _dimension_ids(self) -> List[int]:
+        if self._culture_dimension_ids is None:
+            rows = await db.pool.fetch("SELECT id FROM culture_dimensions ORDER BY id")
+            self._culture_dimension_ids = [row["id"] for row in rows]
+        return self._culture_dimension_ids
+
+    async def _build(self, company_id: int) -> CompanyIndex:
+        start = time.perf_counter()
+        self._applied_during_build[company_id] = set()
+        try:
+            index = CompanyIndex(company_id, await self._dimension_ids())
+            rows = await db.pool.fetch(_COMPANY_VECTORS_SQL, company_id)
+            # JSON decoding and array filling for large companies: off the event loop
+            await asyncio.to_thread(index.load, rows)
+        finally:
+            missed = self._applied_during_build.pop(company_id)
+        # Applied on the next tick, now that the index is loaded
+        self._pending |= missed
+        self._companies[company_id] = index
+        self._companies.move_to_end(company_id)
+        while len(self._companies) > self.max_companies:
+            self._companies.popitem(last=False)
+        print(f"People index for company {company_id}: {len(index)} users in {time.perf_counter() - start:.2f}s")
+        return index
+
+    async def get(self, company_id: int) -> CompanyIndex:
+        index = self._companies.get(company_id)
+        if index is not None and time.monotonic() - index.loaded_at < PEOPLE_INDEX_MAX_AGE_SECONDS:
+            self._companies.move_to_end(company_id)
+            return index
+        # Concurrent first queries share one build
+        task = self._building.get(company_id)
+        if task is None:
+            task = self._building[company_id] = asyncio.create_task(self._build(company_id))
+            task.add_done_callback(lambda _: self._building.pop(company_id, None))
+        return await asyncio.shield(task)
+
+    async def similar(self, company_id: int, user_id: int, k: int, mode: str, space: str) -> Optional[List[Tuple[int, float]]]:
+        return (await self.get(company_id)).query(user_id, k, mode, space)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self._pending.add(int(payload))
+        except ValueError:
+            pass
+
+    async def apply(self, user_ids: Iterable[int]):
+        """Re-read the given users and update the loaded companies' indexes"""
+        user_ids = list(user_ids)
+        for missed in self._applied_during_build.values():
+            missed.update(user_ids)
+        rows = {row["id"]: row for row in await db.pool.fetch(_USER_VECTORS_SQL, user_ids)}
+        for user_id in user_ids:
+            row = rows.get(user_id)
+            for company_id, index in self._companies.items():
+                if row is not None and row["company_id"] == company_id:
+                    index.upsert(user_id, row["raw_scores"], row["scores"])
+                else:
+                    # Deactivated, moved to another company or no scores left
+                    index.remove(user_id)
+
+    async def _listen(self):
+        # Held for the lifetime of the process, outside the pool (DB_DEDICATED_CONNECTIONS)
+        self._listener = await db.connect_dedicated()
+        await self._listener.add_listener(CHANNEL, self._on_notify)
+
+    async def _unlisten(self):
+        if self._listener is None:
+            return
+        try:
+            if not self._listener.is_closed():
+                await self._listener.remove_listener(CHANNEL, self._on_notify)
+            await self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+
+    async def _run(self):
+        while True:
+            try:
+                if self._listener is None or self._listener.is_closed():
+                    await self._unlisten()
+                    await self._listen()
+                    # Notifications sent while not listening are lost: reload on next use
+                    self._companies.clear()
+                if self._pending:
+                    batch, self._pending = self._pending, set()
+                    try:
+                        await self.apply(batch)
+                    except Exception:
+                        self._pending |= batch
+                        raise
+            except Exception as e:
+                print(f"People index update failed: {e}")
+            await asyncio.sleep(PEOPLE_INDEX_APPLY_SECONDS)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._unlisten()
+
+people_index = PeopleIndex()
@@ -0,0 +1,140 @@
+"""
+Per-company dashboard rollups.
+
+The aggregation lives in the `company_rollups` materialized view
+(database/multi_tenant_schema.sql). RollupRefresher runs
+REFRESH MATERIALIZED VIEW CONCURRENTLY every ROLLUP_REFRESH_SECONDS, but only
+when the source tables saw writes since the last refresh (insert/update/delete
+counters from pg_stat_user_tables), and only in one worker at a time (advisory
+lock). Readers never block on a refresh. RollupCache keeps the whole view in
+memory for ROLLUP_CACHE_SECONDS; every answer carries its refresh time and age.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from shared.db import db
+
+ROLLUP_REFRESH_SECONDS = float(os.getenv("ROLLUP_REFRESH_SECONDS", "60"))
+ROLLUP_CACHE_SECONDS = float(os.getenv("ROLLUP_CACHE_SECONDS", "5"))
+# Answers older than this are flagged stale (e.g. refresher failing)
+ROLLUP_MAX_AGE_SECONDS = float(os.getenv("ROLLUP_MAX_AGE_SECONDS", "300"))
+
+SOURCE_TABLES = ["companies", "users", "teams", "team_members", "assessment_sessions"]
+REFRESH_LOCK_KEY = 0x48554730  # pg advisory lock id shared by all workers
+
+class RollupRefresher:
+    def __init__(self, interval: float = ROLLUP_REFRESH_SECONDS):
+        self.interval = interval
+        self._last_changes: Optional[int] = None
+        self._task = None
+
+    async def _source_changes(self, conn) -> int:
+        return await conn.fetchval(
+            """
+            SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+            FROM pg_stat_user_tables
+            WHERE relname = ANY($1::text[])
+            """,
+            SOURCE_TABLES
+        )
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Refresh the view if its sources changed; False when skipped"""
+        conn = await db.acquire()
+        try:
+            changes = await self._source_changes(conn)
+            if not force and changes == self._last_changes:
+                return False
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", REFRESH_LOCK_KEY):
+                return False  # another worker is refreshing
+            try:
+                start = time.perf_counter()
+                await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY company_rollups")
+                print(f"Refreshed company_rollups in {time.perf_counter() - start:.2f}s")
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", REFRESH_LOCK_KEY)
+            self._last_changes = changes
+            rollup_cache.invalidate()
+            return True
+        finally:
+            await conn.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"company_rollups refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                # Let a refresh in progress release its advisory lock and connection
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class RollupCache:
+    """All company rollups, loaded in one query and shared by concurrent readers"""
+
+    def __init__(self, ttl: float = ROLLUP_CACHE_SECONDS):
+        self.ttl = ttl
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+    async def _load(self):
+        async with self._lock:
+            if time.monotonic() - self._loaded_at < self.ttl:
+                return  # loaded by a concurrent reader
+            rows = await db.pool.fetch("SELECT * FROM company_rollups")
+            self._rows = {row["company_id"]: _decode(row) for row in rows}
+            self._loaded_at = time.monotonic()
+
+    async def all(self) -> List[Dict[str, Any]]:
+        if time.monotonic() - self._loaded_at >= self.ttl:
+            await self._load()
+        return [_with_freshness(row) for row in self._rows.values()]
+
+    async def get(self, company_id: int) -> Optional[Dict[str, Any]]:
+        if time.monotonic() - self._loaded_at >= self.ttl:
+            await self._load()
+        row = self._rows.get(company_id)
+        return _with_freshness(row) if row is not None else None
+
+def _decode(row) -> Dict[str, Any]:
+    result = dict(row)
+    for key in ("type_histogram", "dimension_histogram"):
+        if isinstance(result[key], str):
+            result[key] = json.loads(result[key])
+    if result["avg_team_synergy"] is not None:
+        result["avg_team_synergy"] = float(result["avg_team_synergy"])
+    return result
+
+def _with_freshness(row: Dict[str, Any]) -> Dict[str, Any]:
+    refreshed_at: datetime = row["refreshed_at"]
+    age = max(0.0, time.time() - refreshed_at.timestamp())
+    return {
+        **row,
+        "freshness": {
+            "refreshed_at": refreshed_at,
+            "age_seconds": round(age, 1),
+            "stale": age > ROLLUP_MAX_AGE_SECONDS
+        }
+    }
+
+rollup_cache = RollupCache()
+rollup_refresher = RollupRefresher()
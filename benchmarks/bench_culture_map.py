@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Team culture analysis (team_service/culture.py) on synthetic teams.
+
+For each team size it times analyze_matrix (spread, gaps, outliers, most
+distant pairs; exact pairwise up to CULTURE_PAIRWISE_MAX_MEMBERS, candidate
+pairs beyond) and type_synergy, and checks the candidate search against the
+exact farthest pair where that is still affordable.
+
+Usage:
+  python benchmarks/bench_culture_map.py [--sizes 10,100,1000,10000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend", "team_service"))
+
+import numpy as np  # noqa: E402
+import culture  # noqa: E402
+
+DIMENSIONS = [
+    {"id": i + 1, "name": name, "low_context_label": None, "high_context_label": None}
+    for i, name in enumerate(("Communication", "Evaluation", "Persuasion", "Leading",
+                              "Deciding", "Trusting", "Disagreeing", "Scheduling"))
+]
+TYPES = [f"{d}{i}" for d in "VIEC" for i in (1, 2, 3)]
+LEVELS = ("High Synergy", "Moderate Synergy", "Potential Conflict", "High Conflict")
+
+def synthetic_team(n: int, rng):
+    matrix = rng.integers(1, 11, size=(n, len(DIMENSIONS))).astype(np.float32)
+    # A few members without a complete profile
+    matrix[rng.random(matrix.shape) < 0.01] = np.nan
+    return list(range(n)), matrix
+
+def synergy_lookup():
+    random.seed(1)
+    return {f"{a}-{b}": {"level": random.choice(LEVELS), "tips": "..."} for a in TYPES for b in TYPES}
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,500,1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lookup = synergy_lookup()
+    print(f"{'members':>8} {'analyze_matrix':>15} {'type_synergy':>13}  pairs")
+    for n in (int(s) for s in args.sizes.split(",")):
+        ids, matrix = synthetic_team(n, rng)
+        counts = {t: c for t, c in zip(TYPES, rng.multinomial(n, [1 / len(TYPES)] * len(TYPES))) if c}
+        analyze_ms = timed(lambda: culture.analyze_matrix(ids, matrix, DIMENSIONS), args.repeat)
+        synergy_ms = timed(lambda: culture.type_synergy(counts, lookup), args.repeat)
+        exact = n <= culture.CULTURE_PAIRWISE_MAX_MEMBERS
+        print(f"{n:>8} {analyze_ms:>12.2f} ms {synergy_ms:>10.3f} ms  {'exact' if exact else 'candidates'}")
+
+    # Candidate search vs the exact farthest pair (full matrix, a few thousand members)
+    ids, matrix = synthetic_team(4000, rng)
+    limit = culture.CULTURE_PAIRWISE_MAX_MEMBERS
+    approx = culture.analyze_matrix(ids, matrix, DIMENSIONS)["outlier_pairs"][0]["distance"]
+    culture.CULTURE_PAIRWISE_MAX_MEMBERS = len(ids)
+    exact = culture.analyze_matrix(ids, matrix, DIMENSIONS)["outlier_pairs"][0]["distance"]
+    culture.CULTURE_PAIRWISE_MAX_MEMBERS = limit
+    print(f"\nfarthest pair, 4000 members: candidates {approx}, exact {exact}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the per-request pure-Python hot paths:
+
+  team_service        calculate_team_synergy, generate_team_recommendations,
+                      generate_communication_tips
+  assessment_service  calculate_dimension_scores (scoring loop)
+  hugo_engine         analyze_personality_scores (dominant-dimension logic)
+
+Database access is replaced by in-memory fakes returning synthetic rows, so
+only the Python work is measured. Sizes run from realistic to extreme
+(1-10k team members, 1-1k answers).
+
+Usage:
+  python benchmarks/bench_hot_functions.py                 # run and print
+  python benchmarks/bench_hot_functions.py --save          # store results as the baseline
+  python benchmarks/bench_hot_functions.py --check         # fail if slower than baseline by --threshold
+  python benchmarks/bench_hot_functions.py --max-members 10000 --filter synergy
+
+benchmarks/baselines/hot_functions.json is the committed baseline; timings
+depend on the machine, so re-record it with --save where --check runs.
+
+The 10k-member tier is opt-in: calculate_team_synergy walks all ~50M pairs
+and keeps every conflict, which takes minutes and several GB of memory.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "hot_functions.json")
+
+MEMBER_SIZES = [1, 10, 100, 1000, 10000]
+ANSWER_SIZES = [1, 10, 100, 1000]
+
+DIMENSIONS = ["Vision", "Innovation", "Expertise", "Connection"]
+TYPE_CODES = [f"{d[0]}{i}" for d in DIMENSIONS for i in (1, 2, 3)]
+SYNERGY_LEVELS = ["High Synergy", "Moderate Synergy", "Potential Conflict", "High Conflict"]
+
+sys.path.insert(0, BACKEND)
+
+def load_service(name: str):
+    """Import backend/<name>/main.py under a unique module name; sibling modules resolve via sys.path"""
+    path = os.path.join(BACKEND, name)
+    if path not in sys.path:
+        sys.path.append(path)
+    spec = importlib.util.spec_from_file_location(f"{name}_main", os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class FakeConnection:
+    """Stands in for an asyncpg connection; every fetch returns the given rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, query, *args):
+        return self.rows
+
+    async def close(self):
+        pass
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+
+def synthetic_matrix(rng):
+    return [
+        {"type_a": a, "type_b": b, "synergy_level": rng.choice(SYNERGY_LEVELS), "communication_tips": f"Tips for {a}/{b}"}
+        for a in TYPE_CODES for b in TYPE_CODES
+    ]
+
+def synthetic_members(rng, count):
+    members = []
+    for _ in range(count):
+        code = rng.choice(TYPE_CODES)
+        members.append({"code": code, "name": f"Type {code}", "dimension": DIMENSIONS["VIEC".index(code[0])]})
+    return members
+
+def synthetic_answers(rng, count):
+    answers = []
+    for _ in range(count):
+        value = rng.choice([rng.randint(1, 5), rng.choice("ABCD"), 2.5])
+        answers.append({"dimension": rng.choice(DIMENSIONS), "answer_value": value, "weight": rng.choice([1, 1.5, 2])})
+    return answers
+
+def synthetic_hugo_types():
+    return [
+        {"id": str(uuid.uuid4()), "code": f"{dim[0]}{i}", "name": f"{dim} {i}", "dimension": dim,
+         "description": "", "strengths": ["a"], "development_areas": ["b"], "communication_style": {}}
+        for dim in DIMENSIONS for i in (1, 2, 3)
+    ]
+
+# ---------------------------------------------------------------------------
+# Benchmark cases: name -> zero-argument coroutine factory
+
+def build_cases(max_members: int, max_answers: int):
+    rng = random.Random(42)
+    team = load_service("team_service")
+    assessment = load_service("assessment_service")
+    hugo = load_service("hugo_engine")
+    matrix_conn = FakeConnection(synthetic_matrix(rng))
+    cases = {}
+
+    for n in [s for s in MEMBER_SIZES if s <= max_members]:
+        members = synthetic_members(rng, n)
+        dimension_dist, type_dist = {}, {}
+        for m in members:
+            dimension_dist[m["dimension"]] = dimension_dist.get(m["dimension"], 0) + 1
+            type_dist[m["code"]] = type_dist.get(m["code"], 0) + 1
+
+        cases[f"team.calculate_team_synergy[{n}]"] = \
+            lambda members=members: team.calculate_team_synergy(matrix_conn, members)
+
+        async def recommendations(d=dimension_dist, t=type_dist, n=n):
+            return team.generate_team_recommendations(d, t, n)
+        cases[f"team.generate_team_recommendations[{n}]"] = recommendations
+
+        cases[f"team.generate_communication_tips[{n}]"] = \
+            lambda members=members: team.generate_communication_tips(None, members)
+
+    for n in [s for s in ANSWER_SIZES if s <= max_answers]:
+        conn = FakeConnection(synthetic_answers(rng, n))
+        assessment_id = str(uuid.uuid4())
+        cases[f"assessment.calculate_dimension_scores[{n}]"] = \
+            lambda conn=conn: assessment.calculate_dimension_scores(conn, assessment_id)
+
+    hugo_types = synthetic_hugo_types()
+
+    async def fake_hugo_connection():
+        return FakeConnection(hugo_types[:3])
+    hugo.get_db_connection = fake_hugo_connection
+    scores = {d: rng.random() for d in DIMENSIONS}
+    cases["hugo.analyze_personality_scores"] = lambda: hugo.analyze_personality_scores(scores)
+
+    return cases
+
+async def measure(factory, min_time: float) -> dict:
+    """Repeat until min_time has elapsed (at least 3 runs); report the best per-call time"""
+    start = time.perf_counter()
+    await factory()  # warm-up
+    warmup = time.perf_counter() - start
+    if warmup > min_time:
+        # Extreme sizes: a single call is already longer than the budget
+        return {"best_us": round(warmup * 1e6, 3), "mean_us": round(warmup * 1e6, 3), "runs": 1}
+    runs, best, total = 0, float("inf"), 0.0
+    while total < min_time or runs < 3:
+        start = time.perf_counter()
+        await factory()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return {"best_us": round(best * 1e6, 3), "mean_us": round(total / runs * 1e6, 3), "runs": runs}
+
+async def run(args) -> dict:
+    cases = build_cases(args.max_members, args.max_answers)
+    results = {}
+    for name, factory in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = await measure(factory, args.min_time)
+        r = results[name]
+        print(f"{name:<50} best {r['best_us']:>14,.1f} µs   mean {r['mean_us']:>14,.1f} µs   ({r['runs']} runs)")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for pure-Python hot functions")
+    parser.add_argument("--max-members", type=int, default=1000)
+    parser.add_argument("--max-answers", type=int, default=max(ANSWER_SIZES))
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds of measurement per case")
+    parser.add_argument("--filter", help="only run cases whose name contains this string")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="compare against the stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    if args.check and not os.path.exists(args.baseline):
+        sys.exit(f"No baseline at {args.baseline}; record one with --save first")
+
+    results = asyncio.run(run(args))
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = [
+            f"{name}: {baseline[name]['best_us']:,.1f} -> {r['best_us']:,.1f} µs"
+            for name, r in results.items()
+            if name in baseline and r["best_us"] > baseline[name]["best_us"] * (1 + args.threshold)
+        ]
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+
+if __name__ == "__main__":
+    main()
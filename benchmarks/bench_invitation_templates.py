@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Benchmark: render 100k invitation emails with the precompiled templates.
+
+Usage: python benchmarks/bench_invitation_templates.py [count]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "chat_assessment_service"))
+
+import mailer
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    invitees = [
+        (f"person{i}@example.com", f"Person {i}", f"Company {i % 50}", "Anna Schmidt", f"token-{i:08d}")
+        for i in range(count)
+    ]
+    
+    start = time.perf_counter()
+    total_bytes = 0
+    for email, name, company, sender, token in invitees:
+        total_bytes += len(mailer.build_invitation_message(email, name, company, sender, token))
+    elapsed = time.perf_counter() - start
+    
+    print(f"Rendered {count} invitations in {elapsed:.2f}s "
+          f"({count / elapsed:,.0f}/s, {elapsed / count * 1e6:.1f} µs each, {total_bytes / count:,.0f} bytes avg)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+CPU cost per request of the Pydantic response path vs shared/fastjson.py.
+
+For N-element payloads (default 10k) of Hugo types, assessment questions and
+team members it measures:
+
+  pydantic  one model per row, then what FastAPI does with response_model:
+            re-validate, dump to JSON-able Python, json.dumps
+  orjson    fastjson.records_response (records straight to orjson, JSONB
+            columns embedded as text)
+  cached    fastjson.JSONCache hit (pre-serialized bytes)
+
+Usage:
+  python benchmarks/bench_json_serialization.py [--rows 10000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+sys.path.insert(0, BACKEND)
+
+from pydantic import TypeAdapter  # noqa: E402
+from shared import fastjson  # noqa: E402
+
+def load_service(name: str):
+    """Import backend/<name>/main.py; its sibling modules resolve via sys.path"""
+    path = os.path.join(BACKEND, name)
+    if path not in sys.path:
+        sys.path.append(path)
+    spec = importlib.util.spec_from_file_location(f"{name}_main", os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def hugo_type_rows(n):
+    """(records as asyncpg returns them, the same rows decoded for Pydantic)"""
+    raw, decoded = [], []
+    for i in range(n):
+        row = {
+            "id": uuid.uuid4(), "code": f"V{i % 3 + 1}", "name": f"Type {i}", "dimension": "Vision",
+            "description": "Strategic thinker with a clear direction " * 3,
+            "strengths": json.dumps(["Strategy", "Leadership", "Focus"]),
+            "development_areas": json.dumps(["Patience", "Detail"]),
+            "communication_style": json.dumps({"preferred": "direct", "pace": "fast", "format": ["bullet points"]})
+        }
+        raw.append(row)
+        decoded.append({**row, "id": str(row["id"]), **{k: json.loads(row[k]) for k in ("strengths", "development_areas", "communication_style")}})
+    return raw, decoded
+
+def question_rows(n):
+    raw, decoded = [], []
+    for i in range(n):
+        row = {
+            "id": uuid.uuid4(), "question_text": f"How do you approach problem {i}?", "question_type": "scale",
+            "options": json.dumps({"min": 1, "max": 5, "labels": ["never", "always"]}), "dimension": "Innovation"
+        }
+        raw.append(row)
+        decoded.append({**row, "id": str(row["id"]), "options": json.loads(row["options"])})
+    return raw, decoded
+
+def member_rows(n):
+    raw, decoded = [], []
+    for i in range(n):
+        row = {
+            "id": uuid.uuid4(), "user_id": uuid.uuid4(), "role": "member", "joined_at": datetime(2024, 5, 1, 12, 30),
+            "first_name": "Anna", "last_name": f"Schmidt {i}", "email": f"user{i}@example.com",
+            "hugo_type_code": "C2", "hugo_type_name": "Harmonizer"
+        }
+        raw.append(row)
+        decoded.append({**row, "id": str(row["id"]), "user_id": str(row["user_id"])})
+    return raw, decoded
+
+def pydantic_path(model, rows) -> bytes:
+    """Endpoint builds models, FastAPI validates against response_model and serializes"""
+    adapter = TypeAdapter(List[model])
+    models = [model(**row) for row in rows]
+    validated = adapter.validate_python(models, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def cpu_us(fn, repeat: int) -> float:
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        best = min(best, time.process_time() - start)
+    return best * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    hugo = load_service("hugo_engine")
+    assessment = load_service("assessment_service")
+    team = load_service("team_service")
+
+    cases = [
+        ("hugo types", hugo.HugoType, hugo_type_rows(args.rows), hugo.HUGO_TYPE_JSON_COLUMNS),
+        ("assessment questions", assessment.AssessmentQuestion, question_rows(args.rows), ("options",)),
+        ("team members", team.TeamMember, member_rows(args.rows), ()),
+    ]
+    cache = fastjson.JSONCache(ttl=3600)
+
+    print(f"CPU time per request, {args.rows:,} rows (best of {args.repeat})\n")
+    print(f"{'payload':<22}{'pydantic':>14}{'orjson':>14}{'cached':>12}{'speedup':>10}")
+    for name, model, (raw, decoded), json_columns in cases:
+        slow = cpu_us(lambda: pydantic_path(model, decoded), args.repeat)
+        fast = cpu_us(lambda: fastjson.records_response(raw, json_columns).body, args.repeat)
+
+        async def load():
+            return [fastjson.row_dict(row, json_columns) for row in raw]
+
+        async def cache_hits():
+            await cache.response(name, load)
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.process_time()
+                await cache.response(name, load)
+                best = min(best, time.process_time() - start)
+            return best * 1e6
+        cached = asyncio.run(cache_hits())
+
+        # Same document either way
+        assert json.loads(fastjson.records_response(raw, json_columns).body) == json.loads(pydantic_path(model, decoded))
+        print(f"{name:<22}{slow / 1000:>11.1f} ms{fast / 1000:>11.1f} ms{cached / 1000:>9.2f} ms{slow / fast:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login lookup before/after the slim query + covering index.
+
+Seeds synthetic users into a local database, shows the plan of the login
+query (expect "Index Only Scan using idx_users_login" once the table is
+vacuumed) and times both the old and the new lookup. Seeded rows are
+removed afterwards.
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/bench_login_query.py [users] [lookups]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+import asyncpg
+
+OLD_QUERY = """
+    SELECT u.*, c.name as company_name
+    FROM users u
+    LEFT JOIN companies c ON u.company_id = c.id
+    WHERE u.email = $1 AND u.is_active = true
+"""
+
+NEW_QUERY = """
+    SELECT id, email, password_hash, first_name, last_name, role, company_id
+    FROM users
+    WHERE email = $1 AND is_active = true
+"""
+
+EMAIL_PREFIX = "bench-login-"
+
+async def seed(conn, count: int) -> int:
+    company_id = await conn.fetchval(
+        """
+        INSERT INTO companies (name, domain) VALUES ('Bench Login GmbH', 'bench-login.invalid')
+        ON CONFLICT (domain) DO UPDATE SET name = EXCLUDED.name
+        RETURNING id
+        """
+    )
+    await conn.execute(
+        """
+        INSERT INTO users (email, password_hash, first_name, last_name, role, company_id, avatar_url, department)
+        SELECT $1 || g || '@example.com', '$2b$12$LQv3c1yqBwlVHpPjrCeyL.rS.DTDtnbJioy3B9Q5qHiMiNEQP.H6i',
+               'First' || g, 'Last' || g, 'user', $2, 'https://cdn.example.com/avatars/' || g || '.png', 'Bench'
+        FROM generate_series(1, $3) g
+        ON CONFLICT (email) DO NOTHING
+        """,
+        EMAIL_PREFIX, company_id, count
+    )
+    return company_id
+
+async def timed(conn, query: str, emails) -> float:
+    stmt = await conn.prepare(query)
+    start = time.perf_counter()
+    for email in emails:
+        await stmt.fetchrow(email)
+    return (time.perf_counter() - start) / len(emails) * 1e6
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        await seed(conn, users)
+        # Index-only scans need an up-to-date visibility map
+        await conn.execute("VACUUM ANALYZE users")
+        
+        sample = f"{EMAIL_PREFIX}{users // 2}@example.com"
+        for name, query in (("old", OLD_QUERY), ("new", NEW_QUERY)):
+            plan = await conn.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {query}", sample)
+            print(f"--- {name} plan")
+            for row in plan:
+                print("   ", row[0])
+        
+        emails = [f"{EMAIL_PREFIX}{random.randint(1, users)}@example.com" for _ in range(lookups)]
+        old_us = await timed(conn, OLD_QUERY, emails)
+        new_us = await timed(conn, NEW_QUERY, emails)
+        print(f"{users} users, {lookups} lookups: old {old_us:.1f} µs/login, new {new_us:.1f} µs/login")
+    finally:
+        await conn.execute("DELETE FROM users WHERE email LIKE $1", EMAIL_PREFIX + "%")
+        await conn.execute("DELETE FROM companies WHERE domain = 'bench-login.invalid'")
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
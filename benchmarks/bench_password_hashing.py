@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bcrypt login verifications per second, per core, through the
+user service's bounded hashing pool.
+
+Usage: python benchmarks/bench_password_hashing.py [rounds] [logins]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "user_service"))
+
+import passwords
+
+async def run(workers: int, stored: str, logins: int) -> float:
+    hasher = passwords.PasswordHasher(workers=workers, max_pending=logins, rounds=passwords.bcrypt_rounds(stored))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(hasher.verify("demo123", stored) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+    assert all(results)
+    return logins / elapsed
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else passwords.BCRYPT_ROUNDS
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    stored = passwords.hash_sync("demo123", rounds)
+    cores = os.cpu_count() or 1
+    
+    print(f"bcrypt cost {rounds}, {logins} logins per run, {cores} CPUs")
+    for workers in sorted({1, 2, cores // 2 or 1, cores}):
+        rate = asyncio.run(run(workers, stored, logins))
+        print(f"  workers={workers:<3} {rate:8.1f} logins/s  {rate / min(workers, cores):8.1f} logins/s/core")
+
+if __name__ == "__main__":
+    main()
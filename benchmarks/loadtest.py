@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Hugo App v2 - Load Testing Harness
+
+Drives the running services (docker-compose or local uvicorn against a local
+Postgres) with concurrent asyncio clients and reports p50/p95/p99 latency and
+requests per second per scenario.
+
+Scenarios:
+  login_storm        POST /auth/login with the demo credentials from many client IPs
+                     (X-Real-IP; the user service only honours it from TRUSTED_PROXIES,
+                     127.0.0.1 by default, otherwise LOGIN_RATE_* limits the run)
+  question_fetch     GET  /questions (assessment service)
+  bulk_submit        create an assessment and submit answers to every question
+                     (needs --user-id of an existing user)
+  chat_conversation  invitation -> session -> one message per chat question; OpenAI
+                     is replaced by a local stub (start the chat service with
+                     OPENAI_API_KEY=stub OPENAI_API_BASE=http://<host>:<stub-port>/v1)
+  team_analysis      GET /{team_id}/analysis (needs --team-id of a large team)
+
+Results are written as JSON (--output) and can be compared against an earlier
+run (--compare baseline.json); the exit code is 1 if any scenario's p95 or RPS
+regressed by more than --threshold.
+
+Usage:
+  python benchmarks/loadtest.py --scenarios login_storm,question_fetch \\
+      --concurrency 50 --duration 30 --output results.json
+"""
+import abc
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+DEFAULT_URLS = {
+    "user": "http://localhost:8001",
+    "hugo": "http://localhost:8002",
+    "assessment": "http://localhost:8003",
+    "team": "http://localhost:8004",
+    "chat": "http://localhost:8005",
+}
+
+CHAT_QUESTION_COUNT = 8
+
+SAMPLE_ANSWERS = [
+    "Ich liebe es, neue Ideen zu entwickeln und gemeinsam mit dem Team umzusetzen.",
+    "Ich analysiere zuerst alle Fakten und entscheide dann strukturiert.",
+    "Mir ist wichtig, dass sich alle im Team gehört fühlen.",
+    "Ich denke langfristig und setze klare Ziele für das Team.",
+]
+
+class Recorder:
+    """Latency samples and status counts for one named operation"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.started = 0.0
+        self.finished = 0.0
+
+    def record(self, seconds: float, status: Any, ok: bool):
+        self.latencies.append(seconds)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+        elapsed = max(self.finished - self.started, 1e-9)
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))] * 1000
+
+        return {
+            "requests": len(samples),
+            "errors": self.errors,
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(50), 2),
+            "p95_ms": round(percentile(95), 2),
+            "p99_ms": round(percentile(99), 2),
+            "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+            "statuses": self.statuses,
+        }
+
+async def timed(recorder: Recorder, request) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError as e:
+        recorder.record(time.perf_counter() - start, type(e).__name__, False)
+        return None
+    recorder.record(time.perf_counter() - start, response.status_code, response.status_code < 400)
+    return response
+
+# ---------------------------------------------------------------------------
+# Scenarios: each iteration is one unit of work for a virtual user
+
+class Scenario(abc.ABC):
+    name = ""
+
+    def __init__(self, args, client: httpx.AsyncClient):
+        self.args = args
+        self.client = client
+        self.recorders: Dict[str, Recorder] = {}
+
+    def recorder(self, name: str) -> Recorder:
+        if name not in self.recorders:
+            self.recorders[name] = Recorder(name)
+        return self.recorders[name]
+
+    def skip_reason(self) -> Optional[str]:
+        return None
+
+    async def setup(self):
+        pass
+
+    @abc.abstractmethod
+    async def iteration(self, vu: int):
+        ...
+
+class LoginStorm(Scenario):
+    name = "login_storm"
+
+    async def iteration(self, vu: int):
+        # Spread clients over many addresses so the per-IP login limit is not what gets measured
+        # (only effective when this host is one of the service's TRUSTED_PROXIES)
+        await timed(self.recorder("login"), self.client.post(
+            f"{self.args.user_url}/auth/login",
+            json={"email": self.args.login_email, "password": self.args.login_password},
+            headers={"X-Real-IP": f"10.{vu % 256}.{random.randint(0, 255)}.{random.randint(1, 254)}"}
+        ))
+
+class QuestionFetch(Scenario):
+    name = "question_fetch"
+
+    async def iteration(self, vu: int):
+        await timed(self.recorder("questions"), self.client.get(f"{self.args.assessment_url}/questions"))
+
+class BulkSubmit(Scenario):
+    name = "bulk_submit"
+    questions: List[Dict[str, Any]] = []
+
+    def skip_reason(self):
+        return None if self.args.user_id else "needs --user-id"
+
+    async def setup(self):
+        response = await self.client.get(f"{self.args.assessment_url}/questions")
+        response.raise_for_status()
+        self.questions = response.json()
+
+    async def iteration(self, vu: int):
+        created = await timed(self.recorder("create_assessment"), self.client.post(
+            f"{self.args.assessment_url}/", json={"user_id": self.args.user_id}))
+        if created is None or created.status_code >= 400:
+            return
+        answers = [
+            {"question_id": q["id"], "answer_value": random.randint(1, 5) if q["question_type"] == "scale" else random.choice("ABCD")}
+            for q in self.questions
+        ]
+        await timed(self.recorder("submit"), self.client.post(
+            f"{self.args.assessment_url}/submit",
+            json={"assessment_id": created.json()["assessment_id"], "answers": answers}))
+
+class ChatConversation(Scenario):
+    name = "chat_conversation"
+
+    async def iteration(self, vu: int):
+        started = time.perf_counter()
+        email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        invitation = await timed(self.recorder("create_invitation"), self.client.post(
+            f"{self.args.chat_url}/invitations",
+            json={"participant_email": email, "participant_name": f"Load Test {vu}",
+                  "company_name": "Load Test GmbH", "sender_name": "Harness"}))
+        if invitation is None or invitation.status_code >= 400:
+            return
+        session = await timed(self.recorder("create_session"), self.client.post(
+            f"{self.args.chat_url}/sessions",
+            json={"invitation_token": invitation.json()["invitation_token"],
+                  "participant_name": f"Load Test {vu}", "participant_email": email}))
+        if session is None or session.status_code >= 400:
+            return
+        session_id = session.json()["session_id"]
+        for _ in range(CHAT_QUESTION_COUNT):
+            response = await timed(self.recorder("chat_message"), self.client.post(
+                f"{self.args.chat_url}/sessions/{session_id}/message",
+                json={"session_id": session_id, "message": random.choice(SAMPLE_ANSWERS),
+                      "is_user": True, "timestamp": datetime.utcnow().isoformat()}))
+            if response is None or response.status_code >= 400:
+                return
+        self.recorder("full_conversation").record(time.perf_counter() - started, 200, True)
+
+class TeamAnalysis(Scenario):
+    name = "team_analysis"
+
+    def skip_reason(self):
+        return None if self.args.team_id else "needs --team-id"
+
+    async def iteration(self, vu: int):
+        await timed(self.recorder("analysis"), self.client.get(
+            f"{self.args.team_url}/{self.args.team_id}/analysis"))
+
+SCENARIOS = {cls.name: cls for cls in (LoginStorm, QuestionFetch, BulkSubmit, ChatConversation, TeamAnalysis)}
+
+# ---------------------------------------------------------------------------
+# Stub OpenAI endpoint (chat completions with a fixed latency)
+
+async def handle_stub_llm(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, latency: float):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            request = json.loads(await reader.readexactly(length)) if length else {}
+            await asyncio.sleep(latency)
+            # The analysis prompt asks for JSON scores, the chat prompt for prose
+            wants_json = "JSON" in json.dumps(request.get("messages", []))
+            content = json.dumps({d: round(random.random(), 2) for d in ("Vision", "Innovation", "Expertise", "Connection")}) \
+                if wants_json else "Danke, das klingt spannend!"
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 200, "completion_tokens": 30, "total_tokens": 230}
+            }).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+                         + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+# ---------------------------------------------------------------------------
+# Runner
+
+async def run_scenario(scenario: Scenario, concurrency: int, duration: float, iterations: Optional[int]):
+    deadline = time.perf_counter() + duration
+    remaining = [iterations] if iterations else None
+
+    async def virtual_user(vu: int):
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            await scenario.iteration(vu)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(vu) for vu in range(concurrency)))
+    finished = time.perf_counter()
+    for recorder in scenario.recorders.values():
+        recorder.started, recorder.finished = started, finished
+
+def compare(results: Dict[str, Any], baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    regressions = []
+    for scenario, operations in results["scenarios"].items():
+        for operation, current in operations.items():
+            previous = baseline.get(scenario, {}).get(operation)
+            if not previous or not previous.get("requests"):
+                continue
+            if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(f"{scenario}/{operation}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+            if current["rps"] < previous["rps"] * (1 - threshold):
+                regressions.append(f"{scenario}/{operation}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+def print_table(results: Dict[str, Any]):
+    print(f"\n{'scenario/operation':<40}{'reqs':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for scenario, operations in results["scenarios"].items():
+        for operation, s in operations.items():
+            print(f"{scenario + '/' + operation:<40}{s['requests']:>8}{s['errors']:>6}{s['rps']:>10}"
+                  f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+
+async def main(args) -> int:
+    stub_server = None
+    if args.stub_llm_port:
+        stub_server = await asyncio.start_server(
+            lambda r, w: handle_stub_llm(r, w, args.stub_llm_latency), "0.0.0.0", args.stub_llm_port)
+        print(f"Stub OpenAI endpoint on :{args.stub_llm_port} ({args.stub_llm_latency * 1000:.0f} ms per call)")
+
+    results: Dict[str, Any] = {
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "config": {"concurrency": args.concurrency, "duration": args.duration, "iterations": args.iterations},
+        "scenarios": {}
+    }
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for name in args.scenarios.split(","):
+            scenario = SCENARIOS[name.strip()](args, client)
+            reason = scenario.skip_reason()
+            if reason:
+                print(f"⏭️  {scenario.name}: skipped ({reason})")
+                continue
+            print(f"🏃 {scenario.name}: {args.concurrency} virtual users for {args.duration}s")
+            await scenario.setup()
+            await run_scenario(scenario, args.concurrency, args.duration, args.iterations)
+            results["scenarios"][scenario.name] = {n: r.summary() for n, r in scenario.recorders.items()}
+
+    if stub_server is not None:
+        stub_server.close()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Hugo load-testing harness")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per scenario")
+    parser.add_argument("--iterations", type=int, help="stop each scenario after this many iterations")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--user-url", default=DEFAULT_URLS["user"])
+    parser.add_argument("--hugo-url", default=DEFAULT_URLS["hugo"])
+    parser.add_argument("--assessment-url", default=DEFAULT_URLS["assessment"])
+    parser.add_argument("--team-url", default=DEFAULT_URLS["team"])
+    parser.add_argument("--chat-url", default=DEFAULT_URLS["chat"])
+    parser.add_argument("--login-email", default="user@democompany.com")
+    parser.add_argument("--login-password", default="demo123")
+    parser.add_argument("--user-id", help="existing user id for bulk_submit")
+    parser.add_argument("--team-id", help="existing (large) team id for team_analysis")
+    parser.add_argument("--stub-llm-port", type=int, default=0, help="serve a stub OpenAI API on this port")
+    parser.add_argument("--stub-llm-latency", type=float, default=0.3, help="seconds per stubbed LLM call")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Query plan audit: EXPLAIN every SQL statement of the services and fail on
+sequential scans of large tables.
+
+Usage:
+  DATABASE_URL=postgresql://... python database/audit_query_plans.py [--verbose]
+
+Statements are collected from backend/*/*.py: string literals (or module
+constants) passed to fetch/fetchrow/fetchval/execute/executemany/cursor, plus
+the export queries built by assessment_service/export.py. Each one is
+prepared and explained as a generic plan (parameter values do not matter),
+inside a transaction that is rolled back; INSERT/UPDATE/DELETE are explained,
+never executed.
+
+Sequential scans are disabled for the audit, so a Seq Scan that remains in
+a plan means no index can serve that access path, whether the database is
+seeded or empty. A plan fails when it seq-scans a table outside SMALL_TABLES
+with a filter or as the inner side of a nested loop (rescanned per outer
+row); unfiltered full reads (catalogue listings, exports) are reported with
+--verbose only. Statements that cannot be prepared (temp
+tables, tables this database does not have) are listed as not checked;
+--strict makes them fail too.
+
+Exit code 0 when every checked plan passes, 1 otherwise.
+"""
+import argparse
+import ast
+import asyncio
+import glob
+import importlib.util
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import asyncpg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+QUERY_METHODS = {"fetch", "fetchrow", "fetchval", "execute", "executemany", "cursor"}
+AUDITED_VERBS = {"select", "with", "insert", "update", "delete"}
+# Lookup tables with a few dozen rows; scanning them is cheaper than any index
+SMALL_TABLES = {"hugo_types", "assessment_questions", "permissions", "role_permissions", "culture_dimensions"}
+# Created per request inside a transaction, never present when auditing
+TEMP_TABLES = {"import_users"}
+
+_PARAM = re.compile(r"\$(\d+)")
+
+class Statement:
+    def __init__(self, location: str, sql: str):
+        self.location = location
+        self.sql = sql
+
+    @property
+    def summary(self) -> str:
+        return " ".join(self.sql.split())[:110]
+
+def _module_constants(tree) -> dict:
+    """Module-level strings, and tuples of strings, by name"""
+    constants = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        if isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            values = [node.value.value]
+        elif isinstance(node.value, ast.Tuple) and all(
+                isinstance(e, ast.Constant) and isinstance(e.value, str) for e in node.value.elts):
+            values = [e.value for e in node.value.elts]  # e.g. imports._VALIDATE_SET_SQL
+        else:
+            continue
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                constants[target.id] = values
+    return constants
+
+def collect_statements():
+    """(statements, call sites whose SQL is built at runtime)"""
+    statements, dynamic, seen = [], [], set()
+    for path in sorted(glob.glob(os.path.join(BACKEND, "*", "*.py"))):
+        relpath = os.path.relpath(path, BACKEND)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        constants = _module_constants(tree)
+        for function in ast.walk(tree):
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            # `for statement in _SQL_TUPLE:` makes `statement` one of the tuple's strings
+            names = dict(constants)
+            for node in ast.walk(function):
+                if (isinstance(node, ast.For) and isinstance(node.target, ast.Name)
+                        and isinstance(node.iter, ast.Name) and node.iter.id in constants):
+                    names[node.target.id] = constants[node.iter.id]
+            for node in ast.walk(function):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in QUERY_METHODS and node.args):
+                    continue
+                location = f"{relpath}:{node.lineno} {function.name}"
+                arg = node.args[0]
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                    sqls = [arg.value]
+                elif isinstance(arg, ast.Name) and arg.id in names:
+                    sqls = names[arg.id]
+                else:
+                    dynamic.append(location)
+                    continue
+                for sql in sqls:
+                    key = " ".join(sql.split())
+                    if key not in seen:
+                        seen.add(key)
+                        statements.append(Statement(location, sql))
+    statements.extend(_export_statements())
+    return statements, dynamic
+
+def _export_statements():
+    """Queries GET /export builds at runtime, in their most selective form"""
+    spec = importlib.util.spec_from_file_location("export", os.path.join(BACKEND, "assessment_service", "export.py"))
+    export = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(export)
+    statements = []
+    for source in ("assessments", "chat"):
+        sql, _ = export.build_query(source, 1, datetime.now())
+        statements.append(Statement(f"assessment_service/export.py build_query({source!r})", sql))
+    return statements
+
+def _seq_scans(plan, found):
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        _seq_scans(child, found)
+    return found
+
+async def explain(conn, statement: Statement):
+    """Seq Scan nodes of the generic plan"""
+    params = max((int(n) for n in _PARAM.findall(statement.sql)), default=0)
+    await conn.execute(f"PREPARE audit_stmt AS {statement.sql}")
+    try:
+        args = ", ".join(["NULL"] * params)
+        # Savepoint: a planner error must not abort the transaction DEALLOCATE runs in
+        # (prepared statements outlive a rollback)
+        async with conn.transaction():
+            rows = await conn.fetchval(
+                f"EXPLAIN (FORMAT JSON, VERBOSE) EXECUTE audit_stmt{f'({args})' if params else ''}"
+            )
+    finally:
+        await conn.execute("DEALLOCATE audit_stmt")
+    plan = json.loads(rows)[0]["Plan"] if isinstance(rows, str) else rows[0]["Plan"]
+    return _seq_scans(plan, [])
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fail on sequential scans of large tables in service queries")
+    parser.add_argument("--dsn", default=DATABASE_URL, help="defaults to $DATABASE_URL")
+    parser.add_argument("--schema", default="public")
+    parser.add_argument("--strict", action="store_true", help="statements that cannot be explained fail too")
+    parser.add_argument("--verbose", action="store_true", help="also list passing statements and unfiltered scans")
+    args = parser.parse_args()
+    if not args.dsn:
+        raise SystemExit("DATABASE_URL (or --dsn) is required")
+
+    statements, dynamic = collect_statements()
+    statements = [s for s in statements if s.sql.split(None, 1)[0].lower() in AUDITED_VERBS]
+
+    failures, unchecked, passed = [], [], 0
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        for statement in statements:
+            temp = next((t for t in TEMP_TABLES if re.search(rf"\b{t}\b", statement.sql)), None)
+            if temp:
+                unchecked.append((statement, f"temp table {temp}"))
+                continue
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                await conn.execute("SET LOCAL enable_seqscan = off")
+                await conn.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+                scans = await explain(conn, statement)
+            except asyncpg.PostgresError as e:
+                unchecked.append((statement, str(e).splitlines()[0]))
+                continue
+            finally:
+                await transaction.rollback()
+
+            bad = [
+                s for s in scans
+                if s.get("Schema") == args.schema and s["Relation Name"] not in SMALL_TABLES
+                and ("Filter" in s or s.get("Parent Relationship") == "Inner")
+            ]
+            if bad:
+                failures.append((statement, bad))
+            else:
+                passed += 1
+                if args.verbose:
+                    full = [s["Relation Name"] for s in scans if s.get("Schema") == args.schema]
+                    note = f" (full read: {', '.join(full)})" if full else ""
+                    print(f"✅ {statement.location}{note}")
+    finally:
+        await conn.close()
+
+    for statement, scans in failures:
+        print(f"❌ {statement.location}\n   {statement.summary}")
+        for scan in scans:
+            condition = f"Filter: {scan['Filter']}" if "Filter" in scan else "inner side of a nested loop"
+            print(f"   Seq Scan on {scan['Relation Name']}  {condition}")
+    for statement, reason in unchecked:
+        print(f"⚠️  not checked: {statement.location}: {reason}")
+    for location in dynamic:
+        print(f"⚠️  dynamic SQL not audited: {location}")
+
+    print(f"\n{passed} passed, {len(failures)} failed, {len(unchecked)} not checked, {len(dynamic)} dynamic")
+    if failures or (args.strict and unchecked):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
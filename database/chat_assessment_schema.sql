@@ -25,25 +25,94 @@ CREATE TABLE chat_sessions (
     hugo_type_result VARCHAR(10),
     is_completed BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    completed_at TIMESTAMP
+    completed_at TIMESTAMP,
+    messages_archived_at TIMESTAMP
 );
 
--- Chat messages table
+-- Chat messages table, partitioned by month (see ensure_chat_message_partitions
+-- below; chat_assessment_service/retention.py creates partitions ahead of time,
+-- archives old transcripts and drops emptied partitions)
 CREATE TABLE chat_messages (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     session_id UUID NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
     message TEXT NOT NULL,
     is_user BOOLEAN NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Archived transcripts: one JSONB array per session, TOAST-compressed
+CREATE TABLE chat_messages_archive (
+    session_id UUID PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    message_count INTEGER NOT NULL,
+    first_message_at TIMESTAMP,
+    last_message_at TIMESTAMP,
+    messages JSONB NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Create indexes for better performance
-CREATE INDEX idx_assessment_invitations_token ON assessment_invitations(token);
+CREATE INDEX idx_assessment_invitations_token_expiry ON assessment_invitations(token, expires_at);
 CREATE INDEX idx_assessment_invitations_email ON assessment_invitations(participant_email);
 CREATE INDEX idx_chat_sessions_invitation_token ON chat_sessions(invitation_token);
 CREATE INDEX idx_chat_sessions_email ON chat_sessions(participant_email);
-CREATE INDEX idx_chat_messages_session_id ON chat_messages(session_id);
-CREATE INDEX idx_chat_messages_timestamp ON chat_messages(timestamp);
+CREATE INDEX idx_chat_messages_session_timestamp ON chat_messages(session_id, timestamp);
+-- Sessions whose transcript the retention job has not archived yet
+CREATE INDEX idx_chat_sessions_unarchived ON chat_sessions(created_at) WHERE messages_archived_at IS NULL;
+-- Incremental result exports (GET /assessments/export?since=...)
+CREATE INDEX idx_chat_sessions_completed_at ON chat_sessions(completed_at) WHERE is_completed = true;
+
+-- Monthly chat_messages partitions from the current month up to `months_ahead`
+-- months ahead, named chat_messages_yYYYYmMM. There is no default partition (it
+-- would rule out DETACH PARTITION CONCURRENTLY in the retention job), so the
+-- job keeps CHAT_PARTITIONS_AHEAD months created. Months already covered by
+-- another partition (e.g. one attached by migration 007) are skipped; rows left
+-- in a default partition by migration 007 are moved to their month.
+CREATE OR REPLACE FUNCTION ensure_chat_message_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', LOCALTIMESTAMP);
+    last_month TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) + make_interval(months => months_ahead);
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    IF to_regclass('chat_messages_default') IS NOT NULL THEN
+        -- Also the months whose rows went to the default partition
+        SELECT LEAST(month_start, date_trunc('month', min(timestamp))) INTO month_start
+        FROM chat_messages_default;
+    END IF;
+    WHILE month_start <= last_month LOOP
+        partition_name := 'chat_messages_' || to_char(month_start, '"y"YYYY"m"MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                -- Created standalone and attached: ATTACH PARTITION only takes SHARE UPDATE
+                -- EXCLUSIVE on chat_messages, inserts into other partitions go on
+                EXECUTE format('CREATE TABLE %I (LIKE chat_messages INCLUDING DEFAULTS)', partition_name);
+                IF to_regclass('chat_messages_default') IS NOT NULL THEN
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM chat_messages_default WHERE timestamp >= %L AND timestamp < %L '
+                        'RETURNING id, session_id, message, is_user, timestamp) '
+                        'INSERT INTO %I (id, session_id, message, is_user, timestamp) SELECT * FROM moved',
+                        month_start, month_start + INTERVAL '1 month', partition_name
+                    );
+                END IF;
+                EXECUTE format(
+                    'ALTER TABLE chat_messages ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + INTERVAL '1 month'
+                );
+                created := created + 1;
+            EXCEPTION WHEN invalid_object_definition THEN
+                -- overlaps an existing partition
+                NULL;
+            END;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_chat_message_partitions(12);
 
 -- Add trigger to update completed_at when assessment is completed
 CREATE OR REPLACE FUNCTION update_completed_at()
@@ -60,3 +129,24 @@ CREATE TRIGGER trigger_update_completed_at
     BEFORE UPDATE ON chat_sessions
     FOR EACH ROW
     EXECUTE FUNCTION update_completed_at();
+
+-- Outbound email queue, drained by the chat assessment email worker (worker.py)
+CREATE TABLE email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 8,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+-- Only undelivered rows are scanned by the worker's claim query
+CREATE INDEX idx_email_outbox_due ON email_outbox(next_attempt_at) WHERE status IN ('pending', 'sending');
+CREATE INDEX idx_email_outbox_sent_at ON email_outbox(sent_at) WHERE status = 'sent';
+CREATE INDEX idx_email_outbox_unsent ON email_outbox(created_at) WHERE status <> 'sent';
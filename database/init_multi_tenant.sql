@@ -3,6 +3,7 @@
 -- ACHTUNG: Wird nur bei leerem Volume automatisch ausgeführt; bei Re-Runs manuell.
 
 -- Views zuerst
+DROP MATERIALIZED VIEW IF EXISTS company_rollups;
 DROP VIEW IF EXISTS user_team_summary;
 DROP VIEW IF EXISTS company_overview;
 
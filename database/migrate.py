@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations: database/migrations/NNN_name.sql, applied in
+order and recorded in schema_migrations.
+
+Usage:
+  DATABASE_URL=postgresql://... python database/migrate.py [--dry-run]
+
+Optional header lines at the top of a migration:
+
+  -- requires: assessments, hugo_types
+      Only applied once these tables exist. The services own different tables
+      (the init scripts do not create all of them); a skipped migration is
+      picked up by a later run.
+  -- transaction: none
+      Statements run one by one outside a transaction, as needed by
+      CREATE/DROP INDEX CONCURRENTLY. Statements must end with ';' at the end
+      of a line. A failed concurrent build leaves an INVALID index behind;
+      drop it before re-running.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+import asyncpg
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+_FILENAME = re.compile(r"^(\d+)_[\w-]+\.sql$")
+_HEADER = re.compile(r"^--\s*(requires|transaction):\s*(.+)$")
+_STATEMENT_END = re.compile(r";\s*$", re.MULTILINE)
+
+class Migration:
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.version = _FILENAME.match(self.name).group(1)
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.requires = []
+        self.transaction = True
+        for line in self.sql.splitlines():
+            if not line.startswith("--"):
+                break
+            header = _HEADER.match(line)
+            if header and header.group(1) == "requires":
+                self.requires = [t.strip() for t in header.group(2).split(",") if t.strip()]
+            elif header and header.group(1) == "transaction":
+                self.transaction = header.group(2).strip() != "none"
+
+    def statements(self):
+        body = "\n".join(line for line in self.sql.splitlines() if not line.lstrip().startswith("--"))
+        return [s.strip() for s in _STATEMENT_END.split(body) if s.strip()]
+
+def load_migrations():
+    migrations = [
+        Migration(os.path.join(MIGRATIONS_DIR, name))
+        for name in sorted(os.listdir(MIGRATIONS_DIR)) if _FILENAME.match(name)
+    ]
+    versions = [m.version for m in migrations]
+    duplicates = {v for v in versions if versions.count(v) > 1}
+    if duplicates:
+        raise SystemExit(f"Duplicate migration versions: {', '.join(sorted(duplicates))}")
+    return migrations
+
+async def missing_tables(conn, tables):
+    missing = []
+    for table in tables:
+        if await conn.fetchval("SELECT to_regclass($1) IS NULL", table):
+            missing.append(table)
+    return missing
+
+async def apply(conn, migration: Migration):
+    if migration.transaction:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                migration.version, migration.name
+            )
+        return
+    for statement in migration.statements():
+        await conn.execute(statement)
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+        migration.version, migration.name
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--dsn", default=DATABASE_URL, help="defaults to $DATABASE_URL")
+    parser.add_argument("--dry-run", action="store_true", help="only list pending migrations")
+    args = parser.parse_args()
+    if not args.dsn:
+        raise SystemExit("DATABASE_URL (or --dsn) is required")
+
+    migrations = load_migrations()
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(20) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        applied = {row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+        pending = [m for m in migrations if m.version not in applied]
+        if not pending:
+            print(f"✅ Schema up to date ({len(applied)} migrations applied)")
+            return
+
+        for migration in pending:
+            missing = await missing_tables(conn, migration.requires)
+            if missing:
+                print(f"⏭️  {migration.name}: skipped, missing tables {', '.join(missing)}")
+                continue
+            if args.dry_run:
+                print(f"📋 {migration.name}: pending")
+                continue
+            print(f"🔧 {migration.name} ...")
+            try:
+                await apply(conn, migration)
+            except Exception as e:
+                print(f"❌ {migration.name} failed: {e}")
+                sys.exit(1)
+        print("✅ Migrations done")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,8 @@
+-- requires: assessments
+-- transaction: none
+-- GET /assessments/user/{user_id}/latest: WHERE user_id = $1 AND is_completed
+-- ORDER BY assessment_date DESC LIMIT 1 becomes a single index probe. Also
+-- serves the team service's "completed assessment per member" joins.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assessments_user_completed_date
+    ON assessments (user_id, assessment_date DESC)
+    WHERE is_completed = true;
@@ -0,0 +1,6 @@
+-- requires: communication_matrix, hugo_types
+-- GET /communication/{type_a}/{type_b}: hugo_types by code, then the matrix
+-- row by (type_a_id, type_b_id).
+CREATE INDEX IF NOT EXISTS idx_hugo_types_code ON hugo_types (code);
+CREATE INDEX IF NOT EXISTS idx_communication_matrix_type_pair
+    ON communication_matrix (type_a_id, type_b_id);
@@ -0,0 +1,7 @@
+-- requires: team_members
+-- transaction: none
+-- GET /users/{user_id}/teams: WHERE user_id = $1 ORDER BY joined_at DESC is
+-- read in index order. Supersedes the single-column user_id index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_team_members_user_joined
+    ON team_members (user_id, joined_at DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_team_members_user_id;
@@ -0,0 +1,7 @@
+-- requires: assessment_invitations
+-- transaction: none
+-- GET /invitations/{token} and POST /sessions: WHERE token = $1 AND
+-- expires_at > NOW(), answered from the index. Supersedes the token index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assessment_invitations_token_expiry
+    ON assessment_invitations (token, expires_at);
+DROP INDEX CONCURRENTLY IF EXISTS idx_assessment_invitations_token;
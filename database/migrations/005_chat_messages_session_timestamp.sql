@@ -0,0 +1,7 @@
+-- requires: chat_messages
+-- transaction: none
+-- GET /sessions/{id}: WHERE session_id = $1 ORDER BY timestamp without a sort.
+-- Supersedes the session_id index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_messages_session_timestamp
+    ON chat_messages (session_id, timestamp);
+DROP INDEX CONCURRENTLY IF EXISTS idx_chat_messages_session_id;
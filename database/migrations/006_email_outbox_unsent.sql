@@ -0,0 +1,5 @@
+-- requires: email_outbox
+-- Outbox stats (WHERE status <> 'sent' OR (status = 'sent' AND sent_at > ...)):
+-- a bitmap OR of this index and idx_email_outbox_sent_at instead of reading
+-- every sent email ever queued.
+CREATE INDEX IF NOT EXISTS idx_email_outbox_unsent ON email_outbox (created_at) WHERE status <> 'sent';
@@ -0,0 +1,81 @@
+-- requires: chat_messages, chat_sessions
+-- Monthly partitions for chat_messages, transcript archive and the bookkeeping
+-- used by chat_assessment_service/retention.py. The existing table becomes the
+-- partition for everything up to the end of the current month (no row copy;
+-- attaching validates it under lock, so run this off-peak); new months get
+-- their own partitions and the retention job empties and drops the old one.
+
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS messages_archived_at TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_unarchived
+    ON chat_sessions (created_at) WHERE messages_archived_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS chat_messages_archive (
+    session_id UUID PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    message_count INTEGER NOT NULL,
+    first_message_at TIMESTAMP,
+    last_message_at TIMESTAMP,
+    messages JSONB NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION ensure_chat_message_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := date_trunc('month', LOCALTIMESTAMP) + make_interval(months => i);
+        partition_name := 'chat_messages_' || to_char(month_start, '"y"YYYY"m"MM');
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF chat_messages FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_start + INTERVAL '1 month'
+            );
+            created := created + 1;
+        EXCEPTION WHEN invalid_object_definition THEN
+            -- overlaps an existing partition
+            NULL;
+        END;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    boundary TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) + INTERVAL '1 month';
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'chat_messages'::regclass) THEN
+        RETURN;  -- created partitioned by chat_assessment_schema.sql
+    END IF;
+
+    ALTER TABLE chat_messages RENAME TO chat_messages_legacy;
+    ALTER INDEX IF EXISTS idx_chat_messages_session_timestamp RENAME TO idx_chat_messages_legacy_session_timestamp;
+    DROP INDEX IF EXISTS idx_chat_messages_timestamp;
+    DROP INDEX IF EXISTS idx_chat_messages_session_id;
+
+    UPDATE chat_messages_legacy m SET timestamp = COALESCE(s.created_at, CURRENT_TIMESTAMP)
+    FROM chat_sessions s
+    WHERE m.timestamp IS NULL AND s.id = m.session_id;
+    ALTER TABLE chat_messages_legacy ALTER COLUMN timestamp SET NOT NULL;
+    ALTER TABLE chat_messages_legacy DROP CONSTRAINT IF EXISTS chat_messages_pkey;
+    ALTER TABLE chat_messages_legacy ADD PRIMARY KEY (id, timestamp);
+
+    CREATE TABLE chat_messages (
+        id UUID NOT NULL DEFAULT uuid_generate_v4(),
+        session_id UUID NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+        message TEXT NOT NULL,
+        is_user BOOLEAN NOT NULL,
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    CREATE INDEX idx_chat_messages_session_timestamp ON chat_messages (session_id, timestamp);
+
+    ALTER TABLE chat_messages ATTACH PARTITION chat_messages_legacy FOR VALUES FROM (MINVALUE) TO (boundary);
+    CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT;
+END$$;
+
+SELECT ensure_chat_message_partitions(3);
@@ -0,0 +1,4 @@
+-- requires: audit_logs
+-- backend/shared/audit.py stores ids that are not integers (team and
+-- assessment uuids) in entity_key; entity_id stays for integer ids.
+ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS entity_key VARCHAR(64);
@@ -0,0 +1,31 @@
+-- requires: users, user_culture_profiles
+-- The user service keeps per-company nearest-neighbour indexes of culture and
+-- personality vectors in memory (backend/user_service/people.py). Changed
+-- users are sent on the people_index channel so it can update them in place.
+CREATE OR REPLACE FUNCTION notify_people_index() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('people_index', OLD.user_id::text);
+    ELSE
+        PERFORM pg_notify('people_index', NEW.user_id::text);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_people_index_user() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('people_index', NEW.id::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_culture_profiles_people_index ON user_culture_profiles;
+CREATE TRIGGER user_culture_profiles_people_index
+    AFTER INSERT OR UPDATE OR DELETE ON user_culture_profiles
+    FOR EACH ROW EXECUTE FUNCTION notify_people_index();
+
+DROP TRIGGER IF EXISTS users_people_index ON users;
+CREATE TRIGGER users_people_index
+    AFTER UPDATE OF company_id, is_active ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_people_index_user();
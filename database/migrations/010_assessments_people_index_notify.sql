@@ -0,0 +1,8 @@
+-- requires: assessments, user_culture_profiles
+-- Completed assessments update the people index (see 009_people_index_notify.sql).
+-- Separate migration: the assessments table is created by the assessment service.
+DROP TRIGGER IF EXISTS assessments_people_index ON assessments;
+CREATE TRIGGER assessments_people_index
+    AFTER INSERT OR UPDATE OF is_completed, raw_scores ON assessments
+    FOR EACH ROW WHEN (NEW.is_completed)
+    EXECUTE FUNCTION notify_people_index();
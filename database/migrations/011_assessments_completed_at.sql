@@ -0,0 +1,11 @@
+-- requires: assessments
+-- transaction: none
+-- Completion time of an assessment, set by POST /assessments/submit.
+-- assessment_date is the creation time; incremental exports (GET
+-- /assessments/export?since=...) select by completed_at.
+ALTER TABLE assessments ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP;
+UPDATE assessments SET completed_at = assessment_date
+    WHERE is_completed = true AND completed_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assessments_completed_at
+    ON assessments (completed_at)
+    WHERE is_completed = true;
@@ -0,0 +1,70 @@
+-- requires: chat_messages
+-- Drops the chat_messages default partition. With a default partition
+-- PostgreSQL refuses ALTER TABLE ... DETACH PARTITION CONCURRENTLY, so the
+-- retention job had to detach expired months under an ACCESS EXCLUSIVE lock
+-- on chat_messages, queueing live inserts behind it. Partitions are now
+-- created CHAT_PARTITIONS_AHEAD (default 12) months ahead instead.
+--
+-- ensure_chat_message_partitions moves rows that landed in the default
+-- partition (retention job down for longer than the months created ahead)
+-- into their monthly partitions, and creates partitions with ATTACH PARTITION
+-- (SHARE UPDATE EXCLUSIVE) rather than CREATE TABLE ... PARTITION OF.
+CREATE OR REPLACE FUNCTION ensure_chat_message_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', LOCALTIMESTAMP);
+    last_month TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) + make_interval(months => months_ahead);
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    IF to_regclass('chat_messages_default') IS NOT NULL THEN
+        -- Also the months whose rows went to the default partition
+        SELECT LEAST(month_start, date_trunc('month', min(timestamp))) INTO month_start
+        FROM chat_messages_default;
+    END IF;
+    WHILE month_start <= last_month LOOP
+        partition_name := 'chat_messages_' || to_char(month_start, '"y"YYYY"m"MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                -- Created standalone and attached: ATTACH PARTITION only takes SHARE UPDATE
+                -- EXCLUSIVE on chat_messages, inserts into other partitions go on
+                EXECUTE format('CREATE TABLE %I (LIKE chat_messages INCLUDING DEFAULTS)', partition_name);
+                IF to_regclass('chat_messages_default') IS NOT NULL THEN
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM chat_messages_default WHERE timestamp >= %L AND timestamp < %L '
+                        'RETURNING id, session_id, message, is_user, timestamp) '
+                        'INSERT INTO %I (id, session_id, message, is_user, timestamp) SELECT * FROM moved',
+                        month_start, month_start + INTERVAL '1 month', partition_name
+                    );
+                END IF;
+                EXECUTE format(
+                    'ALTER TABLE chat_messages ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + INTERVAL '1 month'
+                );
+                created := created + 1;
+            EXCEPTION WHEN invalid_object_definition THEN
+                -- overlaps an existing partition
+                NULL;
+            END;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_chat_message_partitions(12);
+
+DO $$
+BEGIN
+    IF to_regclass('chat_messages_default') IS NULL THEN
+        RETURN;
+    END IF;
+    IF EXISTS (SELECT 1 FROM chat_messages_default) THEN
+        -- Rows dated beyond the months created above; the retention job keeps
+        -- failing to detach expired partitions until they are moved or deleted
+        RAISE WARNING 'chat_messages_default still has rows, not dropped';
+    ELSE
+        DROP TABLE chat_messages_default;
+    END IF;
+END$$;
@@ -0,0 +1,7 @@
+-- requires: users
+-- transaction: none
+-- POST /auth/login: index-only lookup of active users by email (user service).
+-- Same definition as in multi_tenant_schema.sql, for databases created before it.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_login ON users (email)
+    INCLUDE (id, password_hash, first_name, last_name, role, company_id)
+    WHERE is_active = true;
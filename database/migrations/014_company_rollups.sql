@@ -0,0 +1,71 @@
+-- requires: companies, users, teams, assessment_sessions, hugo_personality_types
+-- Per-company dashboard rollups (backend/user_service/rollups.py), for
+-- databases created before multi_tenant_schema.sql defined them. The unique
+-- index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY.
+CREATE MATERIALIZED VIEW IF NOT EXISTS company_rollups AS
+WITH user_stats AS (
+    SELECT company_id,
+           COUNT(*) AS total_users,
+           COUNT(*) FILTER (WHERE role = 'hr_manager') AS hr_managers,
+           COUNT(*) FILTER (WHERE hugo_type IS NOT NULL) AS typed_users
+    FROM users
+    WHERE is_active = true AND company_id IS NOT NULL
+    GROUP BY company_id
+),
+type_histogram AS (
+    SELECT company_id, jsonb_object_agg(hugo_type, n) AS histogram
+    FROM (
+        SELECT company_id, hugo_type, COUNT(*) AS n
+        FROM users
+        WHERE is_active = true AND company_id IS NOT NULL AND hugo_type IS NOT NULL
+        GROUP BY company_id, hugo_type
+    ) t
+    GROUP BY company_id
+),
+dimension_histogram AS (
+    SELECT company_id, jsonb_object_agg(dimension, n) AS histogram
+    FROM (
+        SELECT u.company_id, ht.dimension, COUNT(*) AS n
+        FROM users u
+        JOIN hugo_personality_types ht ON ht.code = u.hugo_type
+        WHERE u.is_active = true AND u.company_id IS NOT NULL
+        GROUP BY u.company_id, ht.dimension
+    ) d
+    GROUP BY company_id
+),
+assessment_stats AS (
+    SELECT company_id,
+           COUNT(*) FILTER (WHERE status = 'completed') AS completed_assessments,
+           COUNT(*) FILTER (WHERE status <> 'completed') AS open_assessments
+    FROM assessment_sessions
+    GROUP BY company_id
+),
+team_stats AS (
+    SELECT company_id, COUNT(*) AS total_teams, AVG(synergy_score) AS avg_team_synergy
+    FROM teams
+    WHERE is_active = true
+    GROUP BY company_id
+)
+SELECT
+    c.id AS company_id,
+    c.name,
+    c.subscription_plan,
+    COALESCE(us.total_users, 0) AS total_users,
+    COALESCE(us.hr_managers, 0) AS hr_managers,
+    COALESCE(us.typed_users, 0) AS typed_users,
+    COALESCE(ts.total_teams, 0) AS total_teams,
+    COALESCE(ast.completed_assessments, 0) AS completed_assessments,
+    COALESCE(ast.open_assessments, 0) AS open_assessments,
+    COALESCE(th.histogram, '{}'::jsonb) AS type_histogram,
+    COALESCE(dh.histogram, '{}'::jsonb) AS dimension_histogram,
+    ROUND(ts.avg_team_synergy, 2) AS avg_team_synergy,
+    now() AS refreshed_at
+FROM companies c
+LEFT JOIN user_stats us ON us.company_id = c.id
+LEFT JOIN type_histogram th ON th.company_id = c.id
+LEFT JOIN dimension_histogram dh ON dh.company_id = c.id
+LEFT JOIN assessment_stats ast ON ast.company_id = c.id
+LEFT JOIN team_stats ts ON ts.company_id = c.id
+WHERE c.is_active = true;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_company_rollups_company ON company_rollups (company_id);
@@ -127,6 +127,7 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     action VARCHAR(100) NOT NULL,
     entity_type VARCHAR(50),
     entity_id INTEGER,
+    entity_key VARCHAR(64),           -- non-integer ids (uuid), see backend/shared/audit.py
     old_values JSONB,
     new_values JSONB,
     ip_address INET,
@@ -154,9 +155,13 @@ CREATE TABLE IF NOT EXISTS role_permissions (
 -- Indexes
 CREATE INDEX IF NOT EXISTS idx_users_company_id ON users(company_id);
 CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+-- Covering index for /auth/login: index-only lookup of active users by email
+CREATE INDEX IF NOT EXISTS idx_users_login ON users(email)
+    INCLUDE (id, password_hash, first_name, last_name, role, company_id)
+    WHERE is_active = true;
 CREATE INDEX IF NOT EXISTS idx_teams_company_id ON teams(company_id);
 CREATE INDEX IF NOT EXISTS idx_team_members_team_id ON team_members(team_id);
-CREATE INDEX IF NOT EXISTS idx_team_members_user_id ON team_members(user_id);
+CREATE INDEX IF NOT EXISTS idx_team_members_user_joined ON team_members(user_id, joined_at DESC);
 CREATE INDEX IF NOT EXISTS idx_assessment_sessions_company_id ON assessment_sessions(company_id);
 CREATE INDEX IF NOT EXISTS idx_assessment_sessions_token ON assessment_sessions(session_token);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_company_id ON audit_logs(company_id);
@@ -359,6 +364,35 @@ CREATE TABLE IF NOT EXISTS user_culture_profiles (
     UNIQUE(user_id, dimension_id)
 );
 
+-- People index (backend/user_service/people.py): changed users on channel people_index
+CREATE OR REPLACE FUNCTION notify_people_index() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('people_index', OLD.user_id::text);
+    ELSE
+        PERFORM pg_notify('people_index', NEW.user_id::text);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_people_index_user() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('people_index', NEW.id::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_culture_profiles_people_index ON user_culture_profiles;
+CREATE TRIGGER user_culture_profiles_people_index
+    AFTER INSERT OR UPDATE OR DELETE ON user_culture_profiles
+    FOR EACH ROW EXECUTE FUNCTION notify_people_index();
+
+DROP TRIGGER IF EXISTS users_people_index ON users;
+CREATE TRIGGER users_people_index
+    AFTER UPDATE OF company_id, is_active ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_people_index_user();
+
 -- Team Synergy
 CREATE TABLE IF NOT EXISTS team_synergy_metrics (
     id SERIAL PRIMARY KEY,
@@ -451,5 +485,76 @@ LEFT JOIN teams t ON tm.team_id = t.id AND t.is_active = true
 WHERE u.is_active = true
 GROUP BY u.id, u.email, u.first_name, u.last_name, u.hugo_type, u.company_id, c.name;
 
+-- Per-company dashboard rollups. Refreshed CONCURRENTLY by the user service
+-- (backend/user_service/rollups.py) when the source tables changed; the unique
+-- index is required for concurrent refreshes.
+CREATE MATERIALIZED VIEW IF NOT EXISTS company_rollups AS
+WITH user_stats AS (
+    SELECT company_id,
+           COUNT(*) AS total_users,
+           COUNT(*) FILTER (WHERE role = 'hr_manager') AS hr_managers,
+           COUNT(*) FILTER (WHERE hugo_type IS NOT NULL) AS typed_users
+    FROM users
+    WHERE is_active = true AND company_id IS NOT NULL
+    GROUP BY company_id
+),
+type_histogram AS (
+    SELECT company_id, jsonb_object_agg(hugo_type, n) AS histogram
+    FROM (
+        SELECT company_id, hugo_type, COUNT(*) AS n
+        FROM users
+        WHERE is_active = true AND company_id IS NOT NULL AND hugo_type IS NOT NULL
+        GROUP BY company_id, hugo_type
+    ) t
+    GROUP BY company_id
+),
+dimension_histogram AS (
+    SELECT company_id, jsonb_object_agg(dimension, n) AS histogram
+    FROM (
+        SELECT u.company_id, ht.dimension, COUNT(*) AS n
+        FROM users u
+        JOIN hugo_personality_types ht ON ht.code = u.hugo_type
+        WHERE u.is_active = true AND u.company_id IS NOT NULL
+        GROUP BY u.company_id, ht.dimension
+    ) d
+    GROUP BY company_id
+),
+assessment_stats AS (
+    SELECT company_id,
+           COUNT(*) FILTER (WHERE status = 'completed') AS completed_assessments,
+           COUNT(*) FILTER (WHERE status <> 'completed') AS open_assessments
+    FROM assessment_sessions
+    GROUP BY company_id
+),
+team_stats AS (
+    SELECT company_id, COUNT(*) AS total_teams, AVG(synergy_score) AS avg_team_synergy
+    FROM teams
+    WHERE is_active = true
+    GROUP BY company_id
+)
+SELECT
+    c.id AS company_id,
+    c.name,
+    c.subscription_plan,
+    COALESCE(us.total_users, 0) AS total_users,
+    COALESCE(us.hr_managers, 0) AS hr_managers,
+    COALESCE(us.typed_users, 0) AS typed_users,
+    COALESCE(ts.total_teams, 0) AS total_teams,
+    COALESCE(ast.completed_assessments, 0) AS completed_assessments,
+    COALESCE(ast.open_assessments, 0) AS open_assessments,
+    COALESCE(th.histogram, '{}'::jsonb) AS type_histogram,
+    COALESCE(dh.histogram, '{}'::jsonb) AS dimension_histogram,
+    ROUND(ts.avg_team_synergy, 2) AS avg_team_synergy,
+    now() AS refreshed_at
+FROM companies c
+LEFT JOIN user_stats us ON us.company_id = c.id
+LEFT JOIN type_histogram th ON th.company_id = c.id
+LEFT JOIN dimension_histogram dh ON dh.company_id = c.id
+LEFT JOIN assessment_stats ast ON ast.company_id = c.id
+LEFT JOIN team_stats ts ON ts.company_id = c.id
+WHERE c.is_active = true;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_company_rollups_company ON company_rollups(company_id);
+
 COMMENT ON DATABASE hugo_platform IS 'Multi-tenant Hugo personality assessment and team building platform';
 
@@ -73,6 +73,19 @@ deploy_services() {
     print_success "Services started successfully"
 }
 
+# Apply pending schema migrations (database/migrations) from a service container
+run_migrations() {
+    print_status "Applying database migrations..."
+    
+    if docker-compose run --rm -T -v "$(pwd)/database:/database:ro" "${MIGRATION_SERVICE:-user-service}" \
+        python /database/migrate.py; then
+        print_success "Database schema is up to date"
+    else
+        print_error "Database migrations failed"
+        exit 1
+    fi
+}
+
 # Wait for services to be ready
 wait_for_services() {
     print_status "Waiting for services to be ready..."
@@ -179,6 +192,7 @@ main() {
     check_env_file
     deploy_services
     wait_for_services
+    run_migrations
     run_tests
     show_deployment_info
     
@@ -201,6 +215,9 @@ case "${1:-}" in
         print_status "Showing service logs..."
         docker-compose logs -f
         ;;
+    "migrate")
+        run_migrations
+        ;;
     "test")
         print_status "Running API tests..."
         python3 test_apis.py
@@ -221,6 +238,7 @@ case "${1:-}" in
         echo "  stop          Stop all services"
         echo "  restart       Restart all services"
         echo "  logs          Show service logs"
+        echo "  migrate       Apply pending database migrations"
         echo "  test          Run API tests"
         echo "  clean         Clean up Docker resources"
         echo "  help          Show this help message"